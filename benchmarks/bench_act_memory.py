@@ -0,0 +1,83 @@
+# Copyright © 2018 Mateusz Maciąg
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the “Software”), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software
+# is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS
+# OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+""" Memory footprint of the ACT built for a synthetic design.
+
+    python -m benchmarks.bench_act_memory [--fields 100000]
+
+Nodes are created directly, the same way synthesis tasks create them for
+a register map of 4-bit fields, so RDL compilation is not measured.
+Reports bytes of live ACT per field.
+"""
+
+from pyrcom.act.systemverilog import LogicalGroup, Port, Range, SignalDeclaration, \
+    FieldInstance
+
+import argparse
+import gc
+import tracemalloc
+
+
+def make_act(n_fields, fields_per_reg=4):
+    """ Return list of (ports, signal declarations, register groups) """
+    ports = []
+    decl = []
+    reg_groups = []
+    for reg in range(n_fields // fields_per_reg):
+        reg_name = 'REG%d' % reg
+        for spec, kind, rng in (("select", "logic", None),
+                                ("data_in", "wire", Range(31, 0)),
+                                ("data_out", "wire", Range(31, 0))):
+            decl.append(SignalDeclaration('reg_' + reg_name + '__' + spec, kind, rng))
+
+        field_groups = []
+        for field in range(fields_per_reg):
+            # Names are built at run time, like names read from RDL
+            field_name = 'FIELD%d' % field
+            low = field * 4
+            ports.append(Port('hw_' + reg_name + '__' + field_name, "output", Range(3, 0)))
+            field_groups.append(LogicalGroup(2, "Field: " + field_name,
+                FieldInstance(reg_name, field_name, Range(low + 3, low), 0, 0)))
+        reg_groups.append(LogicalGroup(2, "Register: " + reg_name, field_groups))
+    return ports, decl, reg_groups
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument('--fields', type=int, default=100000)
+    args = ap.parse_args()
+
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    act = make_act(args.fields)
+    gc.collect()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    size = after - before
+    print(str.format("fields: {0}", args.fields))
+    print(str.format("  ACT size              : {0:8.1f} MB", size / 2**20))
+    print(str.format("  bytes per field       : {0:8.0f}", size / args.fields))
+    del act
+
+
+if __name__ == "__main__":
+    main()
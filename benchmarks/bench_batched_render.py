@@ -0,0 +1,64 @@
+# Copyright © 2018 Mateusz Maciąg
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the “Software”), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software
+# is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS
+# OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+""" Per-node vs batched rendering of repeated instance templates.
+
+    python -m benchmarks.bench_batched_render [--fields 10000]
+"""
+
+from pyrcom.codegen.systemverilog import SystemVerilogEmitter, SystemVerilogBuilder
+from benchmarks.common import QuietPrinter, compile_map
+
+import argparse
+import time
+
+
+def time_render(rdl_root, batch_render, repeat):
+    language_config = {'design_name': 'bench', 'batch_render': batch_render}
+    builder = SystemVerilogBuilder(language_config, printer=QuietPrinter())
+    act_root = builder.build_act(rdl_root)
+
+    best, code = None, None
+    for _ in range(repeat):
+        emitter = SystemVerilogEmitter("sv", language_config, printer=QuietPrinter(), template_suffix=".sv")
+        start = time.perf_counter()
+        code = emitter.visit(act_root)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, code
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument('--fields', type=int, default=10000)
+    ap.add_argument('--repeat', type=int, default=3)
+    args = ap.parse_args()
+
+    rdl_root = compile_map(args.fields)
+    per_node, code_per_node = time_render(rdl_root, False, args.repeat)
+    batched, code_batched = time_render(rdl_root, True, args.repeat)
+
+    print(str.format("fields: {0}, output identical: {1}", args.fields, code_per_node == code_batched))
+    print(str.format("  per-node render : {0:8.1f} ms", per_node * 1e3))
+    print(str.format("  batched render  : {0:8.1f} ms  speedup x{1:.2f}", batched * 1e3, per_node / batched))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+# Copyright © 2018 Mateusz Maciąg
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the “Software”), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software
+# is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS
+# OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+""" Generic vs type-specialized field modules.
+
+    python -m benchmarks.bench_field_types [--fields 10000]
+"""
+
+from pyrcom.codegen.systemverilog import SystemVerilogEmitter, SystemVerilogBuilder
+from benchmarks.common import QuietPrinter, compile_map
+
+import argparse
+import time
+
+
+def time_generate(rdl_root, field_types, repeat):
+    """ Return (best seconds, output size in bytes, number of field modules) """
+    language_config = {'design_name': 'bench', 'field_types': field_types}
+    builder = SystemVerilogBuilder(language_config, printer=QuietPrinter())
+    emitter = SystemVerilogEmitter("sv", language_config, printer=QuietPrinter(), template_suffix=".sv")
+
+    best, code = None, None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        code = emitter.generate_code(builder, rdl_root)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    modules = sum(1 for line in code.splitlines() if line.startswith('module bench_field'))
+    return best, len(code.encode('utf-8')), modules
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument('--fields', type=int, default=10000)
+    ap.add_argument('--repeat', type=int, default=3)
+    args = ap.parse_args()
+
+    rdl_root = compile_map(args.fields)
+    print(str.format("fields: {0}", args.fields))
+    for label, field_types in [('generic', False), ('typed', True)]:
+        elapsed, size, modules = time_generate(rdl_root, field_types, args.repeat)
+        print(str.format("  {0:8}: generate {1:8.1f} ms  output {2:11,d} bytes  field modules {3}",
+                         label, elapsed * 1e3, size, modules))
+
+
+if __name__ == "__main__":
+    main()
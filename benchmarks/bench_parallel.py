@@ -0,0 +1,74 @@
+# Copyright © 2018 Mateusz Maciąg
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the “Software”), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software
+# is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS
+# OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+""" Wall time of parallel batch generation (-j N) compared with serial generation.
+
+    python -m benchmarks.bench_parallel [--blocks 32] [--regs 64] [-j N]
+"""
+
+from pyrcom.batch import CompileJob, run_jobs
+from benchmarks.common import QuietPrinter
+from benchmarks.rdlgen import write_blocks
+
+import argparse
+import os
+import tempfile
+import time
+
+
+def time_jobs(jobs, workers):
+    printer = QuietPrinter()
+    start = time.perf_counter()
+    results = list(run_jobs(jobs, printer, [{}] * len(jobs), None, workers))
+    elapsed = time.perf_counter() - start
+    failed = [r for r in results if not r.success]
+    if failed:
+        raise RuntimeError(failed[0].error)
+    return elapsed
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument('--blocks', type=int, default=32)
+    ap.add_argument('--regs', type=int, default=64)
+    ap.add_argument('--fields', type=int, default=4)
+    ap.add_argument('-j', '--jobs', type=int, default=os.cpu_count() or 1)
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        sources = write_blocks(tmp, args.blocks, n_regs=args.regs,
+                               fields_per_reg=args.fields, intr_every=8)
+        jobs = [CompileJob([src], src[:-len('.rdl')] + '.sv',
+                           design_name=os.path.basename(src)[:-len('.rdl')])
+                for src in sources]
+
+        serial = time_jobs(jobs, 1)
+        parallel = time_jobs(jobs, args.jobs)
+
+    print(str.format("blocks={0} regs/block={1} fields/reg={2}",
+                     args.blocks, args.regs, args.fields))
+    print(str.format("  -j 1  : {0:8.3f}s", serial))
+    # Ratio above 1 is a speedup; pool start-up dominates with few CPUs
+    print(str.format("  -j {0:<3d}: {1:8.3f}s  serial/parallel {2:.2f}",
+                     args.jobs, parallel, serial / parallel))
+
+
+if __name__ == "__main__":
+    main()
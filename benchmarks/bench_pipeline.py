@@ -0,0 +1,57 @@
+# Copyright © 2018 Mateusz Maciąg
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the “Software”), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software
+# is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS
+# OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+""" pytest-benchmark wrappers of the pipeline stages of `benchmarks.suite`.
+
+    python -m pytest benchmarks/bench_pipeline.py --benchmark-autosave
+
+Results saved by pytest-benchmark can be compared across revisions with
+`--benchmark-compare` / `--benchmark-compare-fail=mean:20%`.
+"""
+
+import pytest
+
+pytest.importorskip('pytest_benchmark')
+
+from benchmarks.rdlgen import generate_rdl
+from benchmarks.suite import CASES, DEFAULT_CASES, Pipeline
+
+# =============================================================================
+
+
+@pytest.fixture(scope='module', params=DEFAULT_CASES)
+def pipeline(request, tmp_path_factory):
+    path = tmp_path_factory.mktemp('rdl').joinpath(request.param + '.rdl')
+    path.write_text(generate_rdl(request.param, **CASES[request.param]))
+    return Pipeline(str(path))
+
+
+def test_compile(benchmark, pipeline):
+    benchmark.pedantic(pipeline.compile, args=(None,), rounds=3)
+
+
+def test_buildAct(benchmark, pipeline):
+    rdl_root = pipeline.compile(None)
+    benchmark(pipeline.build_act, rdl_root)
+
+
+def test_render(benchmark, pipeline):
+    act_root = pipeline.build_act(pipeline.compile(None))
+    benchmark(pipeline.render, act_root)
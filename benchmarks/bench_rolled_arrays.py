@@ -0,0 +1,72 @@
+# Copyright © 2018 Mateusz Maciąg
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the “Software”), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software
+# is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS
+# OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+""" Unrolled vs rolled (generate loop) synthesis of register arrays.
+
+    python -m benchmarks.bench_rolled_arrays [--elements 65536]
+"""
+
+from pyrcom.codegen.systemverilog import SystemVerilogEmitter, SystemVerilogBuilder
+from benchmarks.common import QuietPrinter, compile_rdl
+
+import argparse
+import time
+
+
+def compile_map(n_arrays, elements):
+    return compile_rdl('bench', n_regs=n_arrays, fields_per_reg=4, array_size=elements)
+
+
+def time_generate(rdl_root, roll_arrays):
+    """ Return (build seconds, render seconds, output size in bytes) """
+    language_config = {'design_name': 'bench', 'roll_arrays': roll_arrays}
+    builder = SystemVerilogBuilder(language_config, printer=QuietPrinter())
+    emitter = SystemVerilogEmitter("sv", language_config, printer=QuietPrinter(), template_suffix=".sv")
+
+    start = time.perf_counter()
+    act_root = builder.build_act(rdl_root)
+    built = time.perf_counter()
+    code = emitter.visit(act_root)
+    rendered = time.perf_counter()
+    return built - start, rendered - built, len(code.encode('utf-8'))
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument('--elements', type=int, default=65536,
+                    help="Elements of every register array")
+    ap.add_argument('--arrays', type=int, default=1,
+                    help="Number of register arrays")
+    ap.add_argument('--skip-unrolled', action='store_true',
+                    help="Measure rolled synthesis only")
+    args = ap.parse_args()
+
+    rdl_root = compile_map(args.arrays, args.elements)
+    print(str.format("register arrays: {0} x {1} elements", args.arrays, args.elements))
+
+    modes = [('rolled', True)] if args.skip_unrolled else [('unrolled', False), ('rolled', True)]
+    for label, roll_arrays in modes:
+        build, render, size = time_generate(rdl_root, roll_arrays)
+        print(str.format("  {0:9}: build {1:9.1f} ms  render {2:9.1f} ms  output {3:11,d} bytes",
+                         label, build * 1e3, render * 1e3, size))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+# Copyright © 2018 Mateusz Maciąg
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the “Software”), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software
+# is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS
+# OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+""" Scaling of shard-parallel rendering of one large design over worker
+processes.
+
+    python -m benchmarks.bench_shard_render [--fields 100000] [--workers 1 2 4 8 16] [--csv FILE]
+"""
+
+from pyrcom.codegen.systemverilog import SystemVerilogEmitter, SystemVerilogBuilder
+from benchmarks.common import QuietPrinter, compile_map
+
+import argparse
+import os
+import time
+
+DEFAULT_WORKERS = [1, 2, 4, 8, 16]
+
+# Width of the longest bar of the speedup plot
+PLOT_WIDTH = 50
+
+
+def time_render(act_root, workers, shard_size, repeat):
+    """ Return (best seconds, rendered code) of rendering `act_root` """
+    language_config = {'design_name': 'bench', 'render_workers': workers,
+                       'render_shard_size': shard_size}
+    best, code = None, None
+    for _ in range(repeat):
+        emitter = SystemVerilogEmitter("sv", language_config, printer=QuietPrinter(), template_suffix=".sv")
+        start = time.perf_counter()
+        try:
+            code = emitter.visit(act_root)
+        finally:
+            emitter.close()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, code
+
+
+def plot(results):
+    """ Text plot of speedup over the first result, one bar per worker count """
+    base = results[0][1]
+    top = max(base / elapsed for _, elapsed in results)
+    lines = []
+    for workers, elapsed in results:
+        speedup = base / elapsed
+        bar = '#' * max(1, int(round(PLOT_WIDTH * speedup / top)))
+        lines.append(str.format("  {0:3d} | {1:<{2}} x{3:.2f}", workers, bar, PLOT_WIDTH, speedup))
+    return "\n".join(lines)
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument('--fields', type=int, default=100000)
+    ap.add_argument('--workers', type=int, nargs='+', default=DEFAULT_WORKERS)
+    ap.add_argument('--shard-size', type=int, default=512)
+    ap.add_argument('--repeat', type=int, default=1)
+    ap.add_argument('--csv', help="Write results as CSV (workers,seconds,speedup)")
+    args = ap.parse_args()
+
+    rdl_root = compile_map(args.fields)
+    act_root = SystemVerilogBuilder({'design_name': 'bench'}, printer=QuietPrinter()).build_act(rdl_root)
+
+    print(str.format("fields: {0}, shard size: {1}, CPUs: {2}",
+                     args.fields, args.shard_size, os.cpu_count()))
+    results = []
+    reference = None
+    for workers in args.workers:
+        elapsed, code = time_render(act_root, workers, args.shard_size, args.repeat)
+        if reference is None:
+            reference = code
+        elif code != reference:
+            raise RuntimeError(str.format("Output rendered by {0} workers differs", workers))
+        results.append((workers, elapsed))
+        print(str.format("  {0:3d} worker(s): {1:8.1f} ms", workers, elapsed * 1e3))
+
+    print("speedup:")
+    print(plot(results))
+
+    if args.csv:
+        with open(args.csv, 'w') as fd:
+            fd.write("workers,seconds,speedup\n")
+            for workers, elapsed in results:
+                fd.write(str.format("{0},{1:.6f},{2:.3f}\n", workers, elapsed, results[0][1] / elapsed))
+
+
+if __name__ == "__main__":
+    main()
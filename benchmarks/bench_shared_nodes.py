@@ -0,0 +1,107 @@
+# Copyright © 2018 Mateusz Maciąg
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the “Software”), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software
+# is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS
+# OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+""" ACT built with and without sharing of equal value nodes.
+
+    python -m benchmarks.bench_shared_nodes [--fields 40000] [--repeat 3]
+
+Reports live size of the ACT of a synthetic design (measured with
+tracemalloc), number of value node objects in it, and best build and
+render times of `repeat` runs.
+"""
+
+from pyrcom.act.common import ValueNode
+from pyrcom.codegen.synthesis import build_synthesis_context
+from pyrcom.codegen.systemverilog import SystemVerilogEmitter, SystemVerilogBuilder
+from benchmarks.common import QuietPrinter, compile_map
+
+import argparse
+import gc
+import time
+import tracemalloc
+
+
+def value_nodes(node, seen_ids, counts):
+    """ Count references to value nodes reachable from `node` in `counts`,
+    ids of distinct node objects are collected in `seen_ids` """
+    if isinstance(node, (list, tuple)):
+        for item in node:
+            value_nodes(item, seen_ids, counts)
+        return
+    if isinstance(node, ValueNode):
+        counts[0] += 1
+        seen_ids.add(id(node))
+        for name in node._value_slots:
+            value_nodes(getattr(node, name), seen_ids, counts)
+        return
+    for name in ('children', 'hw_ports', 'backend_signal_declarations', 'backend_instantiation'):
+        value_nodes(getattr(node, name, ()), seen_ids, counts)
+
+
+def measure(rdl_root, context, share_nodes, repeat):
+    language_config = {'design_name': 'bench', 'share_nodes': share_nodes}
+    builder = SystemVerilogBuilder(language_config, printer=QuietPrinter())
+    emitter = SystemVerilogEmitter("sv", language_config, printer=QuietPrinter(), template_suffix=".sv")
+
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    act_root = builder.build_act(rdl_root, context)
+    gc.collect()
+    size = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+
+    seen_ids, counts = set(), [0]
+    value_nodes(act_root, seen_ids, counts)
+
+    build, render = None, None
+    for _ in range(repeat):
+        del act_root
+        gc.collect()
+        start = time.perf_counter()
+        act_root = builder.build_act(rdl_root, context)
+        elapsed = time.perf_counter() - start
+        build = elapsed if build is None else min(build, elapsed)
+
+        start = time.perf_counter()
+        emitter.generate_act_code(act_root)
+        elapsed = time.perf_counter() - start
+        render = elapsed if render is None else min(render, elapsed)
+    return size, counts[0], len(seen_ids), build, render
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument('--fields', type=int, default=40000)
+    ap.add_argument('--repeat', type=int, default=3)
+    args = ap.parse_args()
+
+    rdl_root = compile_map(args.fields)
+    context = build_synthesis_context(rdl_root)
+    print(str.format("fields: {0}", args.fields))
+    for label, share_nodes in [('unshared', False), ('shared', True)]:
+        size, nodes, objects, build, render = measure(rdl_root, context, share_nodes, args.repeat)
+        print(str.format("  {0:8}: ACT {1:6.2f} MB  value nodes {2:,d} in {3:,d} objects  "
+                         "build {4:7.1f} ms  render {5:7.1f} ms",
+                         label, size / 2**20, nodes, objects, build * 1e3, render * 1e3))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+# Copyright © 2018 Mateusz Maciąg
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the “Software”), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software
+# is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS
+# OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+""" Per-node dispatch overhead of ACTVisitor on a large ACT.
+
+    python -m benchmarks.bench_visitor [--nodes 50000]
+
+Compares cached dispatch tables with the former per-node
+getattr/string-concatenation/print() dispatch.
+"""
+
+from pyrcom.act.common import ACTVisitor, ACTComposite
+from pyrcom.act.systemverilog import LogicalGroup, SignalDeclaration, Range
+
+import argparse
+import contextlib
+import io
+import time
+
+
+class NameVisitor (ACTVisitor):
+    """ Visitor doing as little as possible, so dispatch dominates """
+
+    def visit_SignalDeclaration(self, node):
+        return node.name
+
+    def visit_LogicalGroup(self, node):
+        return self.default_visit(node)
+
+
+class LegacyNameVisitor (NameVisitor):
+    """ Dispatch as it was done before dispatch tables """
+
+    def visit(self, node):
+        method = 'visit_' + node.__class__.__name__
+        visitor = getattr(self, method, self.default_visit)
+        print('Visiting %s' % node.__class__.__name__)
+        return visitor(node)
+
+
+def make_act(n_nodes, group_size=8):
+    """ Return (ACT root, number of nodes a visitor will dispatch) """
+    groups = []
+    count = 1
+    while count < n_nodes:
+        decls = [SignalDeclaration('sig_%d' % (count + i), 'wire', Range(31, 0))
+                 for i in range(group_size)]
+        groups.append(LogicalGroup(2, "group", *decls))
+        # group, its children tuple and declarations
+        count += group_size + 2
+    return ACTComposite(*groups), count
+
+
+def time_visit(visitor, root, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        visitor.visit(root)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument('--nodes', type=int, default=50000)
+    ap.add_argument('--repeat', type=int, default=5)
+    args = ap.parse_args()
+
+    root, count = make_act(args.nodes)
+
+    cached = time_visit(NameVisitor(), root, args.repeat)
+    traced = time_visit(NameVisitor(trace=lambda node: None), root, args.repeat)
+    with contextlib.redirect_stdout(io.StringIO()):
+        legacy = time_visit(LegacyNameVisitor(), root, args.repeat)
+
+    print(str.format("nodes visited: {0}", count))
+    for name, t in (("dispatch table", cached),
+                    ("dispatch table + trace hook", traced),
+                    ("legacy getattr + print", legacy)):
+        print(str.format("  {0:28s}: {1:8.2f} ms  {2:6.0f} ns/node",
+                         name, t * 1e3, t * 1e9 / count))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+# Copyright © 2018 Mateusz Maciąg
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the “Software”), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software
+# is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS
+# OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+""" Helpers shared by the benchmark scripts. """
+
+from systemrdl.messages import MessagePrinter
+
+from pyrcom.rc import RegisterCompiler
+from benchmarks.rdlgen import generate_rdl
+
+import os
+import tempfile
+
+
+class QuietPrinter (MessagePrinter):
+    def print_message(self, severity, text, src_ref=None):
+        pass
+
+
+def compile_rdl(name, **params):
+    """ Return elaborated root of `generate_rdl(name, **params)` """
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, name + '.rdl')
+        with open(path, 'w') as fd:
+            fd.write(generate_rdl(name, **params))
+        return RegisterCompiler(printer=QuietPrinter(), src_files=[path], warning_flags={}).compile()
+
+
+def compile_map(n_fields, fields_per_reg=4):
+    """ Return elaborated root of design 'bench' of about `n_fields` fields """
+    return compile_rdl('bench', n_regs=n_fields // fields_per_reg, fields_per_reg=fields_per_reg,
+                       intr_every=16)
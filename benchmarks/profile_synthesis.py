@@ -0,0 +1,110 @@
+# Copyright © 2018 Mateusz Maciąg
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the “Software”), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software
+# is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS
+# OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+""" Profile of SystemVerilogBuilder.build_act: wall time and number of
+systemrdl property resolutions done by the context walk and by the
+synthesis passes.
+
+    python -m benchmarks.profile_synthesis [--regs 2000] [--cprofile]
+"""
+
+from systemrdl import RDLWalker
+from systemrdl.node import Node
+
+from pyrcom.codegen.synthesis import SynthesisRDLContext
+from pyrcom.codegen.systemverilog import SystemVerilogBuilder, SynthesisFactory
+from benchmarks.common import QuietPrinter, compile_rdl
+
+import argparse
+import cProfile
+import gc
+import pstats
+import time
+
+
+SYNTHESIS_TASKS = ["hw_ports", "hw_reg_signals", "hw_intr_signals",
+                   "hw_reg_instances", "hw_intr_instances", "write_sel_decoder"]
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument('--regs', type=int, default=2000)
+    ap.add_argument('--fields', type=int, default=4)
+    ap.add_argument('--repeat', type=int, default=5, help="Report best of N runs")
+    ap.add_argument('--cprofile', action='store_true', help="Print top functions by cumulative time")
+    args = ap.parse_args()
+
+    rdl_root = compile_rdl('bench', n_regs=args.regs, fields_per_reg=args.fields, intr_every=16)
+
+    calls = [0]
+    get_property = Node.get_property
+
+    def counting_get_property(self, *args, **kwargs):
+        calls[0] += 1
+        return get_property(self, *args, **kwargs)
+
+    def stage(func):
+        best = None
+        for _ in range(args.repeat):
+            gc.collect()
+            calls[0] = 0
+            start = time.perf_counter()
+            result = func()
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        return result, best, calls[0]
+
+    def walk():
+        context = SynthesisRDLContext()
+        RDLWalker(unroll=True).walk(rdl_root, context)
+        return context
+
+    Node.get_property = counting_get_property
+    profiler = cProfile.Profile()
+    if args.cprofile:
+        profiler.enable()
+    try:
+        context, walk_time, walk_calls = stage(walk)
+        factory = SynthesisFactory(context)
+        _, synth_time, synth_calls = stage(
+            lambda: [factory.synthesise(task) for task in SYNTHESIS_TASKS])
+        _, fused_time, fused_calls = stage(
+            lambda: factory.synthesise_all(SYNTHESIS_TASKS))
+        builder = SystemVerilogBuilder({'design_name': 'bench'}, printer=QuietPrinter())
+        _, build_time, build_calls = stage(lambda: builder.build_act(rdl_root))
+    finally:
+        profiler.disable()
+        Node.get_property = get_property
+
+    print(str.format("registers: {0}, fields: {1}", args.regs, args.regs * args.fields))
+    print(str.format("  {0:22}: {1:8.1f} ms, {2:7d} get_property calls",
+                     "context walk", walk_time * 1e3, walk_calls))
+    print(str.format("  {0:22}: {1:8.1f} ms, {2:7d} get_property calls",
+                     "synthesis (per task)", synth_time * 1e3, synth_calls))
+    print(str.format("  {0:22}: {1:8.1f} ms, {2:7d} get_property calls",
+                     "synthesis (fused)", fused_time * 1e3, fused_calls))
+    print(str.format("  {0:22}: {1:8.1f} ms, {2:7d} get_property calls",
+                     "build_act (total)", build_time * 1e3, build_calls))
+    if args.cprofile:
+        pstats.Stats(profiler).sort_stats('cumulative').print_stats(15)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+# Copyright © 2018 Mateusz Maciąg
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the “Software”), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software
+# is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS
+# OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+""" Synthetic SystemRDL sources of configurable size. """
+
+import os
+
+
+def _register_lines(name, fields_per_reg, is_intr, indent):
+    field_width = max(1, 32 // fields_per_reg)
+    lines = [indent + "reg {"]
+    for f in range(fields_per_reg):
+        low = f * field_width
+        high = low + field_width - 1
+        if is_intr:
+            spec = "sw=rw; hw=w; intr; woclr;"
+            high = low
+        else:
+            spec = "sw=rw; hw=r; reset=0;"
+        lines.append(str.format("{0}    field {{ {1} }} f{2}[{3}:{4}];",
+                                indent, spec, f, high, low))
+    lines.append(indent + "} " + name)
+    return lines
+
+
+def generate_rdl(name, n_regs=16, fields_per_reg=4, intr_every=0,
+                 array_size=1, depth=0, branching=2):
+    """ Return SystemRDL text of addrmap `name`.
+
+    `n_regs` registers with `fields_per_reg` fields each are generated;
+    every `intr_every`-th register (0: none) holds interrupt flags. With
+    `array_size` > 1 every register is an array of that many elements.
+    With `depth` > 0 registers are spread over `branching` ** `depth`
+    regfiles nested `depth` levels deep.
+    """
+    lines = [str.format("addrmap {0} {{", name)]
+    counter = [0]
+
+    def registers(count, indent):
+        # Register offsets are relative to the enclosing component
+        stride = 4 * array_size
+        for i in range(count):
+            r = counter[0]
+            counter[0] += 1
+            is_intr = intr_every and (r % intr_every == intr_every - 1)
+            reg_lines = _register_lines(str.format("r{0}", r), fields_per_reg, is_intr, indent)
+            if array_size > 1:
+                reg_lines[-1] += str.format("[{0}] @0x{1:X} += 4;", array_size, i * stride)
+            else:
+                reg_lines[-1] += str.format(" @0x{0:X};", i * stride)
+            lines.extend(reg_lines)
+
+    def regfiles(count, level, indent):
+        if level == depth:
+            registers(count, indent)
+            return
+        for b in range(branching):
+            share = count // branching + (1 if b < count % branching else 0)
+            lines.append(indent + "regfile {")
+            regfiles(share, level + 1, indent + "    ")
+            lines.append(str.format("{0}}} rf{1}_{2};", indent, level, b))
+
+    regfiles(n_regs, 0, "    ")
+    lines.append("};")
+    return "\n".join(lines) + "\n"
+
+
+def write_blocks(directory, n_blocks, **kwargs):
+    """ Write `n_blocks` synthetic blocks into `directory`, return paths """
+    paths = []
+    for b in range(n_blocks):
+        path = os.path.join(directory, str.format("block{0}.rdl", b))
+        with open(path, "w") as fd:
+            fd.write(generate_rdl(str.format("block{0}", b), **kwargs))
+        paths.append(path)
+    return paths
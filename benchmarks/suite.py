@@ -0,0 +1,236 @@
+# Copyright © 2018 Mateusz Maciąg
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the “Software”), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software
+# is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS
+# OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+""" Scaling benchmark of the compiler pipeline on synthetic designs.
+
+    python -m benchmarks.suite [--case NAME ...] [--history FILE] [--check]
+
+Every case is generated with `rdlgen.generate_rdl` and run through the
+pipeline stages separately: RDL compilation and elaboration, ACT build and
+code rendering. Best wall time of `--repeat` runs and peak traced memory of
+an extra run (under tracemalloc, which is much slower) are reported for
+each stage. Results are appended to a JSON history file and compared with
+the previous result of the same case; with `--check` the exit status is 1
+when any stage got slower than `--threshold` times the previous time.
+"""
+
+from pyrcom.rc import RegisterCompiler
+from pyrcom.codegen.systemverilog import SystemVerilogEmitter, SystemVerilogBuilder
+from benchmarks.common import QuietPrinter
+from benchmarks.rdlgen import generate_rdl
+
+import argparse
+import gc
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+# =============================================================================
+
+# name -> generate_rdl arguments
+CASES = {
+    'small':    dict(n_regs=64, fields_per_reg=4, intr_every=16),
+    'medium':   dict(n_regs=1000, fields_per_reg=4, intr_every=16),
+    'large':    dict(n_regs=5000, fields_per_reg=8, intr_every=32),
+    'arrays':   dict(n_regs=250, fields_per_reg=4, array_size=8),
+    'nested':   dict(n_regs=1000, fields_per_reg=4, depth=4),
+}
+
+DEFAULT_CASES = ['small', 'medium', 'arrays', 'nested']
+
+STAGES = ['compile', 'build_act', 'render']
+
+DEFAULT_HISTORY = os.path.join('.benchmarks', 'pyrcom-history.json')
+
+
+# =============================================================================
+
+
+class Pipeline:
+    """ Pipeline stages of one design, each stage consuming previous result """
+
+    def __init__(self, src_path, design_name='bench'):
+        self.src_path = src_path
+        self.language_config = {'design_name': design_name}
+        self.printer = QuietPrinter()
+
+    def compile(self, _):
+        return RegisterCompiler(printer=self.printer, src_files=[self.src_path],
+                                warning_flags={}).compile()
+
+    def build_act(self, rdl_root):
+        return SystemVerilogBuilder(self.language_config, printer=self.printer).build_act(rdl_root)
+
+    def render(self, act_root):
+        emitter = SystemVerilogEmitter("sv", self.language_config, printer=self.printer,
+                                       template_suffix=".sv")
+        return emitter.visit(act_root)
+
+
+def measure(func, arg, repeat):
+    """ Return (result, best wall time, peak traced bytes) of func(arg) """
+    best = None
+    result = None
+    for _ in range(repeat):
+        result = None
+        gc.collect()
+        start = time.perf_counter()
+        result = func(arg)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+
+    result = None
+    gc.collect()
+    tracemalloc.start()
+    try:
+        result = func(arg)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return result, best, peak
+
+
+def run_case(name, params, repeat=3):
+    """ Run all stages of a case, return dictionary of stage -> results """
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, name + '.rdl')
+        with open(path, 'w') as fd:
+            fd.write(generate_rdl(name, **params))
+
+        pipeline = Pipeline(path)
+        stages = {}
+        value = None
+        for stage in STAGES:
+            value, wall, peak = measure(getattr(pipeline, stage), value, repeat)
+            stages[stage] = {'time': wall, 'peak_memory': peak}
+    return stages
+
+# =============================================================================
+# History
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                              text=True, check=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def load_history(path):
+    try:
+        with open(path, 'r') as fd:
+            history = json.load(fd)
+    except (OSError, ValueError):
+        return []
+    return history if isinstance(history, list) else []
+
+
+def save_history(path, history):
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as fd:
+        json.dump(history, fd, indent=1)
+    os.replace(tmp_path, path)
+
+
+def previous_result(history, case, params):
+    for entry in reversed(history):
+        if entry.get('case') == case and entry.get('params') == params:
+            return entry
+    return None
+
+
+def compare(entry, previous, threshold):
+    """ Return list of (stage, ratio) of stages slower than `threshold` """
+    regressions = []
+    for stage, result in entry['stages'].items():
+        before = previous['stages'].get(stage)
+        if before and before['time'] > 0:
+            ratio = result['time'] / before['time']
+            if ratio > threshold:
+                regressions.append((stage, ratio))
+    return regressions
+
+# =============================================================================
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument('--case', action='append', dest='cases', choices=sorted(CASES),
+                    help="Case to run (may be repeated), default: " + ", ".join(DEFAULT_CASES))
+    ap.add_argument('--repeat', type=int, default=3, help="Report best of N runs")
+    ap.add_argument('--history', default=DEFAULT_HISTORY, help="JSON history file")
+    ap.add_argument('--no-history', action='store_true', help="Do not store results")
+    ap.add_argument('--threshold', type=float, default=1.25,
+                    help="Slowdown ratio reported as regression")
+    ap.add_argument('--check', action='store_true', help="Exit with status 1 on regression")
+    args = ap.parse_args(argv)
+
+    history = load_history(args.history)
+    revision = git_revision()
+    regressed = False
+
+    for case in args.cases or DEFAULT_CASES:
+        params = CASES[case]
+        stages = run_case(case, params, args.repeat)
+        entry = {
+            'case': case,
+            'params': params,
+            'revision': revision,
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'stages': stages,
+        }
+        previous = previous_result(history, case, params)
+
+        print(str.format("{0}: {1}", case, ", ".join(
+            str.format("{0}={1}", k, v) for k, v in params.items())))
+        for stage, result in stages.items():
+            line = str.format("  {0:10}: {1:9.1f} ms  {2:8.1f} MB peak",
+                              stage, result['time'] * 1e3, result['peak_memory'] / 2**20)
+            if previous and stage in previous['stages']:
+                line += str.format("  ({0:+.0%} vs {1})",
+                                   result['time'] / previous['stages'][stage]['time'] - 1,
+                                   previous.get('revision') or 'previous')
+            print(line)
+
+        if previous:
+            for stage, ratio in compare(entry, previous, args.threshold):
+                regressed = True
+                print(str.format("  REGRESSION: {0} is {1:.2f}x slower", stage, ratio))
+        history.append(entry)
+
+    if not args.no_history:
+        save_history(args.history, history)
+
+    return 1 if (args.check and regressed) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
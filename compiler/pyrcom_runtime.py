@@ -20,48 +20,23 @@
 
 # Python Register Compiler - reference implementation
 
-from pyrcom.rc import RegisterCompiler
-from pyrcom.exceptions import PyrcomError
-from pyrcom.codegen.systemverilog import SystemVerilogEmitter, SystemVerilogBuilder
-from systemrdl.messages import MessagePrinter
-from systemrdl.messages import RDLCompileError
+# Only modules needed to parse command line are imported here: compiler,
+# templates and language backends are loaded once arguments are valid, so
+# --help and argument errors do not pay for them.
+from pyrcom.cache import DEFAULT_CACHE_SIZE
+from pyrcom.batch import CompileJob, parse_language_option
 
 import argparse
 import collections
-
-class RDLArgumentError(RDLCompileError):
-    """ Command line argument error """
-    pass
-
-
-class RDLMessagePrinter(MessagePrinter):
-
-    def __init__(self):
-        self.severity_desc = { "error" : True, "warning" : True, "info" : False, "debug" : False }
-
-    def enable(self, severity):
-        self.severity_desc[severity] = True
-
-    def disable(self, severity):
-        self.severity_desc[severity] = False
-
-    def print_message(self, severity, text, src_ref=None):
-
-        if severity in self.severity_desc and self.severity_desc[severity]:
-            if (severity == "warning" or severity == "error"):
-                # use built in support for these severities
-                lines = self.format_message(severity, text, src_ref)
-                self.emit_message(lines)
-            else:
-                # just emit simple message
-                self.emit_message([str.format("{0}: {1}", severity, text)])
+import os
+import sys
 
 
 class RDLCommandLineRunner:
 
-    def __init__(self, printer):
+    def __init__(self, printer=None):
+        # Default printer is created by `run`, after parsing arguments
         self.printer = printer
-        pass
 
     def createArgumentParser(self):
         ap = argparse.ArgumentParser()
@@ -107,18 +82,169 @@ class RDLCommandLineRunner:
             dest='debug_mode',
             help="Enable compiler debug mode (with yet more compiler status print out)."
         )
+        ap.add_argument(
+            '--cache-dir',
+            metavar='<dir>',
+            type=str,
+            dest='cache_dir',
+            help="Directory of elaborated RDL cache. "
+            "If unset, per-user cache directory is used."
+        )
+        ap.add_argument(
+            '--cache-size',
+            metavar='<MiB>',
+            type=int,
+            dest='cache_size',
+            default=DEFAULT_CACHE_SIZE // (1024 * 1024),
+            help="Maximum size of elaborated RDL cache in MiB. "
+            "Least recently used entries are evicted first."
+        )
+        ap.add_argument(
+            '--no-cache',
+            action='store_true',
+            dest='no_cache',
+            help="Always compile and elaborate sources, do not use elaborated RDL cache."
+        )
+        ap.add_argument(
+            '-n', '--design-name',
+            metavar='<name>',
+            type=str,
+            dest='design_name',
+            default=CompileJob.DEFAULT_DESIGN_NAME,
+            help="Name of generated design (top-level module name)."
+        )
+        ap.add_argument(
+            '-l', '--language',
+            metavar='<name>',
+            type=str,
+            dest='language',
+            help="Language backend generating the output (default: sv). "
+            "See --list-languages."
+        )
+        ap.add_argument(
+            '--emit',
+            metavar='<language>=<file>',
+            type=str,
+            action='append',
+            dest='emit',
+            help="Also generate output of another language backend from the same "
+            "compiled design, e.g. --emit c=regs.h --emit md=regs.md."
+        )
+        ap.add_argument(
+            '-D', '--define',
+            metavar='<option>=<value>',
+            type=str,
+            action='append',
+            dest='language_options',
+            help="Set option of the language backend, e.g. -D decoder=tree "
+            "-D roll_arrays=true -D read_mux_pipeline=1,3."
+        )
+        ap.add_argument(
+            '--list-languages',
+            action='store_true',
+            dest='list_languages',
+            help="List available language backends and exit."
+        )
         ap.add_argument(
             '-O', '--output',
             metavar='<file>',
             type=str,
-            required=True,
             dest='output_path',
-            help="Compile output artifact."
+            help="Compile output artifact (output directory with --incremental)."
+        )
+        ap.add_argument(
+            '--address-map',
+            metavar='<file>',
+            type=str,
+            dest='address_map_path',
+            help="Also write binary address map index (for firmware and simulation tools)."
+        )
+        ap.add_argument(
+            '--save-act',
+            metavar='<file>',
+            type=str,
+            dest='save_act_path',
+            help="Also save the built ACT, so output can be written again with "
+            "--load-act without compiling sources."
+        )
+        ap.add_argument(
+            '--load-act',
+            metavar='<file>',
+            type=str,
+            dest='load_act_path',
+            help="Write output of ACT saved with --save-act instead of compiling "
+            "input files."
+        )
+        ap.add_argument(
+            '--incremental',
+            action='store_true',
+            dest='incremental',
+            help="Write each generated module into its own file in the output directory. "
+            "Files whose content did not change are not rewritten."
+        )
+        ap.add_argument(
+            '--batch',
+            metavar='<manifest>',
+            type=str,
+            dest='batch_manifest',
+            help="Run all jobs listed in JSON/YAML manifest file in this process. "
+            "Jobs which fail do not stop the others."
+        )
+        ap.add_argument(
+            '-j', '--jobs',
+            metavar='<N>',
+            type=int,
+            dest='workers',
+            default=1,
+            help="Number of worker processes used to run batch jobs in parallel. "
+            "0 selects number of available CPUs."
+        )
+        ap.add_argument(
+            '--server',
+            action='store_true',
+            dest='server',
+            help="Run as compile server: serve JSON-RPC requests read from stdin, "
+            "keeping compiled sources and generated code in memory."
+        )
+        ap.add_argument(
+            '--server-socket',
+            metavar='<path>',
+            type=str,
+            dest='server_socket',
+            help="Serve compile server requests from connections to Unix socket <path>."
+        )
+        ap.add_argument(
+            '--profile',
+            action='store_true',
+            dest='profile',
+            help="Print wall time, CPU time and peak RSS of every compilation stage."
+        )
+        ap.add_argument(
+            '--stats-json',
+            metavar='<file>',
+            type=str,
+            dest='stats_json',
+            help="Write per-stage measurements (as printed by --profile) to JSON file."
+        )
+        ap.add_argument(
+            '--cprofile',
+            metavar='<file>',
+            type=str,
+            dest='cprofile_path',
+            help="Run under cProfile and write profile data to file (see pstats). "
+            "Jobs run by worker processes are not included."
+        )
+        ap.add_argument(
+            '--tracemalloc',
+            action='store_true',
+            dest='tracemalloc',
+            help="Trace Python memory allocations, so peak traced memory of every "
+            "stage is measured as well. Slows compilation down considerably."
         )
         ap.add_argument(
             'src_files',
             metavar='src',
-            nargs='+',
+            nargs='*',
             type=str,
             help="List of input files"
         )
@@ -147,6 +273,7 @@ class RDLCommandLineRunner:
                 flagName = flag[3:] if isNo else flag
 
                 if flagName not in supported:
+                    from pyrcom.messages import RDLArgumentError
                     raise RDLArgumentError(str.format(
                         "Unsupported warning flag '-W{0}'", flag))
 
@@ -156,49 +283,177 @@ class RDLCommandLineRunner:
                 suppressed[flagName] = isNo
         return suppressed
 
+    def createJobs(self, cfg):
+        if cfg.batch_manifest:
+            from pyrcom.batch import load_manifest
+            return load_manifest(cfg.batch_manifest)
+
+        return [CompileJob(
+            cfg.src_files,
+            cfg.output_path,
+            top_def_name=cfg.top_def_name,
+            design_name=cfg.design_name,
+            incl_search_paths=cfg.incl_search_paths,
+            skip_not_present=cfg.skip_not_present,
+            warning_spec=cfg.warning_spec,
+            incremental=cfg.incremental,
+            address_map_path=cfg.address_map_path,
+            language=cfg.language,
+            extra_outputs=cfg.extra_outputs,
+            save_act_path=cfg.save_act_path,
+            load_act_path=cfg.load_act_path,
+            language_config=cfg.language_config
+        )]
+
+    def reportJob(self, result, is_batch):
+        prefix = str.format("[{0}] ", result.job.name) if is_batch else ""
+        if result.success:
+            stages = ", ".join(str.format("{0} {1:.3f}s", stage, t)
+                               for stage, t in result.timings.items())
+            self.printer.print_message("info", str.format(
+                "{0}done in {1:.3f}s ({2})", prefix, result.total_time, stages), None)
+        else:
+            self.printer.print_message("error", prefix + result.error, None)
+
     def run(self):
+        """ Run compilation, return number of failed jobs """
+
+        parser = self.createArgumentParser()
+        cfg = parser.parse_args()
+
+        if cfg.list_languages:
+            from pyrcom.codegen.registry import available_backends
+            for name in available_backends():
+                print(name)
+            return 0
+
+        serve = cfg.server or cfg.server_socket
+        if serve:
+            if cfg.batch_manifest or cfg.output_path or cfg.src_files \
+                    or cfg.save_act_path or cfg.load_act_path or cfg.language_options:
+                parser.error("--server cannot be combined with --batch, -O/--output, "
+                             "--save-act, --load-act, -D or input files")
+        elif not cfg.batch_manifest:
+            if not cfg.output_path:
+                parser.error("the following arguments are required: -O/--output")
+            if cfg.load_act_path:
+                if cfg.src_files or cfg.incremental or cfg.address_map_path or cfg.emit \
+                        or cfg.save_act_path or cfg.language_options:
+                    parser.error("--load-act cannot be combined with --incremental, "
+                                 "--address-map, --emit, --save-act, -D or input files")
+            elif not cfg.src_files:
+                parser.error("the following arguments are required: src")
+            if cfg.save_act_path and (cfg.incremental or cfg.emit):
+                parser.error("--save-act cannot be combined with --incremental or --emit")
+        elif cfg.output_path or cfg.src_files or cfg.incremental or cfg.address_map_path \
+                or cfg.language or cfg.emit or cfg.save_act_path or cfg.load_act_path \
+                or cfg.language_options:
+            parser.error("--batch cannot be combined with -O/--output, --incremental, "
+                         "--address-map, --language, --emit, --save-act, --load-act, -D "
+                         "or input files")
+        cfg.extra_outputs = {}
+        for spec in cfg.emit or []:
+            language, sep, path = spec.partition('=')
+            if not (language and sep and path):
+                parser.error(str.format("invalid --emit '{0}', expected <language>=<file>", spec))
+            cfg.extra_outputs[language] = path
+        cfg.language_config = {}
+        for spec in cfg.language_options or []:
+            try:
+                name, value = parse_language_option(spec)
+            except ValueError as e:
+                parser.error(str(e))
+            cfg.language_config[name] = value
+        if cfg.workers < 0:
+            parser.error("number of jobs cannot be negative")
+
+        from systemrdl import RDLCompileError
+        from pyrcom.exceptions import PyrcomError
+        from pyrcom.cache import CompilationCache
+
+        if self.printer is None:
+            from pyrcom.messages import RDLMessagePrinter
+            self.printer = RDLMessagePrinter()
 
         try:
-            parser = self.createArgumentParser()
-            cfg = parser.parse_args()
-            cfg.warning_flags = self.getWarningFlags(cfg.warning_spec)
-
             if cfg.debug_mode:
                 self.printer.enable('info')
                 self.printer.enable('debug')
             elif cfg.verbose_mode:
                 self.printer.enable('info')
 
-            compiler = RegisterCompiler(
-                printer=self.printer,
-                incl_search_paths=cfg.incl_search_paths,
-                top_def_name=cfg.top_def_name,
-                skip_not_present=cfg.skip_not_present,
-                warning_flags=cfg.warning_flags,
-                src_files=cfg.src_files
-            )
-
-            self.printer.print_message("info", "Start code compilation ...")
-            rdl_root = compiler.compile()
-
-            # TODO: select and configure generator from config
-            self.printer.print_message("info", "Generating ...")
-            language_config = {'design_name' : 'mydev'}
-            code_generator = SystemVerilogEmitter("sv", language_config, printer=self.printer, template_suffix=".sv")
-            language_builder = SystemVerilogBuilder(language_config, printer=self.printer)
-            code = code_generator.generate_code(language_builder, rdl_root)
-
-            self.printer.print_message("info", "Writing output ...")
-            with open(cfg.output_path, "w") as fd:
-                fd.write(code)
+            cache = None
+            if not cfg.no_cache:
+                cache = CompilationCache(cfg.cache_dir, cfg.cache_size * 1024 * 1024)
+
+            if serve:
+                from pyrcom.server import CompileServer
+                server = CompileServer(self.getWarningFlags, cache)
+                if cfg.server_socket:
+                    server.serve_unix(cfg.server_socket)
+                else:
+                    server.serve_stream(sys.stdin, sys.stdout)
+                return 0
+
+            jobs = self.createJobs(cfg)
+
+            # Validate flags of all jobs before running any of them
+            job_warning_flags = [self.getWarningFlags(job.warning_spec) for job in jobs]
 
         except (RDLCompileError, PyrcomError) as e:
             message = str(e)
             if hasattr(e, '__cause__') and e.__cause__:
                 message = "%s Details: %s" % (message, e.__cause__)
             self.printer.print_message("error", message, None)
+            return 1
+
+        from pyrcom.batch import run_jobs
+        from pyrcom.stats import write_stats_json
+        import cProfile
+        import tracemalloc
+
+        is_batch = bool(cfg.batch_manifest)
+        workers = cfg.workers or os.cpu_count() or 1
+        profile = cfg.profile or bool(cfg.stats_json)
 
+        profiler = cProfile.Profile() if cfg.cprofile_path else None
+        if cfg.tracemalloc:
+            tracemalloc.start()
+        if profiler:
+            profiler.enable()
+
+        failed = 0
+        job_stats = []
+        try:
+            for result in run_jobs(jobs, self.printer, job_warning_flags, cache, workers,
+                                   trace=cfg.debug_mode, profile=profile):
+                self.reportJob(result, is_batch)
+                if not result.success:
+                    failed += 1
+                if result.stats is not None:
+                    job_stats.append((result.job.name, result.stats))
+        finally:
+            if profiler:
+                profiler.disable()
+            if cfg.tracemalloc:
+                tracemalloc.stop()
+
+        if is_batch:
+            self.printer.print_message("info", str.format(
+                "Batch finished: {0} job(s), {1} failed", len(jobs), failed), None)
+
+        if cfg.profile:
+            for name, stats in job_stats:
+                header = [str.format("Profile of '{0}':", name)] if is_batch else []
+                self.printer.emit_message(header + stats.format_table())
+        if cfg.stats_json:
+            write_stats_json(cfg.stats_json, job_stats, {'workers': workers})
+        if profiler:
+            profiler.dump_stats(cfg.cprofile_path)
+
+        return failed
 
 
 if __name__ == "__main__":
-    RDLCommandLineRunner(RDLMessagePrinter()).run()
+    failed = RDLCommandLineRunner().run()
+    sys.exit(1 if failed else 0)
@@ -1,9 +1,9 @@
 #!/usr/bin/env python
 
-from distutils.core import setup
 from glob import glob
+from os.path import basename, splitext
 
-from setuptools import find_packages
+from setuptools import setup, find_packages
 
 setup(name='Python Register Compiler',
       version='0.1',
@@ -11,5 +11,17 @@ setup(name='Python Register Compiler',
       author='Mateusz Maciąg',
       packages=find_packages('src'),
       package_dir={'': 'src'},
+      package_data={'pyrcom.codegen': ['template/*/*.*', 'template/*/*/*.*']},
+      python_requires='>=3.9',
       py_modules=[splitext(basename(path))[0] for path in glob('src/*.py')],
+      entry_points={
+          'console_scripts': [
+              'pyrcom-precompile-templates = pyrcom.codegen.precompile:main',
+          ],
+          'pyrcom.backends': [
+              'sv = pyrcom.codegen.systemverilog:SYSTEMVERILOG_BACKEND',
+              'c = pyrcom.codegen.regmap:C_HEADER_BACKEND',
+              'md = pyrcom.codegen.regmap:MARKDOWN_BACKEND',
+          ],
+      },
       )
@@ -22,12 +22,40 @@
 
 
 class ACTVisitor:
+    """ Base class of ACT visitors.
+
+    Node of class `X` is dispatched to `visit_X` method, or `default_visit`
+    if visitor does not define it. Lookup result is cached in dispatch table
+    of the visitor class, so it is resolved once per node class.
+    """
+
+    # Dispatch tables: node class -> function, one pair per visitor class
+    _visit_table = {}
+    _stream_table = {}
+
+    # Optional callable invoked with each visited node (debug tracing)
+    _trace = None
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._visit_table = {}
+        cls._stream_table = {}
+
+    def __init__(self, trace=None):
+        self._trace = trace
 
     def visit(self, node):
-        method = 'visit_' + node.__class__.__name__
-        visitor = getattr(self, method, self.default_visit)
-        print('Visiting %s' % node.__class__.__name__)
-        return visitor(node)
+        node_class = node.__class__
+        try:
+            visitor = self._visit_table[node_class]
+        except KeyError:
+            visitor_class = type(self)
+            visitor = getattr(visitor_class, 'visit_' + node_class.__name__,
+                              visitor_class.default_visit)
+            self._visit_table[node_class] = visitor
+        if self._trace:
+            self._trace(node)
+        return visitor(self, node)
 
     def default_visit(self, node):
         if hasattr(node, '__getitem__'):
@@ -43,6 +71,50 @@ class ACTVisitor:
             ret.append(self.visit(c))
         return '\n'.join(ret)
 
+    # Streaming counterpart of visit(): yields output in chunks. Output
+    # is the same as visit() would return, but it is never concatenated
+    # into one string.
+
+    def visit_stream(self, node):
+        node_class = node.__class__
+        try:
+            streamer = self._stream_table[node_class]
+        except KeyError:
+            streamer = self._stream_table[node_class] = self._lookup_streamer(node_class)
+        if self._trace and streamer is not ACTVisitor._stream_leaf:
+            self._trace(node)
+        return streamer(self, node)
+
+    def _lookup_streamer(self, node_class):
+        name = node_class.__name__
+        visitor_class = type(self)
+        streamer = getattr(visitor_class, 'stream_' + name, None)
+        if streamer:
+            return streamer
+        if hasattr(visitor_class, 'visit_' + name):
+            return ACTVisitor._stream_leaf
+        return visitor_class.default_stream
+
+    def _stream_leaf(self, node):
+        # Leaf nodes are rendered at once
+        return iter((self.visit(node),))
+
+    def default_stream(self, node):
+        if hasattr(node, '__getitem__'):
+            return self._stream_iterable(node)
+        elif hasattr(node, 'children'):
+            return self._stream_iterable(node.children)
+        else:
+            return iter((str(node),))
+
+    def _stream_iterable(self, iterable):
+        first = True
+        for c in iterable:
+            if not first:
+                yield '\n'
+            first = False
+            yield from self.visit_stream(c)
+
 # =============================================================================
 
 
@@ -56,7 +128,13 @@ class ACTBuilder:
 
 
 class ACTNode:
-    """ Abstract Component Tree node base class """
+    """ Abstract Component Tree node base class.
+
+    Nodes are numerous and never get ad-hoc attributes, so every node
+    class declares `__slots__` to avoid per-instance dictionaries.
+    """
+
+    __slots__ = ()
 
     def __repr__(self):
         return "ACTNode:%s <children:%d>" % (self.__class__.__name__, len(self.children))
@@ -68,9 +146,79 @@ class ACTNode:
 # =============================================================================
 
 
+class ValueNode (ACTNode):
+    """ Leaf node defined by its content only.
+
+    Value nodes are compared and hashed by class and slot values, and equal
+    nodes are shared by many parents (see `NodeInterner`). Slots are set by
+    `__init__` only and must never be reassigned afterwards: a changed node
+    would change all its parents and break hashes of dictionaries holding
+    it. Slot values must be hashable and immutable as well. This is not
+    enforced by `__setattr__`, which would slow down node construction
+    many times.
+    """
+
+    __slots__ = ()
+
+    # Slots of all classes of the node, set for each subclass
+    _value_slots = ()
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        slots = []
+        for klass in reversed(cls.__mro__):
+            for name in klass.__dict__.get('__slots__', ()):
+                if name not in slots:
+                    slots.append(name)
+        cls._value_slots = tuple(slots)
+
+    def _value(self):
+        return tuple(getattr(self, name) for name in self._value_slots)
+
+    def __eq__(self, other):
+        if other.__class__ is not self.__class__:
+            return NotImplemented
+        return self is other or self._value() == other._value()
+
+    def __ne__(self, other):
+        result = self.__eq__(other)
+        return result if result is NotImplemented else not result
+
+    def __hash__(self):
+        return hash((self.__class__, self._value()))
+
+
+class NodeInterner:
+    """ Factory of shared value nodes (hash consing): `nodes(cls, *args)`
+    returns the node created first with the same class and arguments, so
+    equal nodes are kept in memory once. With `share` unset every call
+    creates a new node. """
+
+    def __init__(self, share=True):
+        self._nodes = {} if share else None
+
+    def __call__(self, cls, *args):
+        nodes = self._nodes
+        if nodes is None:
+            return cls(*args)
+        key = (cls,) + args
+        node = nodes.get(key)
+        if node is None:
+            node = nodes[key] = cls(*args)
+        return node
+
+    def __len__(self):
+        """ Number of distinct nodes created """
+        return len(self._nodes) if self._nodes is not None else 0
+
+# =============================================================================
+
+
 class ACTComposite (ACTNode):
     """ Composite node. """
 
+    __slots__ = ('_children',)
+
     def __init__(self, *args):
         self._children = args
         pass
@@ -83,6 +231,9 @@ class ACTComposite (ACTNode):
 
 
 class GenericLayout (ACTComposite):
+
+    __slots__ = ('_header', '_footer')
+
     def __init__(self, header=None, footer=None, *args):
         super(GenericLayout, self).__init__(args)
         self._header = header
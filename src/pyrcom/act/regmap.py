@@ -0,0 +1,156 @@
+# Copyright © 2018 Mateusz Maciąg
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the “Software”), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software
+# is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS
+# OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+""" Abstract Component Tree of register map descriptions: language
+independent list of registers and their fields, used by software header
+and documentation backends. """
+
+from pyrcom.act.common import ACTNode, ACTComposite
+
+from sys import intern
+
+# =============================================================================
+
+
+class RegisterMap (ACTComposite):
+    """ Register map of a design, children are `RegisterDescription` nodes """
+
+    __slots__ = ('_name',)
+
+    def __init__(self, name, *registers):
+        super(RegisterMap, self).__init__(*registers)
+        self._name = intern(name)
+
+    @property
+    def name(self):
+        return self._name
+
+    @property
+    def registers(self):
+        return self._children
+
+# =============================================================================
+
+
+class RegisterDescription (ACTComposite):
+    """ Register, children are `FieldDescription` nodes. Rolled register
+    array (see `SynthesisContext.roll_arrays`) is one description with
+    `array_size` elements, `address` and `offset` are of its first element. """
+
+    __slots__ = ('_name', '_path', '_offset', '_address', '_array_size', '_array_stride')
+
+    def __init__(self, name, path, offset, address, *fields, array_size=0, array_stride=0):
+        super(RegisterDescription, self).__init__(*fields)
+        self._name = intern(name)
+        self._path = path
+        self._offset = offset
+        self._address = address
+        self._array_size = array_size
+        self._array_stride = array_stride
+
+    @property
+    def name(self):
+        return self._name
+
+    @property
+    def path(self):
+        """ Path relative to the top addrmap with array indices, e.g.
+        'rf[1].ctrl[0]'. Indices of rolled array are not included. """
+        return self._path
+
+    @property
+    def offset(self):
+        return self._offset
+
+    @property
+    def address(self):
+        return self._address
+
+    @property
+    def is_array(self):
+        return self._array_size != 0
+
+    @property
+    def array_size(self):
+        return self._array_size
+
+    @property
+    def array_stride(self):
+        return self._array_stride
+
+    @property
+    def fields(self):
+        return self._children
+
+# =============================================================================
+
+
+class FieldDescription (ACTNode):
+
+    __slots__ = ('_name', '_high', '_low', '_sw', '_hw', '_reset', '_is_interrupt')
+
+    def __init__(self, name, high, low, sw, hw, reset=None, is_interrupt=False):
+        self._name = intern(name)
+        self._high = high
+        self._low = low
+        self._sw = sw
+        self._hw = hw
+        self._reset = reset
+        self._is_interrupt = is_interrupt
+
+    @property
+    def name(self):
+        return self._name
+
+    @property
+    def high(self):
+        return self._high
+
+    @property
+    def low(self):
+        return self._low
+
+    @property
+    def width(self):
+        return self._high - self._low + 1
+
+    @property
+    def mask(self):
+        """ Mask of field bits within register """
+        return ((1 << self.width) - 1) << self._low
+
+    @property
+    def sw(self):
+        """ Software access, name of RDL access type """
+        return self._sw
+
+    @property
+    def hw(self):
+        """ Hardware access, name of RDL access type """
+        return self._hw
+
+    @property
+    def reset(self):
+        """ Reset value or None """
+        return self._reset
+
+    @property
+    def is_interrupt(self):
+        return self._is_interrupt
@@ -0,0 +1,212 @@
+# Copyright © 2018 Mateusz Maciąg
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the “Software”), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software
+# is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS
+# OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+""" Binary serialization of built ACTs.
+
+Saved ACT is emitted without the RDL tree it was built from, so it can be
+cached, shipped to other processes or re-emitted with changed templates
+without compiling RDL sources again. Layout of saved ACT:
+
+    header      '<8sHHI': magic b'PYRCOACT', format version, pickle
+                protocol P, size M of metadata
+    metadata    M bytes: pickle of dict with pyrcom version, node layout
+                digest, language name and language configuration the ACT
+                was built with
+    root        pickle (protocol P) of ACT root node
+
+Only ACT node classes and decoder models (see `node_classes`) are resolved
+when loading, so loading a damaged or foreign file cannot construct other
+objects. Node classes are not a stable interface: ACT is loaded only if
+slots of all node classes are the same as when it was saved (see
+`layout_digest`).
+"""
+
+import pyrcom
+from pyrcom.exceptions import PyrcomError
+
+import hashlib
+import importlib
+import io
+import pickle
+import struct
+
+# =============================================================================
+
+MAGIC = b'PYRCOACT'
+# Bump whenever the container layout (header, metadata) changes. Layout of
+# nodes is checked with `layout_digest`.
+ACT_FORMAT_VERSION = 2
+ACT_PICKLE_PROTOCOL = 5
+
+_HEADER = struct.Struct('<8sHHI')
+
+# Modules defining classes ACTs are made of
+_NODE_MODULES = (
+    'pyrcom.act.common',
+    'pyrcom.act.systemverilog',
+    'pyrcom.act.regmap',
+    'pyrcom.codegen.systemverilog',
+    'pyrcom.codegen.decoder',
+)
+
+_node_classes = None
+_layout_digest = None
+
+
+class ACTFormatError(PyrcomError):
+    """ Saved ACT is damaged, of unsupported version or saved with
+    different node classes """
+    pass
+
+
+def node_classes():
+    """ Return dictionary (module, class name) -> class of all classes a
+    saved ACT may contain: ACT nodes and decoder models defined in the node
+    modules. Classes only imported by these modules are not included. """
+    global _node_classes
+    if _node_classes is None:
+        from pyrcom.act.common import ACTNode
+        from pyrcom.codegen.decoder import DecodeNode, DecodeTree, MuxNode, MuxTree
+        models = (DecodeNode, DecodeTree, MuxNode, MuxTree)
+        classes = {}
+        for module_name in _NODE_MODULES:
+            for obj in vars(importlib.import_module(module_name)).values():
+                if isinstance(obj, type) and obj.__module__ == module_name and \
+                        (issubclass(obj, ACTNode) or obj in models):
+                    classes[(module_name, obj.__qualname__)] = obj
+        _node_classes = classes
+    return _node_classes
+
+
+def _all_slots(cls):
+    return [name for klass in reversed(cls.__mro__)
+            for name in klass.__dict__.get('__slots__', ())]
+
+
+def layout_digest():
+    """ Return digest of names and slots of all `node_classes`. Node
+    classes keep their state in slots only, so the digest changes whenever
+    the layout of pickled nodes does. """
+    global _layout_digest
+    if _layout_digest is None:
+        h = hashlib.sha256()
+        for (module, name), cls in sorted(node_classes().items()):
+            h.update(str.format("{0}.{1}:{2}\n", module, name, ','.join(_all_slots(cls)))
+                     .encode('utf-8'))
+        _layout_digest = h.hexdigest()
+    return _layout_digest
+
+
+class _ACTUnpickler (pickle.Unpickler):
+
+    def find_class(self, module, name):
+        cls = node_classes().get((module, name))
+        if cls is None:
+            raise pickle.UnpicklingError(str.format(
+                "Class '{0}.{1}' is not allowed in saved ACT", module, name))
+        return cls
+
+
+def _load(data):
+    try:
+        return _ACTUnpickler(io.BytesIO(data)).load()
+    except (pickle.UnpicklingError, EOFError, ValueError, TypeError,
+            AttributeError, ImportError) as e:
+        raise ACTFormatError("Saved ACT is damaged") from e
+
+# =============================================================================
+
+
+class SavedACT:
+    """ ACT root node together with the language and language configuration
+    it was built with """
+
+    def __init__(self, root, language, language_config, pyrcom_version=pyrcom.__version__):
+        self._root = root
+        self._language = language
+        self._language_config = dict(language_config)
+        self._pyrcom_version = pyrcom_version
+
+    @property
+    def root(self):
+        return self._root
+
+    @property
+    def language(self):
+        """ Name of language backend which built the ACT """
+        return self._language
+
+    @property
+    def language_config(self):
+        return self._language_config
+
+    @property
+    def pyrcom_version(self):
+        return self._pyrcom_version
+
+    # Serialization
+    #
+
+    def to_bytes(self):
+        metadata = pickle.dumps({
+            'pyrcom_version': self._pyrcom_version,
+            'layout': layout_digest(),
+            'language': self._language,
+            'language_config': self._language_config,
+        }, protocol=ACT_PICKLE_PROTOCOL)
+        return b''.join([
+            _HEADER.pack(MAGIC, ACT_FORMAT_VERSION, ACT_PICKLE_PROTOCOL, len(metadata)),
+            metadata,
+            pickle.dumps(self._root, protocol=ACT_PICKLE_PROTOCOL)
+        ])
+
+    @classmethod
+    def from_bytes(cls, data):
+        if len(data) < _HEADER.size:
+            raise ACTFormatError("Saved ACT is truncated")
+        magic, version, _, metadata_size = _HEADER.unpack_from(data)
+        if magic != MAGIC:
+            raise ACTFormatError("Data is not a saved ACT")
+        if version != ACT_FORMAT_VERSION:
+            raise ACTFormatError(str.format("Unsupported ACT format version {0}", version))
+
+        # Pickles are read in place, large ACTs are not copied
+        view = memoryview(data)
+        offset = _HEADER.size
+        metadata = _load(view[offset:offset + metadata_size])
+        if not isinstance(metadata, dict):
+            raise ACTFormatError("Saved ACT metadata is damaged")
+        if metadata.get('layout') != layout_digest():
+            raise ACTFormatError(str.format(
+                "ACT was saved by pyrcom {0} with different node classes, "
+                "it can not be loaded by this version", metadata.get('pyrcom_version')))
+
+        root = _load(view[offset + metadata_size:])
+        return cls(root, metadata['language'], metadata['language_config'],
+                   metadata['pyrcom_version'])
+
+    def write(self, path):
+        with open(path, 'wb') as fd:
+            fd.write(self.to_bytes())
+
+    @classmethod
+    def read(cls, path):
+        with open(path, 'rb') as fd:
+            return cls.from_bytes(fd.read())
@@ -18,9 +18,11 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
 # THE SOFTWARE.
 
-from pyrcom.act.common import ACTNode, ACTComposite
+from pyrcom.act.common import ACTNode, ACTComposite, ValueNode
 from pyrcom.exceptions import CodegenError
 
+from sys import intern
+
 # =============================================================================
 # Abstract Component Tree classes
 # =============================================================================
@@ -34,10 +36,12 @@ Composite = ACTComposite
 class LogicalGroup (Composite):
     """ Represent logically grouped code components """
 
+    __slots__ = ('_level', '_description')
+
     def __init__(self, level, description="", *args):
         super(LogicalGroup, self).__init__(args)
         self._level = level
-        self._description = description
+        self._description = intern(description)
 
     @property
     def level(self):
@@ -51,9 +55,11 @@ class LogicalGroup (Composite):
 # =============================================================================
 
 
-class Range (ACTNode):
+class Range (ValueNode):
     """ Represents SystemVerilog style bit vector range """
 
+    __slots__ = ('_high', '_low')
+
     def __init__(self, high=0, low=0):
         self._high = high
         self._low = low
@@ -79,12 +85,39 @@ class Range (ACTNode):
     def low(self):
         return self._low
 
+
+class ArrayRange (ValueNode):
+    """ Represents packed array dimension, optionally of vector elements:
+    `[size-1:0]` or `[size-1:0][high:low]` """
+
+    __slots__ = ('_size', '_element_range')
+
+    def __init__(self, size, element_range=None):
+        self._size = size
+        self._element_range = element_range
+
+    def __repr__(self):
+        return str.format("{0}:0", self._size - 1)
+
+    def __str__(self):
+        return '[' + repr(self) + ']' + (str(self._element_range) if self._element_range else '')
+
+    @property
+    def size(self):
+        return self._size
+
+    @property
+    def element_range(self):
+        return self._element_range
+
 # =============================================================================
 
 
-class Port (ACTNode):
+class Port (ValueNode):
     """ Represents port declaration in SystemVerilog module definition """
 
+    __slots__ = ('_name', '_direction', '_range')
+
     def __init__(self, name, direction="input", range=None):
         self._name = name
         self._direction = direction
@@ -118,9 +151,11 @@ class Port (ACTNode):
 # =============================================================================
 
 
-class SignalDeclaration (ACTNode):
+class SignalDeclaration (ValueNode):
     """ Represents logic or wire declaration """
 
+    __slots__ = ('_name', '_kind', '_range')
+
     def __init__(self, name, kind="wire", range=None):
         self._name = name
         self._kind = kind
@@ -151,8 +186,11 @@ class SignalDeclaration (ACTNode):
 
 # =============================================================================
 
-class Net (ACTNode):
+class Net (ValueNode):
     """ Represents a SystemVerilog net """
+
+    __slots__ = ('_name', '_range')
+
     def __init__(self, name, range=None):
         self._name = name
         self._range = range
@@ -178,6 +216,8 @@ class Net (ACTNode):
 
 class Assignment (ACTNode):
 
+    __slots__ = ('_lhs', '_rhs', '_lhs_range', '_rhs_range', '_is_continuous')
+
     def __init__(self,
                  lhs, rhs,
                  lhs_range=None,
@@ -239,14 +279,19 @@ class Assignment (ACTNode):
 # =============================================================================
 
 
-class FieldInstance (ACTNode):
+class FieldInstance (ValueNode):
 
-    def __init__(self, parent_reg_name, field_name, field_range=Range(), reset_mask=0, reset_value=0):
-        self._parent_reg_name = parent_reg_name
-        self._field_name = field_name
+    __slots__ = ('_parent_reg_name', '_field_name', '_field_range',
+                 '_field_reset_mask', '_field_reset_value', '_index')
+
+    def __init__(self, parent_reg_name, field_name, field_range=Range(), reset_mask=0, reset_value=0,
+                 index=''):
+        self._parent_reg_name = intern(parent_reg_name)
+        self._field_name = intern(field_name)
         self._field_range = field_range
         self._field_reset_mask = reset_mask
         self._field_reset_value = reset_value
+        self._index = index
 
     @property
     def parent_reg_name(self):
@@ -272,16 +317,42 @@ class FieldInstance (ACTNode):
     def field_reset_value(self):
         return self._field_reset_value
 
+    @property
+    def index(self):
+        """ Element select of register signals (e.g. '[i]' inside of
+        `GenerateLoop`), empty for single registers """
+        return self._index
+
+
+class TypedFieldInstance (FieldInstance):
+    """ Field instance of specialized field module (see `FieldTypeModule`),
+    which has reset configuration built in instead of parameters """
+
+    __slots__ = ('_module_name',)
+
+    def __init__(self, module_name, parent_reg_name, field_name, field_range=Range(), reset_mask=0,
+                 reset_value=0, index=''):
+        super(TypedFieldInstance, self).__init__(parent_reg_name, field_name, field_range,
+                                                 reset_mask, reset_value, index)
+        self._module_name = intern(module_name)
+
+    @property
+    def module_name(self):
+        return self._module_name
+
 
 # =============================================================================
 
 
-class FieldBypass (ACTNode):
+class FieldBypass (ValueNode):
+
+    __slots__ = ('_parent_reg_name', '_field_name', '_field_range', '_index')
 
-    def __init__(self, parent_reg_name, field_name, field_range=Range()):
-        self._parent_reg_name = parent_reg_name
-        self._field_name = field_name
+    def __init__(self, parent_reg_name, field_name, field_range=Range(), index=''):
+        self._parent_reg_name = intern(parent_reg_name)
+        self._field_name = intern(field_name)
         self._field_range = field_range
+        self._index = index
 
     @property
     def parent_reg_name(self):
@@ -295,23 +366,64 @@ class FieldBypass (ACTNode):
     def field_range(self):
         return self._field_range
 
+    @property
+    def index(self):
+        return self._index
+
 # =============================================================================
 
 
-class InterruptInstance (ACTNode):
-    def __init__(self, intr_name):
-        self._intr_name = intr_name
+class InterruptInstance (ValueNode):
+
+    __slots__ = ('_intr_name', '_index')
+
+    def __init__(self, intr_name, index=''):
+        self._intr_name = intern(intr_name)
+        self._index = index
 
     @property
     def intr_name(self):
         return self._intr_name
 
+    @property
+    def index(self):
+        return self._index
+
+# =============================================================================
+
+
+class GenerateLoop (Composite):
+    """ Represents `generate for` loop replicating its children `count`
+    times, in named block `label`, with loop variable `genvar` """
+
+    __slots__ = ('_genvar', '_count', '_label')
+
+    def __init__(self, genvar, count, label, *args):
+        super(GenerateLoop, self).__init__(args)
+        self._genvar = genvar
+        self._count = count
+        self._label = label
+
+    @property
+    def genvar(self):
+        return self._genvar
+
+    @property
+    def count(self):
+        return self._count
+
+    @property
+    def label(self):
+        return self._label
+
 # =============================================================================
 
 
 class ModuleBase (ACTNode):
     """ Represents SystemVerilog module """
 
+    __slots__ = ('_module_name',)
+
     def __init__(self, module_name):
         self._module_name = module_name
 
@@ -323,6 +435,9 @@ class ModuleBase (ACTNode):
 
 
 class TopModule (ModuleBase):
+
+    __slots__ = ('_interface_name', '_hw_ports')
+
     def __init__(self, module_name,
                  interface_name,
                  hw_ports=[]):
@@ -343,16 +458,21 @@ class TopModule (ModuleBase):
 
 class BackendModule (ModuleBase):
 
+    __slots__ = ('_hw_ports', '_backend_signal_declarations', '_backend_instantiation',
+                 '_write_select_decoder', '_read_data_mux')
+
     def __init__(self, module_name,
                  hw_ports=[],
                  backend_signal_declarations=[],
                  backend_instantiation=[],
-                 write_select_decoder=None):
+                 write_select_decoder=None,
+                 read_data_mux=None):
         super(BackendModule, self).__init__(module_name)
         self._hw_ports = hw_ports
         self._backend_signal_declarations = backend_signal_declarations
         self._backend_instantiation = backend_instantiation
         self._write_select_decoder = write_select_decoder
+        self._read_data_mux = read_data_mux
 
     @property
     def hw_ports(self):
@@ -370,10 +490,17 @@ class BackendModule (ModuleBase):
     def write_select_decoder(self):
         return self._write_select_decoder
 
+    @property
+    def read_data_mux(self):
+        return self._read_data_mux
+
 # =============================================================================
 
 
 class InterfaceModule (ModuleBase):
+
+    __slots__ = ('_interface_name',)
+
     def __init__(self, module_name,
                  interface_name):
         super(InterfaceModule, self).__init__(module_name)
@@ -387,25 +514,149 @@ class InterfaceModule (ModuleBase):
 
 
 class FieldModule (ModuleBase):
+
+    __slots__ = ()
+
     def __init__(self, module_name):
         super(FieldModule, self).__init__(module_name)
 
+
+class FieldTypeModule (ModuleBase):
+    """ Field module specialized for one field type: width and reset
+    configuration are constants, not parameters. Reset value bits outside
+    of reset mask have no effect, they are expected to be cleared. """
+
+    __slots__ = ('_width', '_reset_mask', '_reset_value', '_instances')
+
+    def __init__(self, module_name, width, reset_mask=0, reset_value=0, instances=0):
+        super(FieldTypeModule, self).__init__(module_name)
+        self._width = width
+        self._reset_mask = reset_mask
+        self._reset_value = reset_value
+        self._instances = instances
+
+    @property
+    def width(self):
+        return self._width
+
+    @property
+    def reset_mask(self):
+        return self._reset_mask
+
+    @property
+    def reset_value(self):
+        return self._reset_value
+
+    @property
+    def instances(self):
+        """ Number of instances in design """
+        return self._instances
+
+    @property
+    def reset_runs(self):
+        """ List of (Range, is reset, reset value of range) of contiguous
+        runs of bits with and without reset, least significant first """
+        runs = []
+        low = 0
+        for bit in range(1, self._width + 1):
+            if bit == self._width or \
+                    ((self._reset_mask >> bit) & 1) != ((self._reset_mask >> low) & 1):
+                is_reset = bool((self._reset_mask >> low) & 1)
+                value = (self._reset_value >> low) & ((1 << (bit - low)) - 1)
+                runs.append((Range(bit - 1, low), is_reset, value))
+                low = bit
+        return runs
+
 # =============================================================================
 
 
 class InterruptModule (ModuleBase):
+
+    __slots__ = ()
+
     def __init__(self, module_name):
         super(InterruptModule, self).__init__(module_name)
 
 
 # =============================================================================
 
+class RegisterArrayDecode (ValueNode):
+    """ Decode of rolled register array by index arithmetic: word address
+    hits the array when it is within `address`..`last_address` and aligned
+    to `stride` words; element index is (address - `address`) / `stride`. """
+
+    __slots__ = ('_reg_name', '_address', '_count', '_stride')
+
+    def __init__(self, reg_name, address, count, stride):
+        self._reg_name = intern(reg_name)
+        self._address = address
+        self._count = count
+        self._stride = stride
+
+    @property
+    def reg_name(self):
+        return self._reg_name
+
+    @property
+    def address(self):
+        """ Word address of the first element """
+        return self._address
+
+    @property
+    def count(self):
+        return self._count
+
+    @property
+    def stride(self):
+        """ Distance between elements in words """
+        return self._stride
+
+    @property
+    def last_address(self):
+        """ Word address of the last element """
+        return self._address + (self._count - 1) * self._stride
+
+    @property
+    def stride_shift(self):
+        """ log2 of power of two stride, None otherwise """
+        stride = self._stride
+        return stride.bit_length() - 1 if stride & (stride - 1) == 0 else None
+
+    @property
+    def index_width(self):
+        return max(1, (self._count - 1).bit_length())
+
+    @property
+    def hit_signal(self):
+        return 'reg_' + self._reg_name + '__decode_hit'
+
+    @property
+    def index_signal(self):
+        return 'reg_' + self._reg_name + '__decode_index'
+
+
 class SelectDecoder (ACTNode):
 
-    def __init__(self, address_map):
-        """ address_map keeps mapping between address and selected signal """
+    __slots__ = ('_address_map', '_array_decoders')
+
+    def __init__(self, address_map, array_decoders=()):
+        """ address_map keeps mapping between address and selected signal,
+        rolled register arrays are decoded by `array_decoders` (list of
+        (`RegisterArrayDecode`, signal indexed with element select)) """
         self._address_map = address_map
+        self._array_decoders = array_decoders
 
     @property
     def address_map(self):
         return self._address_map
+
+    @property
+    def array_decoders(self):
+        return self._array_decoders
+
+    @property
+    def address_width(self):
+        """ Number of address bits needed to select every entry """
+        top = max(max((address for address, _ in self._address_map), default=0),
+                  max((a.last_address for a, _ in self._array_decoders), default=0))
+        return max(1, top.bit_length())
@@ -0,0 +1,655 @@
+# Copyright © 2018 Mateusz Maciąg
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the “Software”), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software
+# is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS
+# OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+""" Batch compilation of many register blocks in one process. """
+
+from pyrcom.exceptions import PyrcomError
+from pyrcom.stats import Stats, NULL_STATS
+
+import collections
+import json
+import os
+import time
+
+# =============================================================================
+
+
+class ManifestError(PyrcomError):
+    """ Batch manifest cannot be read or has invalid content """
+    pass
+
+# =============================================================================
+
+
+class CompileJob:
+    """ Single register block to generate: RDL sources, top-level addrmap
+    and output artifact """
+
+    DEFAULT_DESIGN_NAME = 'mydev'
+
+    def __init__(self, src_files, output_path,
+                 top_def_name=None,
+                 design_name=DEFAULT_DESIGN_NAME,
+                 incl_search_paths=None,
+                 skip_not_present=False,
+                 warning_spec=None,
+                 name=None,
+                 incremental=False,
+                 address_map_path=None,
+                 language=None,
+                 extra_outputs=None,
+                 save_act_path=None,
+                 load_act_path=None,
+                 language_config=None):
+        self._src_files = list(src_files)
+        self._output_path = output_path
+        self._top_def_name = top_def_name
+        self._design_name = design_name
+        self._incl_search_paths = list(incl_search_paths or [])
+        self._skip_not_present = skip_not_present
+        self._warning_spec = list(warning_spec or [])
+        self._name = name or design_name
+        self._incremental = incremental
+        self._address_map_path = address_map_path
+        self._language = language
+        self._extra_outputs = dict(extra_outputs or {})
+        self._save_act_path = save_act_path
+        self._load_act_path = load_act_path
+        self._language_config = dict(language_config or {})
+
+    def __repr__(self):
+        return str.format("CompileJob('{0}' -> '{1}')", self._name, self._output_path)
+
+    @property
+    def name(self):
+        return self._name
+
+    @property
+    def src_files(self):
+        return self._src_files
+
+    @property
+    def output_path(self):
+        return self._output_path
+
+    @property
+    def top_def_name(self):
+        return self._top_def_name
+
+    @property
+    def design_name(self):
+        return self._design_name
+
+    @property
+    def incl_search_paths(self):
+        return self._incl_search_paths
+
+    @property
+    def skip_not_present(self):
+        return self._skip_not_present
+
+    @property
+    def warning_spec(self):
+        return self._warning_spec
+
+    @property
+    def incremental(self):
+        """ Write each module into its own file in `output_path` directory,
+        rewriting only files which changed """
+        return self._incremental
+
+    @property
+    def address_map_path(self):
+        """ Output file of binary address map index, optional """
+        return self._address_map_path
+
+    @property
+    def language(self):
+        """ Name of language backend generating the output, None selects
+        the default backend """
+        return self._language
+
+    @property
+    def extra_outputs(self):
+        """ Dictionary of language name -> output file of additional outputs
+        generated from the same compiled design """
+        return self._extra_outputs
+
+    @property
+    def save_act_path(self):
+        """ File to save built ACT to (see `pyrcom.act.serialize`), optional """
+        return self._save_act_path
+
+    @property
+    def load_act_path(self):
+        """ Saved ACT to write output from. Sources are not compiled then,
+        `src_files` are ignored. """
+        return self._load_act_path
+
+    @property
+    def language_config(self):
+        """ Options of language backends (see `LANGUAGE_OPTIONS`), design
+        name is added to them """
+        return self._language_config
+
+# =============================================================================
+
+
+class JobResult:
+    """ Outcome of a single job: per-stage wall times and error, if any """
+
+    def __init__(self, job, stats=None):
+        self._job = job
+        self._timings = {}
+        self._error = None
+        self._stats = stats
+
+    @property
+    def job(self):
+        return self._job
+
+    @property
+    def timings(self):
+        """ Dictionary of stage name -> wall time in seconds """
+        return self._timings
+
+    @property
+    def stats(self):
+        """ Detailed `Stats` of the job, None if it was not profiled """
+        return self._stats
+
+    @property
+    def error(self):
+        return self._error
+
+    @error.setter
+    def error(self, message):
+        self._error = message
+
+    @property
+    def success(self):
+        return self._error is None
+
+    @property
+    def total_time(self):
+        return sum(self._timings.values())
+
+# =============================================================================
+# Language options
+#
+# Options of language backends which can be set by jobs, besides design name:
+# 'language_config' of manifest jobs and server requests, -D <option>=<value>
+# of the command line. Backends ignore options they do not use.
+
+
+def _is_int(value, minimum):
+    return isinstance(value, int) and not isinstance(value, bool) and value >= minimum
+
+
+def _parse_bool(text):
+    value = text.lower()
+    if value in ('1', 'true', 'yes', 'on'):
+        return True
+    if value in ('0', 'false', 'no', 'off'):
+        return False
+    raise ValueError(text)
+
+
+def _parse_int_list(text):
+    return [int(item) for item in text.split(',') if item.strip()]
+
+
+def _is_bool(value):
+    return isinstance(value, bool)
+
+
+def _is_str(value):
+    return isinstance(value, str)
+
+
+# Option name -> (description, check, parser of command line value)
+LANGUAGE_OPTIONS = {
+    'decoder': ("'flat' or 'tree'", lambda v: v in ('flat', 'tree'), str),
+    'decoder_radix_bits': ("a positive integer", lambda v: _is_int(v, 1), int),
+    'decoder_registered': ("a boolean", _is_bool, _parse_bool),
+    'read_mux_fan_in': ("an integer of at least 2", lambda v: _is_int(v, 2), int),
+    'read_mux_pipeline': ("a list of positive integers",
+                          lambda v: isinstance(v, list) and all(_is_int(l, 1) for l in v),
+                          _parse_int_list),
+    'roll_arrays': ("a boolean", _is_bool, _parse_bool),
+    'field_types': ("a boolean", _is_bool, _parse_bool),
+    'batch_render': ("a boolean", _is_bool, _parse_bool),
+    'share_nodes': ("a boolean", _is_bool, _parse_bool),
+    'render_workers': ("a non-negative integer", lambda v: _is_int(v, 0), int),
+    'render_shard_size': ("a positive integer", lambda v: _is_int(v, 1), int),
+    'file_header': ("a string", _is_str, str),
+    'file_footer': ("a string", _is_str, str),
+}
+
+
+def language_config_error(language_config):
+    """ Return message describing the first invalid option of
+    `language_config` mapping, or None if all options are valid """
+    for name, value in language_config.items():
+        option = LANGUAGE_OPTIONS.get(name)
+        if option is None:
+            return str.format("Unknown language option '{0}', known options: {1}",
+                              name, ", ".join(sorted(LANGUAGE_OPTIONS)))
+        description, check, _ = option
+        if not check(value):
+            return str.format("Language option '{0}' must be {1}, got {2!r}",
+                              name, description, value)
+    return None
+
+
+def parse_language_option(spec):
+    """ Parse '<option>=<value>' of the command line into (option, value).
+    Raises ValueError with message if it is not valid. """
+    name, sep, text = spec.partition('=')
+    if not (name and sep):
+        raise ValueError(str.format("invalid option '{0}', expected <option>=<value>", spec))
+    option = LANGUAGE_OPTIONS.get(name)
+    if option is None:
+        raise ValueError(str.format("unknown language option '{0}', known options: {1}",
+                                    name, ", ".join(sorted(LANGUAGE_OPTIONS))))
+    description, check, parse = option
+    try:
+        value = parse(text)
+    except ValueError:
+        value = None
+    if value is None or not check(value):
+        raise ValueError(str.format("language option '{0}' must be {1}, got '{2}'",
+                                    name, description, text))
+    return name, value
+
+# =============================================================================
+# Manifest
+#
+# Manifest is a JSON (or YAML, if PyYAML is installed) document:
+#
+#   {
+#     "defaults": { "incl_search_paths": ["common/"], "warning_spec": ["all"] },
+#     "jobs": [
+#       { "src_files": ["i2c.rdl"], "top": "I2C", "design_name": "i2c",
+#         "output": "out/i2c.sv" },
+#       { "src_files": ["spi.rdl"], "output": "out/spi/", "incremental": true },
+#       { "src_files": ["uart.rdl"], "output": "out/uart.sv",
+#         "emit": { "c": "out/uart_regs.h", "md": "doc/uart.md" } },
+#       { "src_files": ["dma.rdl"], "output": "out/dma.sv", "save_act": "out/dma.act" },
+#       { "src_files": ["eth.rdl"], "output": "out/eth.sv",
+#         "language_config": { "decoder": "tree", "roll_arrays": true } },
+#       ...
+#     ]
+#   }
+#
+# A bare list of jobs is accepted as well. Relative paths are resolved
+# against the manifest directory. Job with "load_act" key writes output of
+# an ACT saved by an earlier run and needs no "src_files". Options of
+# "language_config" (see `LANGUAGE_OPTIONS`) are merged with the defaults.
+
+_JOB_KEYS = {
+    'name': 'name',
+    'src_files': 'src_files',
+    'output': 'output_path',
+    'top': 'top_def_name',
+    'design_name': 'design_name',
+    'incl_search_paths': 'incl_search_paths',
+    'skip_not_present': 'skip_not_present',
+    'warning_spec': 'warning_spec',
+    'incremental': 'incremental',
+    'address_map': 'address_map_path',
+    'language': 'language',
+    'emit': 'extra_outputs',
+    'save_act': 'save_act_path',
+    'load_act': 'load_act_path',
+    'language_config': 'language_config',
+}
+
+
+def _is_str_list(value):
+    return isinstance(value, list) and all(isinstance(v, str) for v in value)
+
+
+def _is_str_map(value):
+    return isinstance(value, dict) and \
+        all(isinstance(k, str) and isinstance(v, str) for k, v in value.items())
+
+
+# Manifest key -> (description, check) of its value. Optional keys may also
+# be null.
+_JOB_KEY_TYPES = {
+    'name': ("a string", lambda v: isinstance(v, str)),
+    'src_files': ("a list of file names", _is_str_list),
+    'output': ("a file name", lambda v: isinstance(v, str)),
+    'top': ("a string", lambda v: isinstance(v, str)),
+    'design_name': ("a string", lambda v: isinstance(v, str)),
+    'incl_search_paths': ("a list of directories", _is_str_list),
+    'skip_not_present': ("a boolean", lambda v: isinstance(v, bool)),
+    'warning_spec': ("a list of strings", _is_str_list),
+    'incremental': ("a boolean", lambda v: isinstance(v, bool)),
+    'address_map': ("a file name", lambda v: isinstance(v, str)),
+    'language': ("a string", lambda v: isinstance(v, str)),
+    'emit': ("a mapping of language names to output files", _is_str_map),
+    'save_act': ("a file name", lambda v: isinstance(v, str)),
+    'load_act': ("a file name", lambda v: isinstance(v, str)),
+    'language_config': ("a mapping of language options", lambda v: isinstance(v, dict)),
+}
+
+_REQUIRED_VALUE_KEYS = ('src_files', 'output', 'design_name')
+
+
+def _read_manifest(path):
+    with open(path, 'r') as fd:
+        text = fd.read()
+
+    if os.path.splitext(path)[1].lower() in ('.yaml', '.yml'):
+        try:
+            import yaml
+        except ImportError as e:
+            raise ManifestError(
+                "YAML manifest requires PyYAML package, use JSON instead") from e
+        try:
+            return yaml.safe_load(text)
+        except yaml.YAMLError as e:
+            raise ManifestError(str.format("Could not parse manifest '{0}'", path)) from e
+
+    try:
+        return json.loads(text)
+    except ValueError as e:
+        raise ManifestError(str.format("Could not parse manifest '{0}'", path)) from e
+
+
+def load_manifest(path):
+    """ Read batch manifest and return list of `CompileJob` """
+
+    try:
+        doc = _read_manifest(path)
+    except OSError as e:
+        raise ManifestError(str.format("Could not read manifest '{0}'", path)) from e
+
+    if isinstance(doc, list):
+        doc = {'jobs': doc}
+    if not isinstance(doc, dict) or not isinstance(doc.get('jobs'), list):
+        raise ManifestError(str.format("Manifest '{0}' does not define 'jobs' list", path))
+
+    base_dir = os.path.dirname(os.path.abspath(path))
+
+    def rebase(p):
+        return os.path.normpath(os.path.join(base_dir, p))
+
+    defaults = doc.get('defaults', {})
+    jobs = []
+    for index, spec in enumerate(doc['jobs']):
+        if not isinstance(spec, dict):
+            raise ManifestError(str.format("Job #{0}: expected mapping", index))
+
+        merged = dict(defaults)
+        merged.update(spec)
+        if isinstance(defaults.get('language_config'), dict) and \
+                isinstance(spec.get('language_config'), dict):
+            merged['language_config'] = dict(defaults['language_config'],
+                                             **spec['language_config'])
+
+        unknown = set(merged) - set(_JOB_KEYS)
+        if unknown:
+            raise ManifestError(str.format(
+                "Job #{0}: unknown keys {1}", index, sorted(unknown)))
+        # Jobs writing output of a saved ACT have no sources
+        required_keys = ('output',) if merged.get('load_act') else ('src_files', 'output')
+        for required in required_keys:
+            if required not in merged:
+                raise ManifestError(str.format(
+                    "Job #{0}: missing required key '{1}'", index, required))
+
+        for key, value in merged.items():
+            description, check = _JOB_KEY_TYPES[key]
+            if value is None and key not in _REQUIRED_VALUE_KEYS:
+                continue
+            if not check(value):
+                raise ManifestError(str.format(
+                    "Job #{0}: '{1}' must be {2}, got {3!r}", index, key, description, value))
+        error = language_config_error(merged.get('language_config') or {})
+        if error:
+            raise ManifestError(str.format("Job #{0}: {1}", index, error))
+
+        kwargs = {_JOB_KEYS[k]: v for k, v in merged.items()}
+        kwargs['src_files'] = [rebase(f) for f in kwargs.get('src_files') or []]
+        kwargs['output_path'] = rebase(kwargs['output_path'])
+        kwargs['incl_search_paths'] = [rebase(d) for d in kwargs.get('incl_search_paths') or []]
+        for key in ('address_map_path', 'save_act_path', 'load_act_path'):
+            if kwargs.get(key):
+                kwargs[key] = rebase(kwargs[key])
+        if kwargs.get('extra_outputs'):
+            kwargs['extra_outputs'] = {language: rebase(path)
+                                       for language, path in kwargs['extra_outputs'].items()}
+        jobs.append(CompileJob(**kwargs))
+
+    return jobs
+
+# =============================================================================
+
+
+def write_address_map(context, path, printer):
+    """ Write binary address map index of `context`, reporting overlapping
+    registers as warnings """
+    from pyrcom.codegen.addrmap import AddressMapIndex
+    index = AddressMapIndex.from_context(context)
+    for a, b in index.overlaps():
+        printer.print_message("warning", str.format(
+            "Register '{0}' overlaps register '{1}'",
+            index.register(b).path, index.register(a).path), None)
+    printer.print_message("info", "Writing address map ...", None)
+    index.write(path)
+
+
+def _write_replacing(path, write, stats):
+    """ Stream output into `path` with `write(fd)`. Partial output is never
+    left behind - file is replaced once complete. """
+    tmp_path = path + '.tmp'
+    try:
+        with stats.stage('generate'), open(tmp_path, "w") as fd:
+            write(fd)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def _run_saved_act_job(job, printer, trace, stats, timings):
+    """ Write output of `job` from its saved ACT, without compiling RDL """
+    from pyrcom.act.serialize import SavedACT
+    from pyrcom.codegen.registry import get_backend
+
+    if job.incremental or job.extra_outputs or job.address_map_path or job.save_act_path:
+        raise PyrcomError("Output of saved ACT can only be written into single file")
+    if job.language_config:
+        raise PyrcomError("Output of saved ACT is written with language options it was built with")
+
+    t = time.perf_counter()
+    printer.print_message("info", "Loading ACT ...", None)
+    with stats.stage('load_act'):
+        saved = SavedACT.read(job.load_act_path)
+    if job.language and job.language != saved.language:
+        raise PyrcomError(str.format(
+            "ACT '{0}' was built for language '{1}', not '{2}'",
+            job.load_act_path, saved.language, job.language))
+    timings['load_act'] = time.perf_counter() - t
+
+    t = time.perf_counter()
+    printer.print_message("info", "Generating ...", None)
+    # Code is emitted with configuration the ACT was built with
+    code_generator = get_backend(saved.language).create_emitter(
+        saved.language_config, printer=printer, trace=trace, stats=stats)
+    printer.print_message("info", "Writing output ...", None)
+    _write_replacing(job.output_path,
+                     lambda fd: code_generator.write_act_code(saved.root, fd), stats)
+    timings['generate'] = time.perf_counter() - t
+
+
+def run_job(job, printer, warning_flags, cache=None, trace=False, stats=None):
+    """ Compile, generate and write single job. Errors are stored in the
+    returned `JobResult` instead of being raised. With `trace` set, every
+    visited ACT node is reported as debug message. Stages of the job are
+    measured into `stats`, if given. """
+
+    # Compiler and code generators are loaded with the first job, jobs and
+    # manifests can be handled without them
+    from systemrdl import RDLCompileError
+    from pyrcom.rc import RegisterCompiler
+    from pyrcom.codegen.registry import get_backend, DEFAULT_BACKEND
+    from pyrcom.codegen.incremental import IncrementalWriter, WRITTEN, UNCHANGED, SKIPPED, REMOVED
+    from pyrcom.codegen.pipeline import OutputTarget, write_outputs
+
+    result = JobResult(job, stats)
+    stats = stats or NULL_STATS
+    try:
+        if job.load_act_path:
+            _run_saved_act_job(job, printer, trace, stats, result.timings)
+            return result
+        if job.save_act_path and (job.incremental or job.extra_outputs):
+            raise PyrcomError("ACT can only be saved by job writing single output file")
+
+        t = time.perf_counter()
+        compiler = RegisterCompiler(
+            printer=printer,
+            incl_search_paths=job.incl_search_paths,
+            top_def_name=job.top_def_name,
+            skip_not_present=job.skip_not_present,
+            warning_flags=warning_flags,
+            src_files=job.src_files,
+            cache=cache,
+            stats=stats
+        )
+        printer.print_message("info", "Start code compilation ...", None)
+        with stats.stage('compile'):
+            rdl_root = compiler.compile()
+        result.timings['compile'] = time.perf_counter() - t
+
+        # Jinja environment is shared by all emitters (see LanguageEmitterBase),
+        # so templates are loaded once per batch
+        t = time.perf_counter()
+        printer.print_message("info", "Generating ...", None)
+        language_config = dict(job.language_config, design_name=job.design_name)
+        language = job.language or DEFAULT_BACKEND
+        backend = get_backend(language)
+        code_generator = backend.create_emitter(language_config, printer=printer,
+                                                trace=trace, stats=stats)
+        language_builder = backend.create_builder(language_config, printer=printer, stats=stats)
+        extra_targets = [OutputTarget(name, path, language_config)
+                         for name, path in job.extra_outputs.items()]
+
+        if job.incremental:
+            printer.print_message("info", "Writing modules ...", None)
+            writer = IncrementalWriter(job.output_path, code_generator)
+            with stats.stage('generate'):
+                status = writer.write_code(language_builder, rdl_root)
+            counts = collections.Counter(status.values())
+            printer.print_message("info", str.format(
+                "{0} file(s) written, {1} unchanged, {2} skipped, {3} removed",
+                counts[WRITTEN], counts[UNCHANGED], counts[SKIPPED], counts[REMOVED]), None)
+            synthesis_context = language_builder.synthesis_context
+            if extra_targets:
+                printer.print_message("info", "Writing outputs ...", None)
+                with stats.stage('generate_extra'):
+                    write_outputs(rdl_root, extra_targets, printer, synthesis_context,
+                                  trace=trace, stats=stats)
+        elif extra_targets:
+            # All outputs are generated together, sharing one synthesis context
+            printer.print_message("info", "Writing outputs ...", None)
+            with stats.stage('generate'):
+                synthesis_context = write_outputs(
+                    rdl_root, [OutputTarget(language, job.output_path, language_config)] +
+                    extra_targets, printer, trace=trace, stats=stats)
+        else:
+            # Code is streamed into the output file as it is rendered
+            printer.print_message("info", "Writing output ...", None)
+            if job.save_act_path:
+                from pyrcom.act.serialize import SavedACT
+                with stats.stage('build_act'):
+                    act_root = language_builder.build_act(rdl_root)
+                with stats.stage('save_act'):
+                    SavedACT(act_root, language, language_config).write(job.save_act_path)
+                _write_replacing(job.output_path,
+                                 lambda fd: code_generator.write_act_code(act_root, fd), stats)
+            else:
+                _write_replacing(job.output_path,
+                                 lambda fd: code_generator.write_code(language_builder,
+                                                                      rdl_root, fd), stats)
+            synthesis_context = language_builder.synthesis_context
+        result.timings['generate'] = time.perf_counter() - t
+
+        if job.address_map_path:
+            with stats.stage('address_map'):
+                write_address_map(synthesis_context, job.address_map_path, printer)
+
+    except (RDLCompileError, PyrcomError, OSError) as e:
+        message = str(e)
+        if hasattr(e, '__cause__') and e.__cause__:
+            message = "%s Details: %s" % (message, e.__cause__)
+        result.error = message
+    except Exception as e:
+        # Failure of one job must not stop the others
+        result.error = str.format("Internal error: {0}: {1}", e.__class__.__name__, e)
+
+    return result
+
+
+def _run_job_in_worker(job, printer, warning_flags, cache, trace, profile):
+    """ Worker process entry: messages emitted by `printer` (a copy local to
+    the worker) are recorded so the parent can replay them in job order. """
+    messages = []
+    printer.emit_message = messages.append
+    result = run_job(job, printer, warning_flags, cache, trace, Stats() if profile else None)
+    return result, messages
+
+
+def run_jobs(jobs, printer, job_warning_flags, cache=None, workers=1, trace=False,
+             profile=False):
+    """ Run `jobs`, yielding `JobResult` objects in job order.
+
+    With `workers` > 1 and more than one job, jobs run in a process pool,
+    otherwise in this process. Messages of each job are emitted in one
+    block, in job order, when its result is yielded, so output does not
+    depend on scheduling. Job which cannot be run by a worker fails alone.
+    `printer` must be picklable. With `profile` set, every result carries
+    `Stats` of its job. """
+
+    if workers <= 1 or len(jobs) <= 1:
+        for job, warning_flags in zip(jobs, job_warning_flags):
+            yield run_job(job, printer, warning_flags, cache, trace,
+                          Stats() if profile else None)
+        return
+
+    from concurrent.futures import ProcessPoolExecutor
+    with ProcessPoolExecutor(max_workers=min(workers, len(jobs))) as pool:
+        futures = [pool.submit(_run_job_in_worker, job, printer, warning_flags, cache, trace,
+                               profile)
+                   for job, warning_flags in zip(jobs, job_warning_flags)]
+        for job, future in zip(jobs, futures):
+            try:
+                result, messages = future.result()
+            except Exception as e:
+                # Worker died or result could not be transferred: fail
+                # this job only, the others are still collected
+                result, messages = JobResult(job), []
+                result.error = str.format("Worker failed: {0}: {1}", e.__class__.__name__, e)
+            for lines in messages:
+                printer.emit_message(lines)
+            yield result
@@ -0,0 +1,321 @@
+# Copyright © 2018 Mateusz Maciąg
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the “Software”), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software
+# is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS
+# OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+""" Persistent on-disk cache of elaborated RDL trees.
+
+Entries are keyed by a content hash of every input that influences
+elaboration: source files, the include files they resolve to, the selected
+top-level addrmap, the warning mask and the tool versions.
+"""
+
+import pyrcom
+
+import hashlib
+import io
+import os
+import pickle
+import re
+import sys
+import tempfile
+
+# =============================================================================
+
+# Bump whenever the layout of cached entries changes
+CACHE_FORMAT_VERSION = 2
+
+DEFAULT_CACHE_SIZE = 256 * 1024 * 1024
+
+_INCLUDE_RE = re.compile(rb'`include\s+(?:"([^"]+)"|<([^>]+)>)')
+
+# Elaborated trees are deeply linked, default limit is not enough for them
+_PICKLE_RECURSION_LIMIT = 20000
+
+
+def default_cache_dir():
+    """ Return per-user cache location (honours XDG_CACHE_HOME) """
+    base = os.environ.get('XDG_CACHE_HOME') or \
+        os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(base, 'pyrcom')
+
+
+def scan_file(path):
+    """ Return (sha256 digest, list of included file names) of a source file """
+    with open(path, 'rb') as fd:
+        content = fd.read()
+    includes = [(m.group(1) or m.group(2)).decode('utf-8', 'replace')
+                for m in _INCLUDE_RE.finditer(content)]
+    return hashlib.sha256(content).digest(), includes
+
+
+def resolve_include_files(src_files, incl_search_paths=None, scan=scan_file):
+    """ Return list of files reachable from `src_files` through `include
+    directives, sources first. Unresolved includes are skipped - they are
+    reported by the RDL compiler itself. """
+
+    search_paths = list(incl_search_paths or [])
+    resolved = []
+    visited = set()
+    pending = list(src_files)
+
+    while pending:
+        path = os.path.abspath(pending.pop(0))
+        if path in visited or not os.path.isfile(path):
+            continue
+        visited.add(path)
+        resolved.append(path)
+
+        for name in scan(path)[1]:
+            for d in [os.path.dirname(path)] + search_paths:
+                candidate = os.path.join(d, name)
+                if os.path.isfile(candidate):
+                    pending.append(candidate)
+                    break
+
+    return resolved
+
+# =============================================================================
+# Pickling support for elaborated trees
+
+
+# systemrdl is imported by functions which need it, so the cache settings
+# can be used without loading the RDL compiler
+
+
+def _rebuild_user_enum(name, entries):
+    from systemrdl import rdltypes
+    return rdltypes.UserEnum(name, entries)
+
+
+def _set_user_enum_scope(enum_type, scope):
+    enum_type._set_parent_scope(scope)
+
+
+class _TreePickler (pickle.Pickler):
+    """ Pickler aware of systemrdl specifics:
+
+    - user enumerations are dynamically created classes, so they are
+      stored by value instead of by reference,
+    - message printers are not stored at all; the unpickler substitutes
+      the printer of the current compiler.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super(_TreePickler, self).__init__(*args, **kwargs)
+        from systemrdl.rdltypes import UserEnum
+        from systemrdl.messages import MessagePrinter
+        self._user_enum = UserEnum
+        self._message_printer = MessagePrinter
+
+    def reducer_override(self, obj):
+        if isinstance(obj, type) and issubclass(obj, self._user_enum) \
+                and obj is not self._user_enum:
+            entries = {m.name: (m.value, m.rdl_name, m.rdl_desc) for m in obj}
+            return (_rebuild_user_enum, (obj.__name__, entries),
+                    obj.get_parent_scope(), None, None, _set_user_enum_scope)
+        return NotImplemented
+
+    def persistent_id(self, obj):
+        if isinstance(obj, self._message_printer):
+            return 'printer'
+        return None
+
+
+class _TreeUnpickler (pickle.Unpickler):
+
+    def __init__(self, fd, printer):
+        super(_TreeUnpickler, self).__init__(fd)
+        self._printer = printer
+
+    def persistent_load(self, pid):
+        if pid == 'printer':
+            return self._printer
+        raise pickle.UnpicklingError("Unknown persistent id '%s'" % pid)
+
+
+def dump_tree(rdl_root, messages=()):
+    """ Serialize elaborated RDL tree and list of (severity, text, src_ref)
+    messages reported while it was compiled into bytes """
+    limit = sys.getrecursionlimit()
+    sys.setrecursionlimit(max(limit, _PICKLE_RECURSION_LIMIT))
+    try:
+        buf = io.BytesIO()
+        _TreePickler(buf, protocol=pickle.HIGHEST_PROTOCOL).dump((rdl_root, list(messages)))
+        return buf.getvalue()
+    finally:
+        sys.setrecursionlimit(limit)
+
+
+def load_tree(data, printer):
+    """ Deserialize (elaborated RDL tree, messages), attaching the tree to
+    `printer` """
+    limit = sys.getrecursionlimit()
+    sys.setrecursionlimit(max(limit, _PICKLE_RECURSION_LIMIT))
+    try:
+        return _TreeUnpickler(io.BytesIO(data), printer).load()
+    finally:
+        sys.setrecursionlimit(limit)
+
+# =============================================================================
+
+
+class CompilationCache:
+    """ Content addressed store of elaborated RDL trees with size bounded
+    LRU eviction. Recency is tracked with entry file modification time. """
+
+    ENTRY_SUFFIX = '.rdlcache'
+
+    def __init__(self, cache_dir=None, max_size=DEFAULT_CACHE_SIZE):
+        self._cache_dir = cache_dir or default_cache_dir()
+        self._max_size = max_size
+        # Scan results of source files, shared by all keys computed with this
+        # cache so common include files are read only once per process
+        self._scanned = {}
+
+    @property
+    def cache_dir(self):
+        return self._cache_dir
+
+    @property
+    def max_size(self):
+        return self._max_size
+
+    def make_key(self, src_files, incl_search_paths, top_def_name, warning_mask):
+        from systemrdl.__about__ import __version__ as systemrdl_version
+        h = hashlib.sha256()
+
+        def feed(*items):
+            for item in items:
+                h.update(str(item).encode('utf-8'))
+                h.update(b'\0')
+
+        feed(CACHE_FORMAT_VERSION, pyrcom.__version__, systemrdl_version,
+             sys.version_info[:2], top_def_name, warning_mask)
+
+        # Order of sources matters, as it is the order of compilation
+        feed(*[os.path.abspath(f) for f in src_files])
+
+        for path in resolve_include_files(src_files, incl_search_paths, self._scan):
+            feed(path)
+            h.update(self._scan(path)[0])
+
+        return h.hexdigest()
+
+    def _scan(self, path):
+        st = os.stat(path)
+        stamp = (st.st_mtime_ns, st.st_size)
+        entry = self._scanned.get(path)
+        if entry is None or entry[0] != stamp:
+            entry = (stamp, scan_file(path))
+            self._scanned[path] = entry
+        return entry[1]
+
+    def _entry_path(self, key):
+        return os.path.join(self._cache_dir, key + self.ENTRY_SUFFIX)
+
+    def load(self, key, printer):
+        """ Return cached (tree, messages) or None on cache miss. Messages
+        are (severity, text, src_ref) tuples reported by the compilation. """
+        path = self._entry_path(key)
+        try:
+            with open(path, 'rb') as fd:
+                data = fd.read()
+        except OSError:
+            return None
+
+        try:
+            entry = load_tree(data, printer)
+        except Exception:
+            # Stale or damaged entry - drop it and recompile
+            self._remove(path)
+            return None
+
+        # Mark as recently used
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return entry
+
+    def store(self, key, rdl_root, messages=()):
+        """ Store tree and messages reported while compiling it under `key`,
+        so they are reported again on cache hits. Returns False if tree could
+        not be stored. """
+        try:
+            data = dump_tree(rdl_root, messages)
+        except (pickle.PicklingError, TypeError, AttributeError, RecursionError):
+            return False
+
+        if len(data) > self._max_size:
+            return False
+
+        tmp_path = None
+        try:
+            os.makedirs(self._cache_dir, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=self._cache_dir, suffix='.tmp')
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, self._entry_path(key))
+        except OSError:
+            if tmp_path is not None:
+                self._remove(tmp_path)
+            return False
+
+        self.evict()
+        return True
+
+    def entries(self):
+        """ Return list of (mtime, size, path) tuples, least recently used first """
+        result = []
+        try:
+            names = os.listdir(self._cache_dir)
+        except OSError:
+            return result
+        for name in names:
+            if not name.endswith(self.ENTRY_SUFFIX):
+                continue
+            path = os.path.join(self._cache_dir, name)
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            result.append((st.st_mtime, st.st_size, path))
+        result.sort()
+        return result
+
+    def evict(self):
+        """ Remove least recently used entries until cache fits in `max_size` """
+        entries = self.entries()
+        total = sum(e[1] for e in entries)
+        for _, size, path in entries:
+            if total <= self._max_size:
+                break
+            self._remove(path)
+            total -= size
+
+    def clear(self):
+        for _, _, path in self.entries():
+            self._remove(path)
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
@@ -0,0 +1,284 @@
+# Copyright © 2018 Mateusz Maciąg
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the “Software”), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software
+# is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS
+# OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+""" Address indexed view of a design.
+
+`AddressMapIndex` keeps registers sorted by absolute address in flat arrays,
+so registers and fields are looked up by address with bisection and
+overlaps or gaps are found in a single pass.
+
+Index is serialized into a compact little-endian binary format:
+
+    header      '<8sHHIII': magic b'PYRCAMAP', format version, reserved,
+                number of registers R, number of fields F, size S of names
+    names       S bytes: UTF-8 register paths (R) then field names (F),
+                each terminated with NUL
+    reg_address R x uint64  absolute address, ascending
+    reg_size    R x uint32  size in bytes
+    reg_fields  (R + 1) x uint32  first field of register; fields of
+                register r are reg_fields[r] .. reg_fields[r + 1] - 1
+    field_high  F x uint32  most significant bit
+    field_low   F x uint32  least significant bit, fields of a register
+                are sorted by it
+    field_flags F x uint8   bits 0-2: sw access, bits 3-5: hw access
+                (values of systemrdl AccessType), bit 6: interrupt flag
+"""
+
+from systemrdl import rdltypes
+
+from pyrcom.exceptions import PyrcomError
+
+from array import array
+from bisect import bisect_right
+from collections import namedtuple
+
+import itertools
+import struct
+import sys
+
+# =============================================================================
+
+MAGIC = b'PYRCAMAP'
+FORMAT_VERSION = 1
+
+_HEADER = struct.Struct('<8sHHIII')
+
+RegisterEntry = namedtuple('RegisterEntry', ['path', 'address', 'size'])
+FieldEntry = namedtuple('FieldEntry', ['name', 'high', 'low', 'sw', 'hw', 'is_interrupt_flag'])
+
+
+class AddressMapFormatError(PyrcomError):
+    """ Serialized address map is damaged or of unsupported version """
+    pass
+
+
+def _to_le(values):
+    if sys.byteorder != 'little':
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values.tobytes()
+
+
+def _from_le(typecode, data, offset, count):
+    values = array(typecode)
+    end = offset + count * values.itemsize
+    if end > len(data):
+        raise AddressMapFormatError("Address map data is truncated")
+    values.frombytes(data[offset:end])
+    if sys.byteorder != 'little':
+        values.byteswap()
+    return values, end
+
+# =============================================================================
+
+
+class AddressMapIndex:
+    """ Registers and their fields sorted by address """
+
+    def __init__(self, paths, addresses, sizes, field_rows, field_names,
+                 field_high, field_low, field_flags):
+        self._paths = paths
+        self._addresses = addresses
+        self._sizes = sizes
+        self._field_rows = field_rows
+        self._field_names = field_names
+        self._field_high = field_high
+        self._field_low = field_low
+        self._field_flags = field_flags
+
+    @classmethod
+    def from_context(cls, context):
+        """ Build index of registers collected in `SynthesisContext`.
+        Elements of rolled register arrays are indexed one by one. """
+        registers = context.registers
+        fields = context.fields
+
+        # (address, path, register row) of every register and array element
+        elements = []
+        for reg in range(len(registers)):
+            dims = registers.array_dimensions[reg]
+            if not dims:
+                elements.append((registers.address[reg], registers.path[reg], reg))
+                continue
+            # Path of the first element ends with '[0]' per dimension
+            base_path = registers.path[reg][:-3 * len(dims)]
+            address = registers.address[reg]
+            stride = registers.array_stride[reg]
+            for i, idx in enumerate(itertools.product(*[range(n) for n in dims])):
+                elements.append((address + i * stride,
+                                 base_path + ''.join('[%d]' % k for k in idx), reg))
+        elements.sort()
+
+        paths = []
+        addresses = array('Q')
+        sizes = array('I')
+        field_rows = array('I', [0])
+        field_names = []
+        field_high = array('I')
+        field_low = array('I')
+        field_flags = bytearray()
+        for address, path, reg in elements:
+            paths.append(path)
+            addresses.append(address)
+            sizes.append(registers.size[reg])
+            for field in sorted(registers.field_rows(reg), key=fields.low.__getitem__):
+                field_names.append(fields.name[field])
+                field_high.append(fields.high[field])
+                field_low.append(fields.low[field])
+                field_flags.append(fields.sw[field].value | fields.hw[field].value << 3 |
+                                   bool(fields.is_interrupt_flag[field]) << 6)
+            field_rows.append(len(field_names))
+
+        return cls(paths, addresses, sizes, field_rows, field_names,
+                   field_high, field_low, field_flags)
+
+    def __len__(self):
+        return len(self._paths)
+
+    #
+    # Lookup
+    #
+
+    def register(self, row):
+        return RegisterEntry(self._paths[row], self._addresses[row], self._sizes[row])
+
+    def fields(self, row):
+        """ List of `FieldEntry` of register at `row`, by ascending bit position """
+        return [self._field(f) for f in range(self._field_rows[row], self._field_rows[row + 1])]
+
+    def _field(self, f):
+        flags = self._field_flags[f]
+        return FieldEntry(self._field_names[f], self._field_high[f], self._field_low[f],
+                          rdltypes.AccessType(flags & 7), rdltypes.AccessType(flags >> 3 & 7),
+                          bool(flags & 64))
+
+    def find(self, address):
+        """ Return row of register containing byte `address`, or None.
+        Overlapping registers resolve to the one starting last. """
+        row = bisect_right(self._addresses, address) - 1
+        if row >= 0 and address < self._addresses[row] + self._sizes[row]:
+            return row
+        return None
+
+    def lookup(self, address):
+        """ Return `RegisterEntry` containing byte `address`, or None """
+        row = self.find(address)
+        return None if row is None else self.register(row)
+
+    def lookup_field(self, address, bit=0):
+        """ Return `FieldEntry` holding bit `bit` of byte `address`, or None """
+        row = self.find(address)
+        if row is None:
+            return None
+        position = (address - self._addresses[row]) * 8 + bit
+        first = self._field_rows[row]
+        last = self._field_rows[row + 1]
+        f = bisect_right(self._field_low, position, first, last) - 1
+        if f >= first and position <= self._field_high[f]:
+            return self._field(f)
+        return None
+
+    #
+    # Checks
+    #
+
+    def overlaps(self):
+        """ Return list of (row, row) pairs of overlapping registers. Each
+        register is reported against the preceding register which reaches
+        furthest. """
+        result = []
+        reach_row = None
+        reach = 0
+        for row in range(len(self)):
+            start = self._addresses[row]
+            if reach_row is not None and start < reach:
+                result.append((reach_row, row))
+            end = start + self._sizes[row]
+            if reach_row is None or end > reach:
+                reach_row, reach = row, end
+        return result
+
+    def gaps(self):
+        """ Return list of (start, end) byte address ranges between first and
+        last register which are not covered by any register """
+        result = []
+        reach = None
+        for row in range(len(self)):
+            start = self._addresses[row]
+            if reach is not None and start > reach:
+                result.append((reach, start))
+            end = start + self._sizes[row]
+            reach = end if reach is None else max(reach, end)
+        return result
+
+    #
+    # Serialization
+    #
+
+    def to_bytes(self):
+        names = b''.join(name.encode('utf-8') + b'\0'
+                         for name in self._paths + self._field_names)
+        return b''.join([
+            _HEADER.pack(MAGIC, FORMAT_VERSION, 0,
+                         len(self._paths), len(self._field_names), len(names)),
+            names,
+            _to_le(self._addresses), _to_le(self._sizes), _to_le(self._field_rows),
+            _to_le(self._field_high), _to_le(self._field_low),
+            bytes(self._field_flags)
+        ])
+
+    @classmethod
+    def from_bytes(cls, data):
+        if len(data) < _HEADER.size:
+            raise AddressMapFormatError("Address map data is truncated")
+        magic, version, _, n_regs, n_fields, names_size = _HEADER.unpack_from(data)
+        if magic != MAGIC:
+            raise AddressMapFormatError("Data is not a serialized address map")
+        if version != FORMAT_VERSION:
+            raise AddressMapFormatError(str.format(
+                "Unsupported address map format version {0}", version))
+
+        offset = _HEADER.size
+        names = data[offset:offset + names_size].split(b'\0')[:-1]
+        if len(names) != n_regs + n_fields:
+            raise AddressMapFormatError("Address map names are damaged")
+        names = [name.decode('utf-8') for name in names]
+        offset += names_size
+
+        addresses, offset = _from_le('Q', data, offset, n_regs)
+        sizes, offset = _from_le('I', data, offset, n_regs)
+        field_rows, offset = _from_le('I', data, offset, n_regs + 1)
+        field_high, offset = _from_le('I', data, offset, n_fields)
+        field_low, offset = _from_le('I', data, offset, n_fields)
+        if offset + n_fields != len(data):
+            raise AddressMapFormatError("Address map data has unexpected size")
+        field_flags = bytearray(data[offset:])
+
+        return cls(names[:n_regs], addresses, sizes, field_rows, names[n_regs:],
+                   field_high, field_low, field_flags)
+
+    def write(self, path):
+        with open(path, 'wb') as fd:
+            fd.write(self.to_bytes())
+
+    @classmethod
+    def read(cls, path):
+        with open(path, 'rb') as fd:
+            return cls.from_bytes(fd.read())
@@ -19,21 +19,99 @@
 # THE SOFTWARE.
 
 from systemrdl.messages import MessagePrinter
-from jinja2 import Environment, FileSystemLoader
+from jinja2 import Environment, FileSystemLoader, FileSystemBytecodeCache
 from jinja2.exceptions import TemplateError
 
-from pyrcom.exceptions import CodegenTemplateError
+from pyrcom.exceptions import CodegenError, CodegenTemplateError
 from pyrcom.act.common import ACTBuilder, ACTVisitor, ACTNode
+from pyrcom.cache import default_cache_dir
+from pyrcom.stats import NULL_STATS
 
+from abc import ABC, abstractmethod
+import hashlib
 import os
+import re
 
 
 # =============================================================================
 
+
+class Splice:
+    """ Streamed content passed as template argument to `render_stream`.
+
+    Template sees only a short placeholder, the chunks are spliced into
+    template output at the place the placeholder was rendered. Placeholder
+    must be rendered as is (no filters). """
+
+    def __init__(self, chunks):
+        self._chunks = chunks
+
+    def __str__(self):
+        return '\x00%x\x00' % id(self)
+
+    @property
+    def chunks(self):
+        return self._chunks
+
+# =============================================================================
+# Template environment
+
+
+DEFAULT_TEMPLATE_DIR = os.path.dirname(
+    os.path.abspath(__file__)) + '/template/'
+
+
+def template_cache_dir():
+    """ Directory of compiled template bytecode, may be overridden with
+    PYRCOM_TEMPLATE_CACHE environment variable """
+    return os.environ.get('PYRCOM_TEMPLATE_CACHE') or \
+        os.path.join(default_cache_dir(), 'templates')
+
+
+class TemplateBytecodeCache (FileSystemBytecodeCache):
+    """ Bytecode cache which never fails rendering: if compiled template
+    cannot be stored, it is simply compiled again next time. """
+
+    def __init__(self, directory=None):
+        directory = directory or template_cache_dir()
+        try:
+            os.makedirs(directory, exist_ok=True)
+        except OSError:
+            pass
+        super(TemplateBytecodeCache, self).__init__(directory)
+
+    def load_bytecode(self, bucket):
+        try:
+            super(TemplateBytecodeCache, self).load_bytecode(bucket)
+        except OSError:
+            pass
+
+    def dump_bytecode(self, bucket):
+        try:
+            super(TemplateBytecodeCache, self).dump_bytecode(bucket)
+        except OSError:
+            pass
+
+
+_default_env = None
+
+
+def default_environment():
+    """ Return Jinja environment of built-in templates, shared by all
+    emitters which are not given their own environment. """
+    global _default_env
+    if _default_env is None:
+        _default_env = Environment(loader=FileSystemLoader(DEFAULT_TEMPLATE_DIR),
+                                   bytecode_cache=TemplateBytecodeCache())
+    return _default_env
+
+# =============================================================================
+
 class LanguageComponent:
-    def __init__(self, language_config=dict(), printer=MessagePrinter()):
+    def __init__(self, language_config=dict(), printer=MessagePrinter(), stats=None):
         self._config = language_config
         self._printer = printer
+        self._stats = stats or NULL_STATS
 
     @property
     def language_config(self) -> dict:
@@ -43,62 +121,230 @@ class LanguageComponent:
     def printer(self):
         return self._printer
 
+    @property
+    def stats(self):
+        """ `Stats` collecting stage measurements, `NULL_STATS` if not profiling """
+        return self._stats
+
 # =============================================================================
 
 
-class LanguageBuilderBase (LanguageComponent, ACTBuilder):
-    def __init__(self, language_config=dict(), printer=MessagePrinter()):
-        LanguageComponent.__init__(self, language_config, printer)
+class LanguageBuilderBase (LanguageComponent, ACTBuilder, ABC):
+    """ Base class of language builders, which implement `build_act` """
+
+    def __init__(self, language_config=dict(), printer=MessagePrinter(), stats=None):
+        LanguageComponent.__init__(self, language_config, printer, stats)
         ACTBuilder.__init__(self)
+        self._synthesis_context = None
+
+    @property
+    def synthesis_context(self):
+        """ Synthesis context of the last built ACT, None before first build """
+        return self._synthesis_context
+
+    @abstractmethod
+    def build_act(self, rdl_root, synthesis_context=None):
+        """ Build ACT of `rdl_root`. Builders reuse `synthesis_context`, if
+        given, instead of walking the RDL tree again. """
 
 # =============================================================================
 
 
 class LanguageEmitterBase (LanguageComponent, ACTVisitor):
 
-    DEFAULT_TEMPLATE_DIR = os.path.dirname(
-        os.path.abspath(__file__)) + '/template/'
+    DEFAULT_TEMPLATE_DIR = DEFAULT_TEMPLATE_DIR
     DEFAULT_TEMPLATE_SUFFIX = ''
 
+    # Classes of module nodes (with `module_name`), each of them is measured
+    # as a stage of its own when profiling
+    module_node_classes = ()
+
     def __init__(self,
                  language_name,
                  language_config=dict(),
-                 env=Environment(loader=FileSystemLoader(
-                     DEFAULT_TEMPLATE_DIR)),
+                 env=None,
                  printer=MessagePrinter(),
-                 template_suffix=DEFAULT_TEMPLATE_SUFFIX):
-        LanguageComponent.__init__(self, language_config, printer)
-        ACTVisitor.__init__(self)
+                 template_suffix=DEFAULT_TEMPLATE_SUFFIX,
+                 trace=False,
+                 stats=None):
+        LanguageComponent.__init__(self, language_config, printer, stats)
+        ACTVisitor.__init__(self, self._trace_visit if trace else None)
+        if self._stats.enabled:
+            # Instance attributes shadow the visitor methods only when
+            # profiling, so visits are not slowed down otherwise
+            self.visit = self._profiled_visit
+            self.visit_stream = self._profiled_visit_stream
         self._language_name = language_name
-        self._env = env
+        self._env = env or default_environment()
         self._template_suffix = template_suffix
+        # Resolved templates, so each one is looked up only once
+        self._templates = {}
+        self._template_fingerprint = None
+        self.setup_environment()
+
+    def setup_environment(self):
+        """ Hook for registering filters etc. required by the templates """
+        pass
 
     def add_jinja_filter(self, filter_name, filter):
         self._env.filters[filter_name] = filter
 
     def get_template(self, template_name):
-        path = self._language_name + '/' + template_name + self._template_suffix
-        return self._env.get_template(path)
+        try:
+            return self._templates[template_name]
+        except KeyError:
+            path = self._language_name + '/' + template_name + self._template_suffix
+            template = self._templates[template_name] = self._env.get_template(path)
+            return template
+
+    def precompile_templates(self):
+        """ Compile all templates of the language, so they are stored in the
+        bytecode cache of the environment. Returns list of compiled templates. """
+        prefix = self._language_name + '/'
+        names = self._env.list_templates(
+            filter_func=lambda name: name.startswith(prefix) and name.endswith(self._template_suffix))
+        try:
+            for name in names:
+                self._env.get_template(name)
+        except TemplateError as e:
+            raise CodegenTemplateError(str.format("Could not compile template '{0}'", name)) from e
+        return names
+
+    def template_fingerprint(self):
+        """ Return hex digest of sources of all templates of the language """
+        if self._template_fingerprint is None:
+            prefix = self._language_name + '/'
+            h = hashlib.sha256()
+            for name in self._env.list_templates(filter_func=lambda name: name.startswith(prefix)):
+                source = self._env.loader.get_source(self._env, name)[0]
+                h.update(name.encode('utf-8') + b'\0' + source.encode('utf-8') + b'\0')
+            self._template_fingerprint = h.hexdigest()
+        return self._template_fingerprint
 
     def render(self, template_name, **kwargs):
         return self.get_template(template_name).render(kwargs)
 
+    _SPLICE_RE = re.compile('(\x00[0-9a-f]+\x00)')
+
+    def render_stream(self, template_name, **kwargs):
+        """ Generator counterpart of `render`. Arguments being `Splice` objects
+        (or lists of them) are streamed into the output. """
+        splices = {}
+        for value in kwargs.values():
+            for item in (value if isinstance(value, (list, tuple)) else (value,)):
+                if isinstance(item, Splice):
+                    splices[str(item)] = item
+
+        for chunk in self.get_template(template_name).generate(kwargs):
+            if not splices:
+                yield chunk
+                continue
+            for part in self._SPLICE_RE.split(chunk):
+                splice = splices.get(part)
+                if splice is not None:
+                    yield from splice.chunks
+                elif part:
+                    yield part
+
     def print_message(self, severity, text, src_ref=None):
         """ Wrapper to printer.print_message allowing default `src_ref` """
         self._printer.print_message(severity, text, src_ref)
 
-    def generate_code(self, language_builder, rdl_root):
+    def _trace_visit(self, node):
+        self.print_message("debug", "Visiting %s" % node.__class__.__name__)
+
+    def _profiled_visit(self, node):
+        if not isinstance(node, self.module_node_classes):
+            return ACTVisitor.visit(self, node)
+        with self._stats.stage('visit:' + node.module_name):
+            return ACTVisitor.visit(self, node)
+
+    def _profiled_visit_stream(self, node):
+        stream = ACTVisitor.visit_stream(self, node)
+        if not isinstance(node, self.module_node_classes) or \
+                self._stream_table[node.__class__] is ACTVisitor._stream_leaf:
+            # Leaf nodes are measured by the visit they are rendered with
+            return stream
+        return self._stats.timed_iter('visit:' + node.module_name, stream)
+
+    def generate_code(self, language_builder, rdl_root, synthesis_context=None):
         try:
             self.do_prebuild(rdl_root)
-            act_root = language_builder.build_act(rdl_root)
+            with self._stats.stage('build_act'):
+                act_root = language_builder.build_act(rdl_root, synthesis_context)
             code = self.visit(act_root)
             self.do_postbuild(rdl_root, code)
             return code
 
         except TemplateError as e:
             raise CodegenTemplateError() from e
+        finally:
+            self.close()
         # raise CodegenTemplateError("Code template error", inner_error=e)
 
+    def write_code(self, language_builder, rdl_root, fd, synthesis_context=None):
+        """ Streaming counterpart of `generate_code`: code is written to file
+        object `fd` as it is rendered instead of being returned as one string.
+        `do_postbuild` receives None as generated code. """
+        try:
+            self.do_prebuild(rdl_root)
+            with self._stats.stage('build_act'):
+                act_root = language_builder.build_act(rdl_root, synthesis_context)
+            self._write_stream(act_root, fd)
+            self.do_postbuild(rdl_root, None)
+
+        except TemplateError as e:
+            raise CodegenTemplateError() from e
+        finally:
+            self.close()
+
+    def generate_act_code(self, act_root):
+        """ Return code of `act_root` built beforehand, e.g. loaded with
+        `pyrcom.act.serialize.SavedACT`. RDL tree is not needed, so
+        `do_prebuild` and `do_postbuild` are not called. """
+        try:
+            return self.visit(act_root)
+        except TemplateError as e:
+            raise CodegenTemplateError() from e
+        finally:
+            self.close()
+
+    def write_act_code(self, act_root, fd):
+        """ Streaming counterpart of `generate_act_code` """
+        try:
+            self._write_stream(act_root, fd)
+        except TemplateError as e:
+            raise CodegenTemplateError() from e
+        finally:
+            self.close()
+
+    def _write_stream(self, act_root, fd):
+        if self._stats.enabled:
+            # Writes are measured apart from rendering of the chunks
+            for chunk in self.visit_stream(act_root):
+                with self._stats.stage('write'):
+                    fd.write(chunk)
+        else:
+            for chunk in self.visit_stream(act_root):
+                fd.write(chunk)
+
+    def render_shard(self, nodes):
+        """ Render list of sibling `nodes` as `visit` renders them within
+        their parent (used by worker processes, see `pyrcom.codegen.shard`) """
+        return self._visit_iterable(nodes)
+
+    def close(self):
+        """ Release resources held for rendering (e.g. worker processes).
+        Called when code generation by any of `generate_code`, `write_code`,
+        `generate_act_code` or `write_act_code` finishes. """
+        pass
+
+    def split_files(self, act_root):
+        """ Return list of (file name, ACT node) pairs: the code of `act_root`
+        split into separate files, as written by `IncrementalWriter` """
+        raise CodegenError(str.format(
+            "Language '{0}' does not support per-module output", self._language_name))
+
     def do_prebuild(self, rdl_root):
         pass
 
@@ -108,3 +354,52 @@ class LanguageEmitterBase (LanguageComponent, ACTVisitor):
     @property
     def language_name(self):
         return self._language_name
+
+    @property
+    def template_suffix(self):
+        return self._template_suffix
+
+# =============================================================================
+
+
+class LanguageBackend:
+    """ Builder and emitter classes of one output language, as registered
+    in the backend registry (see `pyrcom.codegen.registry`) """
+
+    def __init__(self, name, builder_class, emitter_class,
+                 template_suffix=LanguageEmitterBase.DEFAULT_TEMPLATE_SUFFIX,
+                 description=''):
+        self._name = name
+        self._builder_class = builder_class
+        self._emitter_class = emitter_class
+        self._template_suffix = template_suffix
+        self._description = description
+
+    def __repr__(self):
+        return str.format("LanguageBackend('{0}')", self._name)
+
+    @property
+    def name(self):
+        """ Language name, also name of the template directory """
+        return self._name
+
+    @property
+    def builder_class(self):
+        return self._builder_class
+
+    @property
+    def emitter_class(self):
+        return self._emitter_class
+
+    @property
+    def description(self):
+        return self._description
+
+    def create_builder(self, language_config, printer=MessagePrinter(), stats=None):
+        return self._builder_class(language_config, printer=printer, stats=stats)
+
+    def create_emitter(self, language_config, printer=MessagePrinter(), trace=False, stats=None,
+                       env=None):
+        return self._emitter_class(self._name, language_config, env=env, printer=printer,
+                                   template_suffix=self._template_suffix,
+                                   trace=trace, stats=stats)
@@ -0,0 +1,358 @@
+# Copyright © 2018 Mateusz Maciąg
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the “Software”), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software
+# is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS
+# OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+""" Models of hierarchical address decoder and read data multiplexer.
+
+Register word addresses are decoded by a radix tree: every level of the
+tree compares a slice of address bits (most significant first) and selects
+one of its children, the last level selects registers. Only populated
+branches exist. The same model is used to generate select logic and to
+check that it decodes every address exactly as a flat decoder would.
+
+Read data is multiplexed by an AND-OR tree of one-hot selected register
+outputs, optionally pipelined at chosen tree levels.
+"""
+
+from pyrcom.exceptions import CodegenError
+
+# =============================================================================
+
+DEFAULT_RADIX_BITS = 4
+
+# Maps with address space up to this many bits are verified exhaustively
+EXHAUSTIVE_VERIFY_BITS = 20
+
+
+def address_width(address_map):
+    """ Number of address bits needed to decode all word addresses of
+    `address_map` (list of (word address, select signal)) """
+    top = max((address for address, _ in address_map), default=0)
+    return max(1, top.bit_length())
+
+# =============================================================================
+
+
+class DecodeNode:
+    """ Node of decode tree. It compares address bits `bit_high:bit_low`
+    and selects its children (internal node) or registers (leaf). """
+
+    __slots__ = ('_level', '_prefix', '_bit_high', '_bit_low', '_signal', '_children', '_selects')
+
+    def __init__(self, level, prefix, bit_high, bit_low, signal=None):
+        self._level = level
+        self._prefix = prefix
+        self._bit_high = bit_high
+        self._bit_low = bit_low
+        self._signal = signal
+        self._children = {}
+        self._selects = {}
+
+    def __repr__(self):
+        return str.format("DecodeNode(level={0}, [{1}:{2}], {3})",
+                          self._level, self._bit_high, self._bit_low, self._signal)
+
+    @property
+    def level(self):
+        return self._level
+
+    @property
+    def prefix(self):
+        """ Value of address bits above `bit_high` decoded by parent nodes """
+        return self._prefix
+
+    @property
+    def bit_high(self):
+        return self._bit_high
+
+    @property
+    def bit_low(self):
+        return self._bit_low
+
+    @property
+    def width(self):
+        return self._bit_high - self._bit_low + 1
+
+    @property
+    def signal(self):
+        """ Select signal driven by the parent node, None for the root """
+        return self._signal
+
+    @property
+    def is_leaf(self):
+        return not self._children
+
+    @property
+    def children(self):
+        """ List of (digit, child node) sorted by digit """
+        return sorted(self._children.items())
+
+    @property
+    def selects(self):
+        """ List of (digit, register select signal) of leaf node sorted by digit """
+        return sorted(self._selects.items())
+
+    def digit(self, address):
+        return (address >> self._bit_low) & ((1 << self.width) - 1)
+
+# =============================================================================
+
+
+class DecodeTree:
+    """ Radix tree decoder of `address_map` (list of (word address, select
+    signal)). Each level decodes `radix_bits` address bits, the top level
+    takes whatever remains. """
+
+    __slots__ = ('_address_map', '_width', '_radix_bits', '_signal_prefix', '_slices', '_root')
+
+    def __init__(self, address_map, radix_bits=DEFAULT_RADIX_BITS, width=None,
+                 signal_prefix='sw_decode'):
+        if radix_bits < 1:
+            raise CodegenError(str.format(
+                "Decoder radix must be at least 1 bit, got {0}", radix_bits))
+        self._address_map = list(address_map)
+        self._width = width or address_width(self._address_map)
+        self._radix_bits = radix_bits
+        self._signal_prefix = signal_prefix
+
+        if address_width(self._address_map) > self._width:
+            raise CodegenError(str.format(
+                "Address map does not fit in {0} address bits", self._width))
+
+        # Slices of address bits decoded by each level, MSB first
+        n_levels = -(-self._width // radix_bits)
+        top_bits = self._width - (n_levels - 1) * radix_bits
+        self._slices = [(self._width - 1, self._width - top_bits)]
+        for level in range(1, n_levels):
+            high = self._slices[-1][1] - 1
+            self._slices.append((high, high - radix_bits + 1))
+
+        self._root = self._make_node(0, 0, None)
+        for address, signal in self._address_map:
+            self._insert(address, signal)
+
+    def _make_node(self, level, prefix, signal):
+        high, low = self._slices[level]
+        return DecodeNode(level, prefix, high, low, signal)
+
+    def _insert(self, address, signal):
+        node = self._root
+        for level in range(1, len(self._slices)):
+            digit = node.digit(address)
+            child = node._children.get(digit)
+            if child is None:
+                prefix = (node.prefix << node.width) | digit
+                child = self._make_node(level, prefix, str.format(
+                    "{0}_l{1}_{2:x}", self._signal_prefix, level, prefix))
+                node._children[digit] = child
+            node = child
+        # First register of given address wins, as in a flat `case`
+        node._selects.setdefault(node.digit(address), signal)
+
+    @property
+    def address_map(self):
+        return self._address_map
+
+    @property
+    def width(self):
+        """ Number of decoded word address bits """
+        return self._width
+
+    @property
+    def radix_bits(self):
+        return self._radix_bits
+
+    @property
+    def depth(self):
+        return len(self._slices)
+
+    @property
+    def root(self):
+        return self._root
+
+    def nodes(self):
+        """ All nodes, level by level, sorted by prefix within a level """
+        result = []
+        level = [self._root]
+        while level:
+            result.extend(level)
+            level = [child for node in level for _, child in node.children]
+        return result
+
+    def decode(self, address):
+        """ Return select signal asserted for word `address`, or None """
+        if address >> self._width:
+            return None
+        node = self._root
+        while not node.is_leaf:
+            node = node._children.get(node.digit(address))
+            if node is None:
+                return None
+        return node._selects.get(node.digit(address))
+
+    def verify(self):
+        """ Compare the tree with flat decoding of the address map. Returns
+        list of (address, expected signal, decoded signal) mismatches.
+
+        Address spaces up to EXHAUSTIVE_VERIFY_BITS bits are checked
+        exhaustively, larger ones at every mapped address and its
+        neighbours. """
+
+        expected = {}
+        for address, signal in self._address_map:
+            expected.setdefault(address, signal)
+
+        if self._width <= EXHAUSTIVE_VERIFY_BITS:
+            addresses = range(1 << self._width)
+        else:
+            addresses = sorted({a + d for a in expected for d in (-1, 0, 1)
+                                if 0 <= a + d < (1 << self._width)})
+
+        mismatches = []
+        for address in addresses:
+            got = self.decode(address)
+            if got != expected.get(address):
+                mismatches.append((address, expected.get(address), got))
+        return mismatches
+
+# =============================================================================
+
+
+class MuxNode:
+    """ OR of `operands` at given level of `MuxTree`. Operands of the first
+    level are inputs of the tree (select, data) pairs, of upper levels nodes
+    of the level below. """
+
+    __slots__ = ('_level', '_index', '_operands', '_signal', '_registered')
+
+    def __init__(self, level, index, operands, signal, registered=False):
+        self._level = level
+        self._index = index
+        self._operands = operands
+        self._signal = signal
+        self._registered = registered
+
+    def __repr__(self):
+        return str.format("MuxNode({0}, {1} operand(s))", self._signal, len(self._operands))
+
+    @property
+    def level(self):
+        return self._level
+
+    @property
+    def index(self):
+        return self._index
+
+    @property
+    def operands(self):
+        return self._operands
+
+    @property
+    def signal(self):
+        return self._signal
+
+    @property
+    def registered(self):
+        """ Node output is registered (pipeline stage after its level) """
+        return self._registered
+
+
+class MuxTree:
+    """ AND-OR read data multiplexer with one-hot selects.
+
+    `inputs` is list of (word address, select signal, data signal). Every
+    input is masked with its select, masked inputs are OR-ed in groups of
+    `fan_in` per level until one node is left. Outputs of levels listed in
+    `pipeline_levels` (1 - first level) are registered, each adding one
+    cycle of latency. """
+
+    __slots__ = ('_inputs', '_fan_in', '_levels', '_pipeline_levels')
+
+    def __init__(self, inputs, fan_in=4, pipeline_levels=(), signal_prefix='sw_rmux'):
+        if fan_in < 2:
+            raise CodegenError(str.format("Read mux fan-in must be at least 2, got {0}", fan_in))
+        self._inputs = list(inputs)
+        self._fan_in = fan_in
+        self._levels = []
+
+        operands = self._inputs
+        level = 1
+        while operands and (level == 1 or len(operands) > 1):
+            nodes = []
+            for index, start in enumerate(range(0, len(operands), fan_in)):
+                nodes.append(MuxNode(level, index, operands[start:start + fan_in],
+                                     str.format("{0}_l{1}_{2}", signal_prefix, level, index),
+                                     level in pipeline_levels))
+            self._levels.append(nodes)
+            operands = nodes
+            level += 1
+
+        invalid = [l for l in pipeline_levels if not 1 <= l <= len(self._levels)]
+        if invalid:
+            raise CodegenError(str.format(
+                "Read mux pipeline level(s) {0} out of range, mux has {1} level(s)",
+                invalid, len(self._levels)))
+        self._pipeline_levels = sorted(set(pipeline_levels))
+
+    @property
+    def inputs(self):
+        return self._inputs
+
+    @property
+    def fan_in(self):
+        return self._fan_in
+
+    @property
+    def levels(self):
+        """ List of levels, each one list of `MuxNode` """
+        return self._levels
+
+    @property
+    def depth(self):
+        return len(self._levels)
+
+    @property
+    def pipeline_levels(self):
+        return self._pipeline_levels
+
+    @property
+    def latency(self):
+        """ Clock cycles added by pipeline stages """
+        return len(self._pipeline_levels)
+
+    @property
+    def output(self):
+        """ Output node, or None if mux has no inputs """
+        return self._levels[-1][0] if self._levels else None
+
+    def evaluate(self, address, data):
+        """ Value at mux output when word `address` is read and data
+        signals have values given by `data` dictionary (pipeline stages
+        are assumed to be filled) """
+
+        def value(operand):
+            if isinstance(operand, MuxNode):
+                result = 0
+                for o in operand.operands:
+                    result |= value(o)
+                return result
+            input_address, _, data_signal = operand
+            return data[data_signal] if input_address == address else 0
+
+        return value(self.output) if self._levels else 0
@@ -0,0 +1,243 @@
+# Copyright © 2018 Mateusz Maciąg
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the “Software”), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software
+# is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS
+# OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+""" Incremental generation: every module of the design is written to its
+own file, and files are rewritten only when their content changes.
+
+A manifest stored next to the generated files records, for every file,
+fingerprint of the ACT subtree it was rendered from and fingerprint of its
+content. Module whose ACT fingerprint matches the manifest (and whose file
+was not touched since) is not rendered at all.
+"""
+
+from jinja2.exceptions import TemplateError
+
+from pyrcom.act.common import ACTNode
+from pyrcom.exceptions import CodegenTemplateError
+
+import hashlib
+import json
+import os
+
+# =============================================================================
+
+MANIFEST_NAME = '.pyrcom-manifest.json'
+
+# Bump whenever fingerprinting or manifest layout changes
+MANIFEST_FORMAT_VERSION = 1
+
+# Status of generated file reported by `IncrementalWriter.write_code`
+SKIPPED = 'skipped'         # ACT did not change, file was not rendered
+UNCHANGED = 'unchanged'     # rendered, content identical, file not touched
+WRITTEN = 'written'         # file created or rewritten
+REMOVED = 'removed'         # file generated previously, no longer produced
+
+
+def _slots(node_class):
+    slots = []
+    for cls in reversed(node_class.__mro__):
+        slots.extend(cls.__dict__.get('__slots__', ()))
+    return slots
+
+
+def act_fingerprint(node):
+    """ Return hex digest of ACT subtree: node classes and all their
+    attribute values, recursively. Equal subtrees render to equal code.
+    Plain objects referenced by nodes are digested by their attributes. """
+
+    h = hashlib.sha256()
+    slots_of = {}
+
+    def feed(obj):
+        node_class = obj.__class__
+        slots = slots_of.get(node_class)
+        if slots is None:
+            slots = slots_of[node_class] = _slots(node_class)
+        if isinstance(obj, ACTNode):
+            h.update(b'N' + node_class.__qualname__.encode('utf-8') + b'(')
+            for name in slots:
+                feed(getattr(obj, name, None))
+            h.update(b')')
+        elif isinstance(obj, (list, tuple)):
+            h.update(b'[')
+            for item in obj:
+                feed(item)
+            h.update(b']')
+        elif isinstance(obj, dict):
+            h.update(b'{')
+            for key in sorted(obj):
+                feed(key)
+                feed(obj[key])
+            h.update(b'}')
+        elif slots and not isinstance(obj, type):
+            # Models referenced by nodes (e.g. decoder trees), their repr()
+            # may contain object address
+            h.update(b'O' + node_class.__qualname__.encode('utf-8'))
+            feed([getattr(obj, name, None) for name in slots])
+        elif hasattr(obj, '__dict__') and not isinstance(obj, type):
+            h.update(b'O' + node_class.__qualname__.encode('utf-8'))
+            feed(vars(obj))
+        else:
+            h.update(repr(obj).encode('utf-8'))
+            h.update(b'\0')
+
+    feed(node)
+    return h.hexdigest()
+
+
+def content_fingerprint(data):
+    return hashlib.sha256(data).hexdigest()
+
+# =============================================================================
+
+
+class IncrementalWriter:
+    """ Writes files produced by `emitter` (see
+    `LanguageEmitterBase.split_files`) into `output_dir`. """
+
+    def __init__(self, output_dir, emitter):
+        self._output_dir = output_dir
+        self._emitter = emitter
+
+    @property
+    def output_dir(self):
+        return self._output_dir
+
+    @property
+    def manifest_path(self):
+        return os.path.join(self._output_dir, MANIFEST_NAME)
+
+    def load_manifest(self):
+        """ Return file name -> entry mapping of previous run, or empty dict """
+        try:
+            with open(self.manifest_path, 'r') as fd:
+                doc = json.load(fd)
+        except (OSError, ValueError):
+            return {}
+        if not isinstance(doc, dict) or doc.get('format') != MANIFEST_FORMAT_VERSION:
+            return {}
+        files = doc.get('files')
+        return files if isinstance(files, dict) else {}
+
+    def write_code(self, language_builder, rdl_root, synthesis_context=None):
+        """ Build ACT and write changed files. Returns dictionary of
+        file name -> status (SKIPPED, UNCHANGED, WRITTEN or REMOVED). """
+
+        emitter = self._emitter
+        os.makedirs(self._output_dir, exist_ok=True)
+        previous = self.load_manifest()
+        manifest = {}
+        status = {}
+
+        try:
+            emitter.do_prebuild(rdl_root)
+            with emitter.stats.stage('build_act'):
+                act_root = language_builder.build_act(rdl_root, synthesis_context)
+            template_fp = emitter.template_fingerprint()
+
+            for file_name, node in emitter.split_files(act_root):
+                path = os.path.join(self._output_dir, file_name)
+                act_fp = content_fingerprint(
+                    (template_fp + act_fingerprint(node)).encode('utf-8'))
+
+                entry = previous.get(file_name)
+                if entry and entry.get('act') == act_fp and self._stamp(path) == entry.get('stamp'):
+                    manifest[file_name] = entry
+                    status[file_name] = SKIPPED
+                    continue
+
+                data = ''.join(emitter.visit_stream(node)).encode('utf-8')
+                content_fp = content_fingerprint(data)
+                if self._file_fingerprint(path) == content_fp:
+                    status[file_name] = UNCHANGED
+                else:
+                    with emitter.stats.stage('write'):
+                        self._replace(path, data)
+                    status[file_name] = WRITTEN
+
+                manifest[file_name] = {
+                    'act': act_fp,
+                    'content': content_fp,
+                    'stamp': self._stamp(path)
+                }
+
+            emitter.do_postbuild(rdl_root, None)
+
+        except TemplateError as e:
+            raise CodegenTemplateError() from e
+        finally:
+            emitter.close()
+
+        for file_name in previous:
+            if file_name not in manifest:
+                path = self._stale_path(file_name)
+                if path is None:
+                    continue
+                self._remove(path)
+                status[file_name] = REMOVED
+
+        if manifest != previous:
+            doc = {'format': MANIFEST_FORMAT_VERSION, 'files': manifest}
+            self._replace(self.manifest_path,
+                          json.dumps(doc, indent=2, sort_keys=True).encode('utf-8'))
+
+        return status
+
+    def _stale_path(self, file_name):
+        """ Path of file listed in previous manifest, or None if it is not
+        inside output directory (manifest may have been edited) """
+        root = os.path.realpath(self._output_dir)
+        path = os.path.realpath(os.path.join(root, file_name))
+        if path == root or os.path.commonpath([root, path]) != root:
+            return None
+        return path
+
+    @staticmethod
+    def _stamp(path):
+        """ (size, mtime) of a file, used to detect files edited by hand """
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        return [st.st_size, st.st_mtime_ns]
+
+    @staticmethod
+    def _file_fingerprint(path):
+        try:
+            with open(path, 'rb') as fd:
+                return content_fingerprint(fd.read())
+        except OSError:
+            return None
+
+    def _replace(self, path, data):
+        tmp_path = path + '.tmp'
+        try:
+            with open(tmp_path, 'wb') as fd:
+                fd.write(data)
+            os.replace(tmp_path, path)
+        finally:
+            self._remove(tmp_path)
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
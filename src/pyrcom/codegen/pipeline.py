@@ -0,0 +1,118 @@
+# Copyright © 2018 Mateusz Maciąg
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the “Software”), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software
+# is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS
+# OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+""" Generation of several outputs from one compiled RDL tree.
+
+RDL tree is walked once and the synthesis context is shared by the
+builders of all outputs. Outputs are built and rendered by a pool of
+threads, each output file is written as soon as its code is complete.
+Rendering is CPU bound Python code, so threads overlap mostly file I/O;
+outputs are independent, so a slow one does not hold the others back.
+"""
+
+from pyrcom.codegen.registry import get_backend
+from pyrcom.codegen.synthesis import build_synthesis_context
+from pyrcom.stats import NULL_STATS
+
+from concurrent.futures import ThreadPoolExecutor
+
+import os
+
+# =============================================================================
+
+
+class OutputTarget:
+    """ Output file generated by a language backend """
+
+    def __init__(self, language, output_path, language_config):
+        self._language = language
+        self._output_path = output_path
+        self._language_config = language_config
+
+    def __repr__(self):
+        return str.format("OutputTarget('{0}' -> '{1}')", self._language, self._output_path)
+
+    @property
+    def language(self):
+        return self._language
+
+    @property
+    def output_path(self):
+        return self._output_path
+
+    @property
+    def language_config(self):
+        return self._language_config
+
+
+def _write_output(target, rdl_root, context, printer, trace, stats):
+    backend = get_backend(target.language)
+    builder = backend.create_builder(target.language_config, printer=printer, stats=stats)
+    emitter = backend.create_emitter(target.language_config, printer=printer,
+                                     trace=trace, stats=stats)
+
+    # Partial output is never left behind - file is replaced once complete
+    tmp_path = target.output_path + '.tmp'
+    try:
+        with open(tmp_path, "w") as fd:
+            emitter.write_code(builder, rdl_root, fd, context)
+        os.replace(tmp_path, target.output_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def write_outputs(rdl_root, targets, printer, synthesis_context=None, workers=None,
+                  trace=False, stats=None):
+    """ Generate and write all `targets` (list of `OutputTarget`) of
+    `rdl_root`. Backends of all targets are resolved before any output is
+    written. `workers` limits number of threads (default: one per target);
+    with `stats` enabled targets are generated one by one, as stages are
+    measured per thread of execution. First error of a target is raised once
+    all targets finished. Returns the synthesis context. """
+
+    stats = stats or NULL_STATS
+    for target in targets:
+        get_backend(target.language)
+
+    context = synthesis_context
+    if context is None:
+        with stats.stage('walk'):
+            context = build_synthesis_context(rdl_root)
+
+    if stats.enabled:
+        workers = 1
+    workers = min(workers or len(targets), len(targets))
+
+    if workers <= 1:
+        for target in targets:
+            with stats.stage(target.language):
+                _write_output(target, rdl_root, context, printer, trace, stats)
+        return context
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(_write_output, target, rdl_root, context, printer, trace, None)
+                   for target in targets]
+        errors = [f.exception() for f in futures]
+
+    for error in errors:
+        if error is not None:
+            raise error
+    return context
@@ -0,0 +1,73 @@
+# Copyright © 2018 Mateusz Maciąg
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the “Software”), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software
+# is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS
+# OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+""" pyrcom-precompile-templates: compile built-in code templates ahead of
+time, so code generation does not need to parse and compile them. """
+
+from jinja2 import Environment, FileSystemLoader
+
+from pyrcom.exceptions import PyrcomError
+from pyrcom.codegen.base import DEFAULT_TEMPLATE_DIR, TemplateBytecodeCache, template_cache_dir
+from pyrcom.codegen.registry import BUILTIN_BACKENDS, get_backend
+
+import argparse
+import sys
+
+
+def precompile(cache_dir=None):
+    """ Compile templates of all built-in emitters into `cache_dir`.
+    Returns number of compiled templates. """
+    env = Environment(loader=FileSystemLoader(DEFAULT_TEMPLATE_DIR),
+                      bytecode_cache=TemplateBytecodeCache(cache_dir))
+    count = 0
+    for name in BUILTIN_BACKENDS:
+        emitter = get_backend(name).create_emitter({}, env=env)
+        count += len(emitter.precompile_templates())
+    return count
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(prog='pyrcom-precompile-templates',
+                                 description="Compile built-in code templates into bytecode cache.")
+    ap.add_argument(
+        '--cache-dir',
+        metavar='<dir>',
+        type=str,
+        dest='cache_dir',
+        default=template_cache_dir(),
+        help="Bytecode cache directory (default: %(default)s)."
+    )
+    args = ap.parse_args(argv)
+
+    try:
+        count = precompile(args.cache_dir)
+    except PyrcomError as e:
+        message = str(e)
+        if e.__cause__:
+            message = "%s Details: %s" % (message, e.__cause__)
+        sys.stderr.write("error: %s\n" % message)
+        return 1
+
+    print(str.format("{0} templates compiled into {1}", count, args.cache_dir))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
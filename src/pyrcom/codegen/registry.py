@@ -0,0 +1,106 @@
+# Copyright © 2018 Mateusz Maciąg
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the “Software”), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software
+# is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS
+# OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+""" Registry of language backends.
+
+Backend is a `LanguageBackend` object naming builder and emitter classes of
+an output language. Backends are registered as entry points of group
+'pyrcom.backends' in package metadata:
+
+    entry_points={
+        'pyrcom.backends': [
+            'vhdl = mypackage.vhdl:VHDL_BACKEND',
+        ],
+    }
+
+Module of a backend is imported only when the backend is selected, so
+installed backends do not slow down startup. Built-in backends are known
+even when pyrcom itself is not installed.
+"""
+
+from pyrcom.exceptions import CodegenError
+
+import importlib
+
+# =============================================================================
+
+ENTRY_POINT_GROUP = 'pyrcom.backends'
+
+DEFAULT_BACKEND = 'sv'
+
+# name -> 'module:attribute' of built-in backends
+BUILTIN_BACKENDS = {
+    'sv': 'pyrcom.codegen.systemverilog:SYSTEMVERILOG_BACKEND',
+    'c': 'pyrcom.codegen.regmap:C_HEADER_BACKEND',
+    'md': 'pyrcom.codegen.regmap:MARKDOWN_BACKEND',
+}
+
+# name -> loaded backend, including backends registered at run time
+_backends = {}
+
+
+def _entry_points():
+    """ Return dictionary of name -> entry point of installed backends """
+    from importlib import metadata
+    eps = metadata.entry_points()
+    if hasattr(eps, 'select'):
+        eps = eps.select(group=ENTRY_POINT_GROUP)
+    else:   # Python < 3.10
+        eps = eps.get(ENTRY_POINT_GROUP, [])
+    return {ep.name: ep for ep in eps}
+
+
+def _load_builtin(reference):
+    module_name, attr = reference.split(':')
+    return getattr(importlib.import_module(module_name), attr)
+
+
+def register_backend(backend):
+    """ Register `LanguageBackend` object at run time, replacing registered
+    backend of the same name """
+    _backends[backend.name] = backend
+
+
+def available_backends():
+    """ Return sorted list of names of all known backends """
+    return sorted(set(BUILTIN_BACKENDS) | set(_backends) | set(_entry_points()))
+
+
+def get_backend(name):
+    """ Return `LanguageBackend` of language `name`, importing it on first use """
+    backend = _backends.get(name)
+    if backend is not None:
+        return backend
+
+    try:
+        if name in BUILTIN_BACKENDS:
+            backend = _load_builtin(BUILTIN_BACKENDS[name])
+        else:
+            ep = _entry_points().get(name)
+            if ep is None:
+                raise CodegenError(str.format(
+                    "Unknown language backend '{0}', available: {1}",
+                    name, ", ".join(available_backends())))
+            backend = ep.load()
+    except ImportError as e:
+        raise CodegenError(str.format("Could not load language backend '{0}'", name)) from e
+
+    _backends[name] = backend
+    return backend
@@ -0,0 +1,127 @@
+# Copyright © 2018 Mateusz Maciąg
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the “Software”), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software
+# is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS
+# OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+""" Register map backends: C header with register addresses and field
+masks ('c') and register map documentation table in Markdown ('md').
+
+Both build the same `RegisterMap` ACT from the synthesis context, so they
+can share the context with other backends (see `pipeline.write_outputs`).
+"""
+
+from pyrcom.act.regmap import RegisterMap, RegisterDescription, FieldDescription
+from pyrcom.codegen.base import LanguageBuilderBase, LanguageEmitterBase, LanguageBackend
+from pyrcom.codegen.synthesis import build_synthesis_context
+from pyrcom.exceptions import CodegenError
+
+import re
+
+# =============================================================================
+
+# Array indices at the end of a path
+_ARRAY_INDEX = re.compile(r'(\[\d+\])+$')
+
+
+class RegisterMapBuilder (LanguageBuilderBase):
+
+    def check(self):
+        if 'design_name' not in self.language_config:
+            raise CodegenError(
+                "Language config does not have required 'design_name' parameter.")
+
+    def build_act(self, rdl_root, synthesis_context=None):
+        self.check()
+
+        context = synthesis_context
+        if context is None:
+            with self.stats.stage('walk'):
+                context = build_synthesis_context(rdl_root)
+        self._synthesis_context = context
+
+        regs = context.registers
+        fields = context.fields
+        registers = []
+        for reg in range(len(regs)):
+            # Path without the top addrmap, rolled array without its indices
+            path = regs.path[reg].partition('.')[2]
+            if regs.is_array(reg):
+                path = _ARRAY_INDEX.sub('', path)
+            registers.append(RegisterDescription(
+                regs.name[reg], path, regs.offset[reg], regs.address[reg],
+                *[FieldDescription(fields.name[f], fields.high[f], fields.low[f],
+                                   fields.sw[f].name, fields.hw[f].name, fields.reset[f],
+                                   bool(fields.is_interrupt_flag[f]))
+                  for f in regs.field_rows(reg)],
+                array_size=regs.array_size[reg], array_stride=regs.array_stride[reg]))
+
+        return RegisterMap(self.language_config['design_name'], *registers)
+
+# =============================================================================
+
+
+def c_identifier(name):
+    """ Upper case C identifier made of `name` """
+    return re.sub(r'[^0-9A-Za-z_]', '_', name).upper()
+
+
+def c_path_identifier(path):
+    """ Upper case C identifier made of hierarchical `path`, e.g.
+    'rf[1].ctrl' -> 'RF_1_CTRL' """
+    return c_identifier(re.sub(r'\[(\d+)\]', r'_\1', path))
+
+
+def md_anchor(title):
+    """ Anchor of Markdown heading `title` """
+    return re.sub(r'[^0-9a-z_\- ]', '', title.lower()).replace(' ', '-')
+
+
+class CHeaderEmitter (LanguageEmitterBase):
+
+    def setup_environment(self):
+        self.add_jinja_filter("c_identifier", c_identifier)
+        self.add_jinja_filter("c_path_identifier", c_path_identifier)
+
+    def visit_RegisterMap(self, node: RegisterMap):
+        return self.render('RegisterMap',
+                           file_header=self.language_config.get('file_header', ''),
+                           prefix=c_identifier(node.name),
+                           registers=node.registers)
+
+
+class MarkdownEmitter (LanguageEmitterBase):
+
+    def setup_environment(self):
+        self.add_jinja_filter("md_anchor", md_anchor)
+
+    def visit_RegisterMap(self, node: RegisterMap):
+        return self.render('RegisterMap',
+                           file_header=self.language_config.get('file_header', ''),
+                           name=node.name,
+                           registers=node.registers)
+
+# =============================================================================
+
+
+C_HEADER_BACKEND = LanguageBackend("c", RegisterMapBuilder, CHeaderEmitter,
+                                   template_suffix=".h",
+                                   description="C header with register addresses and field masks")
+
+MARKDOWN_BACKEND = LanguageBackend("md", RegisterMapBuilder, MarkdownEmitter,
+                                   template_suffix=".md",
+                                   description="Register map documentation in Markdown")
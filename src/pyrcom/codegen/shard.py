@@ -0,0 +1,114 @@
+# Copyright © 2018 Mateusz Maciąg
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the “Software”), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software
+# is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS
+# OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+""" Shard-parallel rendering of long ACT node lists.
+
+A list of sibling nodes is split into contiguous shards, every shard is
+rendered by a copy of the emitter in a worker process and rendered shards
+are joined in order. Emitters join siblings with a newline, so the result
+is the same as rendering the list at once.
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+
+import os
+
+# =============================================================================
+
+# Nodes per shard. Lists shorter than two shards are rendered in process.
+DEFAULT_SHARD_SIZE = 512
+
+# Emitter of worker process, created by `_init_worker`
+_worker_emitter = None
+
+
+def _init_worker(emitter_class, language_name, language_config, template_suffix):
+    # Emitter of the worker uses the default environment, emitters given
+    # their own environment do not shard (see SystemVerilogEmitter)
+    global _worker_emitter
+    _worker_emitter = emitter_class(language_name, language_config, template_suffix=template_suffix)
+
+
+def _render_shard(nodes):
+    return _worker_emitter.render_shard(nodes)
+
+
+def resolve_workers(workers):
+    """ Number of worker processes, 0 or None meaning one per CPU """
+    return workers or os.cpu_count() or 1
+
+# =============================================================================
+
+
+class ShardRenderer:
+    """ Pool of worker processes rendering shards for `emitter`. Workers
+    are started on first use and stopped by `close`. """
+
+    def __init__(self, emitter, workers=None, shard_size=DEFAULT_SHARD_SIZE):
+        self._emitter = emitter
+        self._workers = resolve_workers(workers)
+        self._shard_size = max(1, shard_size)
+        self._executor = None
+
+    @property
+    def workers(self):
+        return self._workers
+
+    @property
+    def shard_size(self):
+        return self._shard_size
+
+    def accepts(self, nodes):
+        """ True if `nodes` are worth sharding """
+        return self._workers > 1 and isinstance(nodes, (list, tuple)) \
+            and len(nodes) >= 2 * self._shard_size
+
+    def shards(self, nodes):
+        """ Split `nodes` into contiguous shards of about equal size, at
+        least `shard_size` nodes each and a few per worker for balance """
+        count = max(1, min(len(nodes) // self._shard_size, 4 * self._workers))
+        size, extra = divmod(len(nodes), count)
+        result, start = [], 0
+        for i in range(count):
+            end = start + size + (1 if i < extra else 0)
+            result.append(nodes[start:end])
+            start = end
+        return result
+
+    def render(self, nodes):
+        """ Return iterator of rendered shards of `nodes`, in order """
+        if self._executor is None:
+            emitter = self._emitter
+            self._executor = ProcessPoolExecutor(
+                self._workers, initializer=_init_worker,
+                initargs=(type(emitter), emitter.language_name, emitter.language_config,
+                          emitter.template_suffix))
+        return self._executor.map(_render_shard, self.shards(nodes))
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,335 @@
+# Copyright © 2018 Mateusz Maciąg
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the “Software”), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software
+# is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS
+# OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+""" Language independent synthesis context: registers and fields of the
+design collected in one walk over the elaborated RDL tree. """
+
+from systemrdl import RDLListener, RDLWalker, rdltypes
+from systemrdl.node import AddressableNode, RegNode
+
+from array import array
+from sys import intern
+
+import copy
+import itertools
+
+# =============================================================================
+
+_HW_READABLE = (rdltypes.AccessType.rw, rdltypes.AccessType.rw1,
+                rdltypes.AccessType.w, rdltypes.AccessType.w1)
+
+_HW_WRITEABLE = (rdltypes.AccessType.rw, rdltypes.AccessType.rw1,
+                 rdltypes.AccessType.r)
+
+# =============================================================================
+
+
+class RegisterTable:
+    """ Column oriented table of registers, rows in walk order.
+    Fields of register `r` are rows `field_rows(r)` of the `FieldTable`. """
+
+    def __init__(self):
+        self._name = []
+        self._path = []
+        self._size = array('L')
+        self._offset = array('Q')
+        self._address = array('Q')
+        self._array_size = array('Q')
+        self._array_stride = array('Q')
+        self._array_dimensions = []
+        self._field_start = array('L')
+        self._field_end = array('L')
+
+    def __len__(self):
+        return len(self._name)
+
+    def append(self, name, path, size, offset, address, field_start,
+               array_dimensions=(), array_stride=0):
+        array_size = 0
+        if array_dimensions:
+            array_size = 1
+            for dim in array_dimensions:
+                array_size *= dim
+        self._name.append(name)
+        self._path.append(path)
+        self._size.append(size)
+        self._offset.append(offset)
+        self._address.append(address)
+        self._array_size.append(array_size)
+        self._array_stride.append(array_stride)
+        self._array_dimensions.append(tuple(array_dimensions))
+        self._field_start.append(field_start)
+        self._field_end.append(field_start)
+        return len(self._name) - 1
+
+    def close(self, reg, field_end):
+        self._field_end[reg] = field_end
+
+    def field_rows(self, reg):
+        return range(self._field_start[reg], self._field_end[reg])
+
+    @property
+    def name(self):
+        """ Instance name """
+        return self._name
+
+    @property
+    def path(self):
+        """ Hierarchical path (of the first element of register array) """
+        return self._path
+
+    @property
+    def size(self):
+        """ Size in bytes (of one element of register array) """
+        return self._size
+
+    @property
+    def offset(self):
+        """ Address offset within parent component """
+        return self._offset
+
+    @property
+    def address(self):
+        """ Absolute address (of the first element of register array) """
+        return self._address
+
+    @property
+    def array_size(self):
+        """ Number of elements of rolled register array, 0 for single registers """
+        return self._array_size
+
+    @property
+    def array_stride(self):
+        """ Address offset between elements of rolled register array """
+        return self._array_stride
+
+    @property
+    def array_dimensions(self):
+        """ Dimensions of rolled register array, () for single registers.
+        Element `i` has address `address + i * stride`, indices of the last
+        dimension change fastest. """
+        return self._array_dimensions
+
+    def is_array(self, reg):
+        return self._array_size[reg] != 0
+
+# =============================================================================
+
+
+class FieldTable:
+    """ Column oriented table of fields, rows in walk order """
+
+    def __init__(self):
+        self._name = []
+        self._reg = array('L')
+        self._high = array('L')
+        self._low = array('L')
+        self._sw = []
+        self._hw = []
+        self._reset = []
+        self._reset_mask = []
+        self._hw_readable = bytearray()
+        self._hw_writeable = bytearray()
+        self._intr = bytearray()
+
+    def __len__(self):
+        return len(self._name)
+
+    def append(self, name, reg, high, low, sw, hw, reset, reset_mask, intr):
+        self._name.append(name)
+        self._reg.append(reg)
+        self._high.append(high)
+        self._low.append(low)
+        self._sw.append(sw)
+        self._hw.append(hw)
+        self._reset.append(reset)
+        self._reset_mask.append(reset_mask)
+        self._hw_readable.append(hw in _HW_READABLE)
+        self._hw_writeable.append(hw in _HW_WRITEABLE)
+        self._intr.append(bool(intr))
+        return len(self._name) - 1
+
+    @property
+    def name(self):
+        return self._name
+
+    @property
+    def reg(self):
+        """ Row of parent register in the `RegisterTable` """
+        return self._reg
+
+    @property
+    def high(self):
+        return self._high
+
+    @property
+    def low(self):
+        return self._low
+
+    @property
+    def sw(self):
+        """ Software access type (AccessType) """
+        return self._sw
+
+    @property
+    def hw(self):
+        """ Hardware access type (AccessType) """
+        return self._hw
+
+    @property
+    def reset(self):
+        """ Reset value or None """
+        return self._reset
+
+    @property
+    def reset_mask(self):
+        return self._reset_mask
+
+    @property
+    def is_hw_readable(self):
+        return self._hw_readable
+
+    @property
+    def is_hw_writeable(self):
+        return self._hw_writeable
+
+    @property
+    def is_interrupt_flag(self):
+        return self._intr
+
+# =============================================================================
+
+
+class SynthesisContext:
+    def __init__(self, roll_arrays=False):
+        self._roll_arrays = roll_arrays
+        self._undriven_nets = []
+        self._unused_nets = []
+        self._registers = RegisterTable()
+        self._fields = FieldTable()
+        self._interrupt_fields = array('L')
+
+    def add_undriven_net(self, net):
+        self._undriven_nets.append(net)
+
+    def add_unused_net(self, net):
+        self._unused_nets.append(net)
+
+    @property
+    def roll_arrays(self):
+        """ Register arrays are kept rolled: one row of the `RegisterTable`
+        per array, not per element """
+        return self._roll_arrays
+
+    @property
+    def registers(self):
+        """ Table of all registers (`RegisterTable`) """
+        return self._registers
+
+    @property
+    def fields(self):
+        """ Table of all fields (`FieldTable`) """
+        return self._fields
+
+    @property
+    def interrupt_fields(self):
+        """ Rows of interrupt flag fields in the `FieldTable` """
+        return self._interrupt_fields
+
+# =============================================================================
+
+
+class SynthesisRDLContext (SynthesisContext, RDLListener):
+    """ Synthesis context filled by RDLWalker. Properties of every register
+    and field are resolved once, here, and synthesis reads them from tables. """
+
+    def __init__(self, roll_arrays=False):
+        super(SynthesisRDLContext, self).__init__(roll_arrays)
+        self._current_reg = None
+
+    def enter_Reg(self, node):
+        array_dimensions, array_stride = (), 0
+        if self._roll_arrays and node.is_array:
+            array_dimensions = node.array_dimensions
+            array_stride = node.array_stride
+        self._current_reg = self._registers.append(
+            intern(node.inst.inst_name), node.get_path(), node.size, node.address_offset,
+            node.absolute_address, len(self._fields),
+            array_dimensions, array_stride)
+
+    def exit_Reg(self, node):
+        self._registers.close(self._current_reg, len(self._fields))
+
+    def enter_Field(self, node):
+        intr = node.get_property('intr')
+        row = self._fields.append(
+            intern(node.inst.inst_name), self._current_reg,
+            node.inst.high, node.inst.low,
+            node.get_property('sw'), node.get_property('hw'),
+            node.get_property('reset'), node.get_property('reset_mask', default=0),
+            intr)
+        if intr:
+            self._interrupt_fields.append(row)
+
+
+class RolledRegisterWalker (RDLWalker):
+    """ Walker which unrolls arrays of all components except registers.
+    Register array is visited once, as its first element, so the walk
+    takes time proportional to number of array definitions, not elements.
+    Elements are flattened in the same order as `Node.address_offset`
+    does, so address of element `i` is address + i * stride. """
+
+    def __init__(self, skip_not_present=True):
+        super(RolledRegisterWalker, self).__init__(unroll=True, skip_not_present=skip_not_present)
+
+    def walk(self, node, *listeners):
+        for listener in listeners:
+            self.do_enter(node, listener)
+        for child in self._children(node):
+            self.walk(child, *listeners)
+        for listener in listeners:
+            self.do_exit(node, listener)
+
+    def _children(self, node):
+        for child in node.children(unroll=False, skip_not_present=self.skip_not_present):
+            if isinstance(child, AddressableNode) and child.is_array:
+                dims = child.array_dimensions
+                if isinstance(child, RegNode):
+                    indices = [(0,) * len(dims)]
+                else:
+                    indices = itertools.product(*[range(n) for n in dims])
+                for idx in indices:
+                    element = copy.copy(child)
+                    element.current_idx = idx
+                    yield element
+            else:
+                yield child
+
+
+def build_synthesis_context(rdl_root, roll_arrays=False):
+    """ Walk elaborated RDL tree and return its `SynthesisRDLContext`.
+    Arrays are unrolled, unless `roll_arrays` is set - then each register
+    array is one row of the register table (see `RolledRegisterWalker`).
+    Context does not depend on language, so one context can be shared by
+    ACT builders of all backends. """
+    context = SynthesisRDLContext(roll_arrays)
+    walker = RolledRegisterWalker() if roll_arrays else RDLWalker(unroll=True)
+    walker.walk(rdl_root, context)
+    return context
@@ -21,13 +21,17 @@
 from jinja2 import Environment, FileSystemLoader, select_autoescape
 from collections import namedtuple
 
-from systemrdl import RDLWalker, RDLListener
 from systemrdl.messages import MessagePrinter
 from systemrdl.node import *
 
 from pyrcom.act.common import *
 from pyrcom.act.systemverilog import *
-from pyrcom.codegen.base import LanguageBuilderBase, LanguageEmitterBase
+from pyrcom.codegen.base import LanguageBuilderBase, LanguageEmitterBase, LanguageBackend, Splice, \
+    default_environment
+from pyrcom.codegen.synthesis import build_synthesis_context
+from pyrcom.codegen.decoder import DecodeTree, MuxTree, DEFAULT_RADIX_BITS
+from pyrcom.codegen.shard import ShardRenderer, DEFAULT_SHARD_SIZE, resolve_workers
+from pyrcom.stats import NULL_STATS
 
 import os
 
@@ -70,160 +74,295 @@ def verilog_literal(value, format='b', width=32):
 # =============================================================================
 
 
-class SynthesisContext:
-    def __init__(self):
-        self._all_regs = []
-        self._all_fields = []
-        self._all_intr_fields = []
-        self._undriven_nets = []
-        self._unused_nets = []
-
-    def add_undriven_net(self, net):
-        self._undriven_nets.append(net)
-
-    def add_unused_net(self, net):
-        self._unused_nets.append(net)
-
-    @property
-    def all_registers(self):
-        return self._all_regs
-
-    @property
-    def all_fields(self):
-        return self._all_fields
+class Synthesis:
+    """ Synthesis task. Tasks do not walk the context themselves: they
+    receive callbacks from one traversal shared by all tasks run together
+    (see `SynthesisFactory.synthesise_all`), then `finish` returns the
+    synthesized ACT. Callbacks take row numbers of the context tables.
+    Value nodes are created with `nodes`, so equal ones are shared. """
+
+    def __init__(self, context, language_config=None):
+        self.context = context  # pyrcom.codegen.synthesis.SynthesisContext
+        self.language_config = language_config or {}
+        self.nodes = NodeInterner()
+
+    def enter_register(self, reg):
+        pass
 
-    @property
-    def all_interrupt_fields(self):
-        return self._all_intr_fields
+    def exit_register(self, reg):
+        pass
 
-# =============================================================================
+    def enter_field(self, field):
+        pass
 
+    def finish(self):
+        pass
 
-class SynthesisRDLContext (SynthesisContext, RDLListener):
+    def do_synthesis(self):
+        return run_synthesis(self.context, [self])[0]
 
-    def enter_Reg(self, node):
-        self._all_regs.append(node)
 
-    def enter_Field(self, node):
-        self._all_fields.append(node)
-        if node.is_interrupt_flag:
-            self._all_intr_fields.append(node)
+def run_synthesis(context, tasks):
+    """ Feed all `tasks` from a single traversal of `context` registers and
+    their fields. Returns list of task results. """
 
-# =============================================================================
+    def hooks(name):
+        return [getattr(task, name) for task in tasks
+                if getattr(type(task), name) is not getattr(Synthesis, name)]
 
+    enter_register = hooks('enter_register')
+    exit_register = hooks('exit_register')
+    enter_field = hooks('enter_field')
 
-class Synthesis:
-    def __init__(self, context):
-        self.context = context  # type: SynthesisContext
+    registers = context.registers
+    if enter_register or exit_register or enter_field:
+        for reg in range(len(registers)):
+            for callback in enter_register:
+                callback(reg)
+            if enter_field:
+                for field in registers.field_rows(reg):
+                    for callback in enter_field:
+                        callback(field)
+            for callback in exit_register:
+                callback(reg)
 
-    def do_synthesis(self):
-        pass
+    return [task.finish() for task in tasks]
 
 # =============================================================================
 
 
 class HwPortsSynthesis (Synthesis):
 
+    def __init__(self, context, language_config=None):
+        super(HwPortsSynthesis, self).__init__(context, language_config)
+        self._ports = []
+
     def get_port_name(self, field):
+        fields = self.context.fields
         return str.format('hw_{0}__{1}',
-                    field.parent.inst.inst_name,
-                    field.inst.inst_name)
+                    self.context.registers.name[fields.reg[field]],
+                    fields.name[field])
 
-    def do_synthesis(self):
-        ports = []
-        for field in self.context.all_fields:  # type: FieldNode
-            if field.is_hw_writeable:
-                bit_high = field.inst.high
-                bit_low = field.inst.low
-                port_range = Range(bit_high, bit_low).shift_to_zero() \
-                             if (bit_high != bit_low) else None
+    def enter_field(self, field):
+        fields = self.context.fields
+        if fields.is_hw_writeable[field]:
+            bit_high = fields.high[field]
+            bit_low = fields.low[field]
+            port_range = self.nodes(Range, bit_high - bit_low, 0) \
+                         if (bit_high != bit_low) else None
+            reg = fields.reg[field]
+            if self.context.registers.is_array(reg):
+                port_range = self.nodes(ArrayRange, self.context.registers.array_size[reg], port_range)
+
+            port_def = Port(self.get_port_name(field), "output", port_range)
+            self._ports.append(port_def)
 
-                port_def = Port(self.get_port_name(field), "output", port_range)
-                ports.append(port_def)
-        return ports
+    def finish(self):
+        return self._ports
 
 
 # =============================================================================
 
 class HwRegSignalDeclarationSynthesis (Synthesis):
 
-    def do_synthesis(self):
-        decl = []
-        decl_spec = [
-            ("select", "logic", None),
-            ("data_in", "wire", Range(31,0)),
-            ("data_out", "wire", Range(31,0))
-        ]
-        for reg in self.context.all_registers: # type: RegNode
-            base_name = 'reg_' + reg.inst.inst_name + '__'
-            decl.extend(
-                [SignalDeclaration(base_name + spec[0], spec[1], spec[2]) for spec in decl_spec]
+    decl_spec = [
+        ("select", "logic", None),
+        ("data_in", "wire", Range(31,0)),
+        ("data_out", "wire", Range(31,0))
+    ]
+
+    def __init__(self, context, language_config=None):
+        super(HwRegSignalDeclarationSynthesis, self).__init__(context, language_config)
+        self._decl = []
+
+    def enter_register(self, reg):
+        registers = self.context.registers
+        base_name = 'reg_' + registers.name[reg] + '__'
+        if registers.is_array(reg):
+            size = registers.array_size[reg]
+            self._decl.extend(
+                [SignalDeclaration(base_name + spec[0], spec[1], self.nodes(ArrayRange, size, spec[2]))
+                 for spec in self.decl_spec]
             )
-        return decl
+            return
+        self._decl.extend(
+            [SignalDeclaration(base_name + spec[0], spec[1], spec[2]) for spec in self.decl_spec]
+        )
+
+    def finish(self):
+        return self._decl
 
 class HwIntrSignalDeclarationSynthesis (Synthesis):
 
-    def do_synthesis(self):
-        decl = []
-        intr_sig = [ "enable", "set", "clear", "status" ]
-        for intr in self.context.all_interrupt_fields: # type: FieldNode
-            base_name = 'intr_' + intr.inst.inst_name + '_'
-            decl.extend(
-                [SignalDeclaration(base_name + sig, "wire") for sig in intr_sig]
+    intr_sig = [ "enable", "set", "clear", "status" ]
+
+    def __init__(self, context, language_config=None):
+        super(HwIntrSignalDeclarationSynthesis, self).__init__(context, language_config)
+        self._decl = []
+
+    def enter_field(self, field):
+        fields = self.context.fields
+        if fields.is_interrupt_flag[field]:
+            base_name = 'intr_' + fields.name[field] + '_'
+            registers = self.context.registers
+            reg = fields.reg[field]
+            sig_range = self.nodes(ArrayRange, registers.array_size[reg]) \
+                        if registers.is_array(reg) else None
+            self._decl.extend(
+                [SignalDeclaration(base_name + sig, "wire", sig_range) for sig in self.intr_sig]
             )
-        return decl
+
+    def finish(self):
+        return self._decl
 
 # =============================================================================
 
+# Loop variable of generate loops over rolled register arrays
+ARRAY_GENVAR = 'i'
+ARRAY_INDEX = '[' + ARRAY_GENVAR + ']'
+
+
 class RegisterInstantiationSynthesis (Synthesis):
 
-    def synthesize_field(self, field: FieldNode):
-        parent_reg_name = field.parent.inst.inst_name
-        field_name  = field.inst.inst_name
-        field_range = Range(field.inst.high, field.inst.low)
-        if field.is_interrupt_flag:
-            return FieldBypass(parent_reg_name, field_name, field_range)
+    def __init__(self, context, language_config=None):
+        super(RegisterInstantiationSynthesis, self).__init__(context, language_config)
+        self._reg_inst_list = []
+        self._field_inst_list = None
+        self._index = ''
+
+    def synthesize_field(self, field):
+        fields = self.context.fields
+        parent_reg_name = self.context.registers.name[fields.reg[field]]
+        field_name  = fields.name[field]
+        field_range = self.nodes(Range, fields.high[field], fields.low[field])
+        if fields.is_interrupt_flag[field]:
+            return FieldBypass(parent_reg_name, field_name, field_range, self._index)
+        else:
+            reset_mask = fields.reset_mask[field]
+            reset_val = fields.reset[field]
+            if self.language_config.get('field_types', False):
+                key = field_type_key(fields, field)
+                if key is not None:
+                    return TypedFieldInstance(
+                        field_type_module_name(self.language_config['design_name'], key),
+                        parent_reg_name, field_name, field_range, reset_mask, reset_val, self._index)
+            return FieldInstance(parent_reg_name, field_name, field_range, reset_mask, reset_val,
+                                 self._index)
+
+    def enter_register(self, reg):
+        self._field_inst_list = []
+        self._index = ARRAY_INDEX if self.context.registers.is_array(reg) else ''
+
+    def enter_field(self, field): # TODO: use skip_not_present arg
+        field_group_desc = str.format("Field: {}", self.context.fields.name[field])
+        field_data = self.synthesize_field(field)
+        field_group = LogicalGroup(2, field_group_desc, field_data)
+        self._field_inst_list.append(field_group)
+
+    def exit_register(self, reg):
+        registers = self.context.registers
+        if registers.is_array(reg):
+            # One generate loop replaces instances of all elements
+            reg_group_desc = str.format("Register array: {:14} (offset +0x{:08X}, {} x stride 0x{:X})",
+                                        registers.name[reg], registers.offset[reg],
+                                        registers.array_size[reg], registers.array_stride[reg])
+            reg_group = LogicalGroup(2, reg_group_desc, GenerateLoop(
+                ARRAY_GENVAR, registers.array_size[reg], 'gen_' + registers.name[reg],
+                self._field_inst_list))
         else:
-            reset_mask = field.get_property("reset_mask", default=0)
-            reset_val = field.get_property("reset")
-            return FieldInstance(parent_reg_name, field_name, field_range, reset_mask, reset_val)
+            reg_group_desc = str.format("Register: {:20} (offset +0x{:08X})",
+                                        registers.name[reg], registers.offset[reg])
+            reg_group = LogicalGroup(2, reg_group_desc, self._field_inst_list)
+        self._reg_inst_list.append(reg_group)
+
+    def finish(self):
+        return self._reg_inst_list
+
+def field_type_key(fields, field):
+    """ Return type of field: (width, reset mask, reset value), with mask
+    limited to field width and value to mask, or None if field reset value
+    is not a constant. Access properties are not part of the type, as
+    they do not change logic of field module. """
+    reset = fields.reset[field]
+    if reset is not None and not isinstance(reset, int):
+        return None
+    width = fields.high[field] - fields.low[field] + 1
+    reset_mask = (fields.reset_mask[field] or 0) & ((1 << width) - 1)
+    return width, reset_mask, (reset or 0) & reset_mask
+
+
+def field_type_module_name(design_name, key):
+    return str.format("{0}_field_w{1}_m{2:x}_v{3:x}", design_name, *key)
+
+
+class FieldTypeSynthesis (Synthesis):
+    """ Specialized field modules, one per distinct field type (see
+    `field_type_key`), in order of first use. Generic field module is kept
+    for fields which have no type. """
+
+    def __init__(self, context, language_config=None):
+        super(FieldTypeSynthesis, self).__init__(context, language_config)
+        self._types = {}
+        self._generic = False
+
+    def enter_field(self, field):
+        fields = self.context.fields
+        if fields.is_interrupt_flag[field]:
+            return
+        key = field_type_key(fields, field)
+        if key is None:
+            self._generic = True
+            return
+        registers = self.context.registers
+        self._types[key] = self._types.get(key, 0) + max(1, registers.array_size[fields.reg[field]])
+
+    def finish(self):
+        design_name = self.language_config['design_name']
+        modules = [FieldTypeModule(field_type_module_name(design_name, key), *key, instances=count)
+                   for key, count in self._types.items()]
+        if self._generic:
+            modules.append(FieldModule(design_name + '_field'))
+        return modules
 
-    def do_synthesis(self):
-        reg_inst_list = []
-        for reg in self.context.all_registers: # type: RegNode
-            reg_name = reg.inst.inst_name
-            reg_offset= reg.address_offset
-
-            field_inst_list = []
-            for field in reg.fields(): # TODO: use skip_not_present arg
-                field_name = field.inst.inst_name
-                field_group_desc = str.format("Field: {}", field_name)
-                field_data = self.synthesize_field(field)
-                field_group = LogicalGroup(2, field_group_desc, field_data)
-                field_inst_list.append(field_group)
-
-            reg_group_desc = str.format("Register: {:20} (offset +0x{:08X})", reg_name, reg_offset)
-            reg_group = LogicalGroup(2, reg_group_desc, field_inst_list)
-            reg_inst_list.append(reg_group)
-        return reg_inst_list
 
 class InterruptInstantiationSynthesis (Synthesis):
 
+    def __init__(self, context, language_config=None):
+        super(InterruptInstantiationSynthesis, self).__init__(context, language_config)
+        self._intr_inst_list = []
+
     def synthesize_intr(self, intr_name):
         return InterruptInstance(intr_name)
 
-    def do_synthesis(self):
-        intr_inst_list = []
-        for intr in self.context.all_interrupt_fields: # type: FieldNode
-            intr_name = intr.inst.inst_name
+    def enter_field(self, field):
+        fields = self.context.fields
+        if fields.is_interrupt_flag[field]:
+            intr_name = fields.name[field]
             intr_group_desc = str.format("Interrupt: {}", intr_name)
-            intr_data = self.synthesize_intr(intr_name)
+            registers = self.context.registers
+            reg = fields.reg[field]
+            if registers.is_array(reg):
+                intr_data = GenerateLoop(ARRAY_GENVAR, registers.array_size[reg], 'gen_intr_' + intr_name,
+                                         InterruptInstance(intr_name, ARRAY_INDEX))
+            else:
+                intr_data = self.synthesize_intr(intr_name)
             intr_group = LogicalGroup(2, intr_group_desc, intr_data)
-            intr_inst_list.append(intr_group)
-        return intr_inst_list
+            self._intr_inst_list.append(intr_group)
+
+    def finish(self):
+        return self._intr_inst_list
 # =============================================================================
 
+def make_array_decode(registers, reg):
+    """ Return `RegisterArrayDecode` of rolled register array `reg` """
+    return RegisterArrayDecode(registers.name[reg], int(registers.offset[reg]/4),
+                               registers.array_size[reg], int(registers.array_stride[reg]/4))
+
+
 class CaseAssignment (Assignment):
+
+    __slots__ = ('_case_id',)
+
     def __init__(self,
                  case_id,
                  lhs, rhs):
@@ -235,19 +374,120 @@ class CaseAssignment (Assignment):
         return self._case_id
 
 class WriteSelectDecoder (SelectDecoder):
-    def __init__(self, address_map):
-        super(WriteSelectDecoder, self).__init__(address_map)
+
+    __slots__ = ()
+
+    def __init__(self, address_map, array_decoders=()):
+        super(WriteSelectDecoder, self).__init__(address_map, array_decoders)
+
+class HierarchicalWriteSelectDecoder (WriteSelectDecoder):
+    """ Write select decoder built as radix tree (see `DecodeTree`). With
+    `registered` set, the first level is predecoded from bus address in the
+    cycle decoder address is sampled. """
+
+    __slots__ = ('_tree', '_registered')
+
+    def __init__(self, tree, registered=False, array_decoders=()):
+        super(HierarchicalWriteSelectDecoder, self).__init__(tree.address_map, array_decoders)
+        self._tree = tree
+        self._registered = registered and tree.depth > 1
+
+    @property
+    def tree(self):
+        return self._tree
+
+    @property
+    def registered(self):
+        return self._registered
+
+    @property
+    def address_width(self):
+        return self._tree.width
 
 class WriteSelectDecoderSynthesis (Synthesis):
 
+    def __init__(self, context, language_config=None):
+        super(WriteSelectDecoderSynthesis, self).__init__(context, language_config)
+        self._addr_map = []
+        self._array_decoders = []
+
     def make_signal_name(self, reg_name):
         return str.format("reg_{}__select", reg_name)
 
-    def do_synthesis(self):
-        addr_map = []
-        for reg in self.context.all_registers: # type: RegNode
-            addr_map.append( (int(reg.address_offset/4), self.make_signal_name(reg.inst.inst_name)) )
-        return WriteSelectDecoder(addr_map)
+    def enter_register(self, reg):
+        registers = self.context.registers
+        if registers.is_array(reg):
+            self._array_decoders.append( (make_array_decode(registers, reg),
+                                          self.make_signal_name(registers.name[reg])) )
+            return
+        self._addr_map.append( (int(registers.offset[reg]/4), self.make_signal_name(registers.name[reg])) )
+
+    def finish(self):
+        # Decoder strategy: 'flat' - one case over all addresses,
+        # 'tree' - radix tree over address bits (see pyrcom.codegen.decoder)
+        strategy = self.language_config.get('decoder', 'flat')
+        if strategy == 'flat':
+            return WriteSelectDecoder(self._addr_map, self._array_decoders)
+        elif strategy == 'tree':
+            # Arrays are decoded aside of the tree, but address is as wide
+            # as needed by all of them
+            width = SelectDecoder(self._addr_map, self._array_decoders).address_width
+            tree = DecodeTree(self._addr_map,
+                              radix_bits=self.language_config.get('decoder_radix_bits', DEFAULT_RADIX_BITS),
+                              width=width)
+            return HierarchicalWriteSelectDecoder(
+                tree, registered=self.language_config.get('decoder_registered', False),
+                array_decoders=self._array_decoders)
+        else:
+            raise CodegenError(str.format(
+                "Unknown decoder strategy '{0}'. Expected values: 'flat', 'tree'", strategy))
+
+class ReadDataMux (SelectDecoder):
+    """ One-hot read select decoder with AND-OR read data mux (see `MuxTree`) """
+
+    __slots__ = ('_mux',)
+
+    def __init__(self, mux, array_decoders=()):
+        super(ReadDataMux, self).__init__(
+            [(address, select) for address, select, _ in mux.inputs if address is not None],
+            array_decoders)
+        self._mux = mux
+
+    @property
+    def mux(self):
+        return self._mux
+
+    @property
+    def latency(self):
+        return self._mux.latency
+
+class ReadDataMuxSynthesis (Synthesis):
+
+    DEFAULT_FAN_IN = 4
+
+    def __init__(self, context, language_config=None):
+        super(ReadDataMuxSynthesis, self).__init__(context, language_config)
+        self._inputs = []
+        self._array_decoders = []
+
+    def enter_register(self, reg):
+        registers = self.context.registers
+        base_name = 'reg_' + registers.name[reg] + '__'
+        if registers.is_array(reg):
+            # Array is one mux input: element selected by decoded index,
+            # read select set on array hit (address None - no case arm)
+            decode = make_array_decode(registers, reg)
+            self._array_decoders.append( (decode, base_name + 'read_select') )
+            self._inputs.append( (None, base_name + 'read_select',
+                                  str.format("{0}data_out[{1}]", base_name, decode.index_signal)) )
+            return
+        self._inputs.append( (int(registers.offset[reg]/4), base_name + 'read_select', base_name + 'data_out') )
+
+    def finish(self):
+        mux = MuxTree(self._inputs,
+                      fan_in=self.language_config.get('read_mux_fan_in', self.DEFAULT_FAN_IN),
+                      pipeline_levels=self.language_config.get('read_mux_pipeline', ()))
+        return ReadDataMux(mux, self._array_decoders)
 
 # =============================================================================
 
@@ -260,17 +500,26 @@ class SynthesisFactory:
         "hw_intr_signals": HwIntrSignalDeclarationSynthesis,
         "hw_reg_instances": RegisterInstantiationSynthesis,
         "hw_intr_instances" : InterruptInstantiationSynthesis,
+        "field_types" : FieldTypeSynthesis,
         "write_sel_decoder" : WriteSelectDecoderSynthesis,
+        "read_data_mux" : ReadDataMuxSynthesis,
     }
 
-    def __init__(self, context):
+    def __init__(self, context, language_config=None, stats=None):
         self.context = context
+        self.language_config = language_config or {}
+        self.stats = stats or NULL_STATS
+        # Shared by all tasks, so equal value nodes are shared within the
+        # whole ACT. Disabled with language_config['share_nodes'] = False.
+        self.nodes = NodeInterner(self.language_config.get('share_nodes', True))
 
     def create(self, task) -> Synthesis:
         key = str(task)
-        tool_type = SynthesisFactory._tools.get(key, None)
+        tool_type = self._tools.get(key, None)
         if tool_type:
-            return tool_type(self.context)
+            tool = tool_type(self.context, self.language_config)
+            tool.nodes = self.nodes
+            return tool
         else:
             raise CodegenError(
                 "Unknown synthesis rule '%s'" % task)
@@ -278,6 +527,18 @@ class SynthesisFactory:
     def synthesise(self, task):
         return self.create(task).do_synthesis()
 
+    def synthesise_all(self, tasks):
+        """ Run all `tasks` in a single pass over the context and return
+        their results in the same order. When profiling, each task runs in
+        its own pass instead, so time of every task is measured. """
+        if self.stats.enabled:
+            results = []
+            for task in tasks:
+                with self.stats.stage('synthesis:' + str(task)):
+                    results.append(self.synthesise(task))
+            return results
+        return run_synthesis(self.context, [self.create(task) for task in tasks])
+
 # =============================================================================
 
 
@@ -288,33 +549,43 @@ class SystemVerilogBuilder (LanguageBuilderBase):
             raise CodegenError(
                 "Language config does not have required 'design_name' parameter.")
 
-    def build_act(self, rdl_root):
+    def build_act(self, rdl_root, synthesis_context=None):
         self.check()
 
-        # Create synthesis context from RDL root node
-        synth_context = SynthesisRDLContext()
-        RDLWalker(unroll=True).walk(rdl_root, synth_context)
+        # Create synthesis context from RDL root node, unless shared one is
+        # given. With 'roll_arrays' register arrays are synthesized as
+        # generate loops, which needs context with arrays kept rolled.
+        roll_arrays = self.language_config.get('roll_arrays', False)
+        synth_context = synthesis_context
+        if synth_context is None or synth_context.roll_arrays != roll_arrays:
+            with self.stats.stage('walk'):
+                synth_context = build_synthesis_context(rdl_root, roll_arrays)
+        self._synthesis_context = synth_context
 
         # Create synthesis tool factory
-        synth_toolbox = SynthesisFactory(synth_context)
+        synth_toolbox = SynthesisFactory(synth_context, self.language_config, self.stats)
 
         # TODO: configurable interface
         interface_name = 'APB'
 
         top_module_name = self.language_config['design_name']
 
+        # With 'field_types' fields instantiate modules specialized for
+        # their type instead of one parameterized field module
+        field_types = self.language_config.get('field_types', False)
+
         #
         # Generate Backend Module
         #
-        hw_ports = synth_toolbox.synthesise("hw_ports")
-
-        backend_reg_decl = synth_toolbox.synthesise("hw_reg_signals")
-        backend_intr_decl = synth_toolbox.synthesise("hw_intr_signals")
-
-        field_instances = synth_toolbox.synthesise("hw_reg_instances")
-        intr_instances = synth_toolbox.synthesise("hw_intr_instances")
-
-        write_sel_decoder = synth_toolbox.synthesise("write_sel_decoder")
+        hw_ports, \
+        backend_reg_decl, backend_intr_decl, \
+        field_instances, intr_instances, \
+        write_sel_decoder, read_data_mux, *field_type_modules = synth_toolbox.synthesise_all([
+            "hw_ports",
+            "hw_reg_signals", "hw_intr_signals",
+            "hw_reg_instances", "hw_intr_instances",
+            "write_sel_decoder", "read_data_mux"
+        ] + (["field_types"] if field_types else []))
 
         backend_module = BackendModule(top_module_name + '_backend',
             hw_ports=hw_ports,
@@ -326,13 +597,17 @@ class SystemVerilogBuilder (LanguageBuilderBase):
                 LogicalGroup(1, "REGISTER FILE DEFINITION", field_instances),
                 LogicalGroup(1, "INTERRUPT DEFINITION", intr_instances)
             ),
-            write_select_decoder=write_sel_decoder
+            write_select_decoder=write_sel_decoder,
+            read_data_mux=read_data_mux
         )
 
         interface_module = InterfaceModule(
             top_module_name + '_interface', interface_name=interface_name)
 
-        field_module = FieldModule(top_module_name + '_field')
+        if field_types:
+            field_module = Composite(field_type_modules[0])
+        else:
+            field_module = FieldModule(top_module_name + '_field')
         intr_module = InterruptModule(top_module_name + '_intr')
 
         #
@@ -351,9 +626,79 @@ class SystemVerilogBuilder (LanguageBuilderBase):
 
 class SystemVerilogEmitter (LanguageEmitterBase):
 
+    file_suffix = '.sv'
+
+    module_node_classes = (ModuleBase,)
+
+    # Leaf nodes which are rendered with a single template call when they
+    # come in runs of the same kind (optionally each one wrapped in its own
+    # LogicalGroup). Disabled with language_config['batch_render'] = False.
+    batched_templates = {
+        FieldInstance: 'instances/FieldInstance',
+        TypedFieldInstance: 'instances/TypedFieldInstance',
+        FieldBypass: 'instances/FieldBypass',
+        InterruptInstance: 'instances/IntrInstance',
+        Port: 'Port',
+        SignalDeclaration: 'SignalDeclaration',
+    }
+
+    # Renderer of shards of long lists under backend signal declarations and
+    # instantiation, with language_config['render_workers'] other than 1
+    _shard_renderer = None
+    _sharding = None
+
+    def setup_environment(self):
+        self.add_jinja_filter("verilog_literal", verilog_literal)
+
+    def close(self):
+        if self._shard_renderer is not None:
+            self._shard_renderer.close()
+            self._shard_renderer = None
+
+    def _get_shard_renderer(self):
+        # Tracing and profiling observe every visit, so they render in process.
+        # Workers render with the default environment, so do emitters with
+        # an environment of their own (templates and filters may differ).
+        if self._shard_renderer is None and not self._trace and not self._stats.enabled \
+                and self._env is default_environment():
+            workers = resolve_workers(self.language_config.get('render_workers', 1))
+            if workers > 1:
+                self._shard_renderer = ShardRenderer(
+                    self, workers, self.language_config.get('render_shard_size', DEFAULT_SHARD_SIZE))
+        return self._shard_renderer
+
+    def _visit_sharded(self, node):
+        """ `visit` rendering long lists under `node` in worker processes """
+        self._sharding = self._get_shard_renderer()
+        try:
+            return self.visit(node)
+        finally:
+            self._sharding = None
+
+    def _stream_sharded(self, node):
+        self._sharding = self._get_shard_renderer()
+        try:
+            yield from self.visit_stream(node)
+        finally:
+            self._sharding = None
+
     def do_prebuild(self, rdl_root):
         self.print_message("debug", "pre-build event")
-        self.add_jinja_filter("verilog_literal", verilog_literal)
+
+    def split_files(self, act_root):
+        # Each module goes into its own file, with file header and footer
+        def modules(node):
+            if isinstance(node, ModuleBase):
+                yield node
+            elif isinstance(node, (list, tuple)):
+                for item in node:
+                    yield from modules(item)
+            else:
+                yield from modules(node.children)
+
+        return [(module.module_name + self.file_suffix,
+                 GenericLayout(act_root.header, act_root.footer, module))
+                for module in modules(act_root.children)]
 
     def visit_GenericLayout(self, node: GenericLayout):
         return self.render('GenericLayout', **{
@@ -362,6 +707,13 @@ class SystemVerilogEmitter (LanguageEmitterBase):
             'file_content': self.default_visit(node)
         })
 
+    def stream_GenericLayout(self, node: GenericLayout):
+        return self.render_stream('GenericLayout', **{
+            'file_header': node.header,
+            'file_footer': node.footer,
+            'file_content': Splice(self.default_stream(node))
+        })
+
     def visit_Composite(self, node: Composite):
         return self.render('Composite', children=self.default_visit(node))
 
@@ -370,6 +722,11 @@ class SystemVerilogEmitter (LanguageEmitterBase):
             description=node.description,
             content=self.default_visit(node))
 
+    def stream_LogicalGroup(self, node: LogicalGroup):
+        return self.render_stream('LogicalGroupH%d' % node.level,
+            description=node.description,
+            content=Splice(self.default_stream(node)))
+
     def visit_FieldBypass(self, node: FieldBypass):
         return self.render('instances/FieldBypass',
             node=node,
@@ -380,13 +737,46 @@ class SystemVerilogEmitter (LanguageEmitterBase):
             node=node,
             module_name=self.language_config['design_name'])
 
+    def visit_TypedFieldInstance(self, node: TypedFieldInstance):
+        return self.render('instances/TypedFieldInstance', node=node)
+
     def visit_InterruptInstance(self, node: InterruptInstance):
         return self.render('instances/IntrInstance',
             node=node,
             module_name=self.language_config['design_name'])
 
+    def visit_GenerateLoop(self, node: GenerateLoop):
+        return self.render('GenerateLoop',
+                           genvar=node.genvar,
+                           count=node.count,
+                           label=node.label,
+                           content=self.default_visit(node))
+
+    def _array_decode(self, node: SelectDecoder):
+        # Index decode of rolled register arrays, shared by write select
+        # decoder and read data mux, goes in front of the write decoder
+        if not node.array_decoders:
+            return ''
+        return self.render('RegisterArrayDecode',
+                           decoders=[decode for decode, _ in node.array_decoders]) + '\n\n'
+
     def visit_WriteSelectDecoder(self, node: WriteSelectDecoder):
-        return self.render('WriteSelectDecoder', address_map=node.address_map)
+        return self._array_decode(node) + self.render('WriteSelectDecoder',
+                           address_map=node.address_map,
+                           array_map=node.array_decoders)
+
+    def visit_ReadDataMux(self, node: ReadDataMux):
+        return self.render('ReadDataMux',
+                           address_map=node.address_map,
+                           array_map=node.array_decoders,
+                           mux=node.mux)
+
+    def visit_HierarchicalWriteSelectDecoder(self, node: HierarchicalWriteSelectDecoder):
+        return self._array_decode(node) + self.render('HierarchicalWriteSelectDecoder',
+                           tree=node.tree,
+                           nodes=node.tree.nodes(),
+                           registered=node.registered,
+                           array_map=node.array_decoders)
 
     def visit_TopModule(self, node: TopModule):
         interface_template = 'interfaces/' + node.interface_name
@@ -399,15 +789,32 @@ class SystemVerilogEmitter (LanguageEmitterBase):
 
     def visit_BackendModule(self, node: BackendModule):
         hw_ports_list = self.visit(node.hw_ports)
-        backend_signal_decl = self.visit(node.backend_signal_declarations)
-        backend_instantiation = self.visit(node.backend_instantiation)
+        backend_signal_decl = self._visit_sharded(node.backend_signal_declarations)
+        backend_instantiation = self._visit_sharded(node.backend_instantiation)
         write_select_decoder = self.visit(node.write_select_decoder)
+        read_data_mux = self.visit(node.read_data_mux) if node.read_data_mux else None
         return self.render('modules/BackendModule',
                            module_name=node.module_name,
+                           decode_address_width=node.write_select_decoder.address_width,
                            hw_ports=hw_ports_list,
                            backend_signal_declarations=backend_signal_decl,
                            backend_instantiation=backend_instantiation,
-                           write_select_decoder=write_select_decoder)
+                           write_select_decoder=write_select_decoder,
+                           read_data_mux=read_data_mux,
+                           read_latency=node.read_data_mux.latency if node.read_data_mux else 0)
+
+    def stream_BackendModule(self, node: BackendModule):
+        # Ports are indented by the template, so they are rendered at once
+        hw_ports_list = self.visit(node.hw_ports)
+        return self.render_stream('modules/BackendModule',
+                           module_name=node.module_name,
+                           decode_address_width=node.write_select_decoder.address_width,
+                           hw_ports=hw_ports_list,
+                           backend_signal_declarations=Splice(self._stream_sharded(node.backend_signal_declarations)),
+                           backend_instantiation=Splice(self._stream_sharded(node.backend_instantiation)),
+                           write_select_decoder=Splice(self.visit_stream(node.write_select_decoder)),
+                           read_data_mux=Splice(self.visit_stream(node.read_data_mux)) if node.read_data_mux else None,
+                           read_latency=node.read_data_mux.latency if node.read_data_mux else 0)
 
     def visit_InterfaceModule(self, node: InterfaceModule):
         interface_template = 'interfaces/' + node.interface_name
@@ -422,11 +829,107 @@ class SystemVerilogEmitter (LanguageEmitterBase):
     def visit_FieldModule(self, node: FieldModule):
         return self.render('modules/FieldModule', module_name=node.module_name)
 
+    def visit_FieldTypeModule(self, node: FieldTypeModule):
+        return self.render('modules/FieldTypeModule', node=node, module_name=node.module_name)
+
     def visit_InterruptModule(self, node: InterruptModule):
         return self.render('modules/InterruptModule', module_name=node.module_name)
 
     def visit_Port(self, node: Port):
-        return self.render('Port', port=node)
+        return self.render('Port', node=node)
 
     def visit_SignalDeclaration(self, node: SignalDeclaration):
-        return self.render('SignalDeclaration', decl=node)
+        return self.render('SignalDeclaration', node=node)
+
+    #
+    # Batched rendering of homogeneous runs
+    #
+
+    @staticmethod
+    def _unwrap(item):
+        # Single element sequences render exactly as their element
+        while isinstance(item, (list, tuple)) and len(item) == 1:
+            item = item[0]
+        return item
+
+    def _batch_key(self, item):
+        """ Return (key, record) of batchable item or (None, None) """
+        leaf = self._unwrap(item)
+        if leaf.__class__ in self.batched_templates:
+            return leaf.__class__, leaf
+        if leaf.__class__ is LogicalGroup:
+            inner = self._unwrap(leaf.children)
+            if inner.__class__ in self.batched_templates:
+                return (leaf.level, inner.__class__), (leaf.description, inner)
+        return None, None
+
+    def _runs(self, iterable):
+        """ Split iterable into runs. Yields (item, None) for items rendered
+        on their own and (None, rendered_run) for batched runs. """
+        if self._trace or not self.language_config.get('batch_render', True):
+            for item in iterable:
+                yield item, None
+            return
+
+        run_key, run_item, run = None, None, []
+        for item in iterable:
+            key, record = self._batch_key(item)
+            if key is not None and key == run_key:
+                run.append(record)
+                continue
+            if run:
+                yield (run_item, None) if len(run) == 1 else (None, self._render_run(run_key, run))
+            run_key, run_item, run = key, item, ([record] if key is not None else [])
+            if key is None:
+                yield item, None
+        if run:
+            yield (run_item, None) if len(run) == 1 else (None, self._render_run(run_key, run))
+
+    def _render_run(self, key, records):
+        module_name = self.language_config['design_name']
+        if isinstance(key, tuple):
+            level, node_class = key
+            return self.render('BatchGroup',
+                               groups=records,
+                               group_template=self.get_template('LogicalGroupH%d' % level),
+                               template=self.get_template(self.batched_templates[node_class]),
+                               module_name=module_name)
+        return self.render('Batch',
+                           nodes=records,
+                           template=self.get_template(self.batched_templates[key]),
+                           module_name=module_name)
+
+    def _visit_iterable(self, iterable):
+        if self._sharding is not None and self._sharding.accepts(iterable):
+            return '\n'.join(self._sharding.render(iterable))
+        return '\n'.join(self.visit(item) if rendered is None else rendered
+                         for item, rendered in self._runs(iterable))
+
+    def _stream_iterable(self, iterable):
+        if self._sharding is not None and self._sharding.accepts(iterable):
+            yield from self._stream_shards(iterable)
+            return
+        first = True
+        for item, rendered in self._runs(iterable):
+            if not first:
+                yield '\n'
+            first = False
+            if rendered is None:
+                yield from self.visit_stream(item)
+            else:
+                yield rendered
+
+    def _stream_shards(self, iterable):
+        first = True
+        for rendered in self._sharding.render(iterable):
+            if not first:
+                yield '\n'
+            first = False
+            yield rendered
+
+# =============================================================================
+
+
+SYSTEMVERILOG_BACKEND = LanguageBackend("sv", SystemVerilogBuilder, SystemVerilogEmitter,
+                                        template_suffix=".sv",
+                                        description="SystemVerilog RTL of register block")
@@ -0,0 +1,29 @@
+{% if file_header %}{{ file_header }}
+{% endif -%}
+/* Register map of {{ prefix }}. Generated file, do not edit. */
+
+#ifndef {{ prefix }}_REGS_H
+#define {{ prefix }}_REGS_H
+{% for reg in registers %}
+{%- set reg_name = prefix ~ '_' ~ (reg.path | c_path_identifier) %}
+/* {{ reg.path }} */
+{%- if reg.is_array %}
+#define {{ '%-40s' | format(reg_name ~ '_ADDR(i)') }} (0x{{ '%08X' | format(reg.address) }}u + (i) * {{ reg_name ~ '_STRIDE' }})
+#define {{ '%-40s' | format(reg_name ~ '_OFFSET(i)') }} (0x{{ '%08X' | format(reg.offset) }}u + (i) * {{ reg_name ~ '_STRIDE' }})
+#define {{ '%-40s' | format(reg_name ~ '_STRIDE') }} 0x{{ '%08X' | format(reg.array_stride) }}u
+#define {{ '%-40s' | format(reg_name ~ '_COUNT') }} {{ reg.array_size }}u
+{%- else %}
+#define {{ '%-40s' | format(reg_name ~ '_ADDR') }} 0x{{ '%08X' | format(reg.address) }}u
+#define {{ '%-40s' | format(reg_name ~ '_OFFSET') }} 0x{{ '%08X' | format(reg.offset) }}u
+{%- endif %}
+{%- for field in reg.fields %}
+{%- set field_name = reg_name ~ '_' ~ (field.name | c_identifier) %}
+#define {{ '%-40s' | format(field_name ~ '_POS') }} {{ field.low }}u
+#define {{ '%-40s' | format(field_name ~ '_WIDTH') }} {{ field.width }}u
+#define {{ '%-40s' | format(field_name ~ '_MASK') }} 0x{{ '%08X' | format(field.mask) }}u
+{%- if field.reset is not none %}
+#define {{ '%-40s' | format(field_name ~ '_RESET') }} 0x{{ '%X' | format(field.reset) }}u
+{%- endif %}
+{%- endfor %}
+{% endfor %}
+#endif /* {{ prefix }}_REGS_H */
@@ -0,0 +1,2 @@
+{% for node in nodes %}{% include template %}{% if not loop.last %}
+{% endif %}{% endfor %}
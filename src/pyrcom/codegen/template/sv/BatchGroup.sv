@@ -0,0 +1,2 @@
+{% for description, node in groups %}{% set content %}{% include template %}{% endset %}{% include group_template %}{% if not loop.last %}
+{% endif %}{% endfor %}
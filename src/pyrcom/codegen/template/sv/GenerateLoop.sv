@@ -0,0 +1,3 @@
+for (genvar {{ genvar }} = 0; {{ genvar }} < {{ count }}; {{ genvar }}++) begin: {{ label }}
+    {{ content | indent(4) }}
+end
\ No newline at end of file
@@ -0,0 +1,65 @@
+/* Decoder tree: {{ tree.depth }} level(s), {{ tree.radix_bits }} address bit(s) per level */
+{%- for n in nodes if n.signal %}
+{{ "logic               %s;" | format(n.signal) }}
+{%- endfor %}
+{% if registered %}
+/* Level 1 is predecoded from bus address */
+always_ff @(posedge clk or negedge resetn)
+begin
+    if (!resetn) begin
+    {%- for digit, child in tree.root.children %}
+        {{ "%-27s <= 1'b0;" | format(child.signal) }}
+    {%- endfor %}
+    end else if (sw_select) begin
+    {%- for digit, child in tree.root.children %}
+        {{ "%-27s <= (sw_address[%d:%d] == %d'h%x);" | format(child.signal, tree.root.bit_high + 2, tree.root.bit_low + 2, tree.root.width, digit) }}
+    {%- endfor %}
+    end
+end
+{% endif %}
+{%- for n in nodes if not (registered and n.level == 0) %}
+always_comb
+begin
+{%- for digit, child in n.children %}
+    {{ "%-27s = 1'b0;" | format(child.signal) }}
+{%- endfor %}
+{%- for digit, select in n.selects %}
+    {{ "%-27s = 1'b0;" | format(select) }}
+{%- endfor %}
+{% if n.level == 0 %}
+    if (sw_state == SW_STATE_WRITE_ACCESS)
+{%- elif registered and n.level == 1 %}
+    if (sw_state == SW_STATE_WRITE_ACCESS && {{ n.signal }})
+{%- else %}
+    if ({{ n.signal }})
+{%- endif %}
+        case (sw_decode_address[{{ n.bit_high }}:{{ n.bit_low }}])
+{%- for digit, child in n.children %}
+            {{ "%d'h%x" | format(n.width, digit) }}: {{ "%-27s = 1'b1;" | format(child.signal) }}
+{%- endfor %}
+{%- for digit, select in n.selects %}
+            {{ "%d'h%x" | format(n.width, digit) }}: {{ "%-27s = 1'b1;" | format(select) }}
+{%- endfor %}
+            default: ;
+        endcase
+end
+{% endfor %}
+always_comb
+begin
+    sw_decode_select_valid      = 1'b0
+{%- for address, select in tree.address_map %}
+        | {{ select }}
+{%- endfor %}
+{%- for decode, select in array_map %}
+        | (sw_state == SW_STATE_WRITE_ACCESS && {{ decode.hit_signal }})
+{%- endfor %};
+end
+{%- for decode, select in array_map %}
+
+always_comb
+begin
+    {{ "%-27s = '0;" | format(select) }}
+    if (sw_state == SW_STATE_WRITE_ACCESS && {{ decode.hit_signal }})
+        {{ select }}[{{ decode.index_signal }}] = 1'b1;
+end
+{%- endfor %}
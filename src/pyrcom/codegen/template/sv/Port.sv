@@ -1 +1 @@
-{{ "%-7s" | format(port.direction) }}{% if port.range != None %}{{ "%-13s" | format(port.range) }}{% else %}             {% endif %}{{ port.name }}
\ No newline at end of file
+{{ "%-7s" | format(node.direction) }}{% if node.range != None %}{{ "%-13s" | format(node.range) }}{% else %}             {% endif %}{{ node.name }}
\ No newline at end of file
@@ -0,0 +1,60 @@
+{%- macro operand_expr(operand) -%}
+{%- if operand.signal is defined -%}{{ operand.signal }}{%- else -%}({32{ {{- operand[1] -}} }} & {{ operand[2] }}){%- endif -%}
+{%- endmacro -%}
+{%- macro node_expr(node) -%}
+{%- for operand in node.operands %}{% if not loop.first %}
+                                | {% endif %}{{ operand_expr(operand) }}{% endfor -%}
+{%- endmacro -%}
+/* One-hot read select */
+{%- for address, select, data in mux.inputs %}
+{{ "logic               %s;" | format(select) }}
+{%- endfor %}
+
+always_comb
+begin
+{%- for address, select, data in mux.inputs %}
+    {{ "%-27s = 1'b0;" | format(select) }}
+{%- endfor %}
+    sw_decode_rdata_valid       = 1'b0;
+
+    if (sw_state == SW_STATE_READ_ACCESS) begin
+        sw_decode_rdata_valid   = 1'b1;
+        case (sw_decode_address)
+{%- for address, select, data in mux.inputs if address is not none %}
+            {{ address | verilog_literal("x") }}: {{ "%-27s = 1'b1;" | format(select) }}
+{%- endfor %}
+            default: /* TODO: decode error */
+                    sw_decode_rdata_valid = 1'b0;
+        endcase
+{%- for decode, select in array_map %}
+        if ({{ decode.hit_signal }}) begin
+            {{ "%-23s = 1'b1;" | format(select) }}
+            sw_decode_rdata_valid   = 1'b1;
+        end
+{%- endfor %}
+    end // sw_state == SW_STATE_READ_ACCESS
+end
+
+/* AND-OR read data mux: {{ mux.inputs | length }} input(s), fan-in {{ mux.fan_in }}, {{ mux.depth }} level(s), {{ mux.latency }} pipeline stage(s) */
+{%- for level in mux.levels %}{% for node in level %}
+{{ "logic [31:0]        %s;" | format(node.signal) }}
+{%- endfor %}{% endfor %}
+{% for level in mux.levels %}
+{%- if level[0].registered %}
+always_ff @(posedge clk)
+begin
+{%- for node in level %}
+    {{ "%-27s <= " | format(node.signal) }}{{ node_expr(node) }};
+{%- endfor %}
+end
+{% else %}
+always_comb
+begin
+{%- for node in level %}
+    {{ "%-27s = " | format(node.signal) }}{{ node_expr(node) }};
+{%- endfor %}
+end
+{% endif %}
+{%- endfor %}
+always_comb
+    {{ "%-27s = " | format("sw_decode_rdata_w") }}{% if mux.output %}{{ mux.output.signal }}{% else %}0{% endif %};
@@ -0,0 +1,25 @@
+/* Register arrays: element index computed from word address */
+{%- for a in decoders %}
+{{ "logic               %s;" | format(a.hit_signal) }}
+{{ "logic %-14s" | format("[%d:0]" % (a.index_width - 1)) }}{{ a.index_signal }};
+{%- endfor %}
+
+always_comb
+begin
+{%- for a in decoders %}
+{%- set offset = "sw_decode_address - %s" | format(a.address | verilog_literal("x")) if a.address else "sw_decode_address" %}
+    {{ "%-27s = " | format(a.hit_signal) }}
+{%- if a.address %}(sw_decode_address >= {{ a.address | verilog_literal("x") }}) && {% endif -%}
+    (sw_decode_address <= {{ a.last_address | verilog_literal("x") }})
+{%- if a.stride > 1 %}
+{%- if a.stride_shift != None %} && (({{ offset }}) & {{ (a.stride - 1) | verilog_literal("x") }}) == 0
+{%- else %} && (({{ offset }}) % {{ a.stride }}) == 0
+{%- endif %}
+{%- endif %};
+    {{ "%-27s = " | format(a.index_signal) }}{{ a.index_width }}'(
+{%- if a.stride == 1 %}{{ offset }}
+{%- elif a.stride_shift != None %}({{ offset }}) >> {{ a.stride_shift }}
+{%- else %}({{ offset }}) / {{ a.stride }}
+{%- endif %});
+{%- endfor %}
+end
@@ -1 +1 @@
-{{ "%-7s" | format(decl.kind) }}{% if decl.range != None %}{{ "%-13s" | format(decl.range) }}{% else %}             {% endif %}{{ decl.name }};
\ No newline at end of file
+{{ "%-7s" | format(node.kind) }}{% if node.range != None %}{{ "%-13s" | format(node.range) }}{% else %}             {% endif %}{{ node.name }};
\ No newline at end of file
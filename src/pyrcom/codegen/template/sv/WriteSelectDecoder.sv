@@ -1,7 +1,8 @@
 always_comb
 begin
     {% for d in address_map %}
-    {{ "%-27s = 1'b0;" | format(d[1]) }}{% endfor %}
+    {{ "%-27s = 1'b0;" | format(d[1]) }}{% endfor %}{% for a in array_map %}
+    {{ "%-27s = '0;" | format(a[1]) }}{% endfor %}
     sw_decode_select_valid      = 1'b0;
 
     if (sw_state == SW_STATE_WRITE_ACCESS) begin
@@ -11,6 +12,10 @@ begin
             {{ d[0] | verilog_literal("x") }}: {{ "%-27s = 1'b1;" | format(d[1]) }}{% endfor %}
             default: /* TODO: decode error */
                     sw_decode_select_valid  = 1'b0;
-        endcase
+        endcase{% for a in array_map %}
+        if ({{ a[0].hit_signal }}) begin
+            {{ "%-23s = 1'b1;" | format(a[1] ~ "[" ~ a[0].index_signal ~ "]") }}
+            sw_decode_select_valid  = 1'b1;
+        end{% endfor %}
     end // sw_state == SW_STATE_WRITE_ACCESS
 end
\ No newline at end of file
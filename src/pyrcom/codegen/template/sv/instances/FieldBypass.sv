@@ -1 +1 @@
-assign reg_{{ node.parent_reg_name }}__data_out{{ node.field_range }} = reg_{{ node.parent_reg_name }}__data_in{{ node.field_range }};
\ No newline at end of file
+assign reg_{{ node.parent_reg_name }}__data_out{{ node.index }}{{ node.field_range }} = reg_{{ node.parent_reg_name }}__data_in{{ node.index }}{{ node.field_range }};
\ No newline at end of file
@@ -0,0 +1,7 @@
+{{ node.module_name }}
+field_{{ node.parent_reg_name }}__{{ node.field_name }} (
+    .write (reg_{{ node.parent_reg_name }}__select{{ node.index }}),
+    .din   (reg_{{ node.parent_reg_name }}__data_in{{ node.index }}{{ node.field_range }}),
+    .dq    (reg_{{ node.parent_reg_name }}__data_out{{ node.index }}{{ node.field_range }}),
+    .*
+);
\ No newline at end of file
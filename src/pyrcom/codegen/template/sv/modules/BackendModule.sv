@@ -36,7 +36,7 @@ typedef enum bit [1:0] {
 
 sw_state_t          sw_state;
 
-logic [1:0]         sw_decode_address;
+{{ "logic %-14s" | format("[%d:0]" % (decode_address_width - 1)) }}sw_decode_address;
 logic               sw_decode_select_valid;
 logic [31:0]        sw_decode_rdata_w;
 logic [31:0]        sw_decode_rdata;
@@ -86,7 +86,7 @@ begin
     if (!resetn)
         sw_decode_address <= 0;
     else if (sw_select)
-        sw_decode_address <= sw_address[3:2];
+        sw_decode_address <= sw_address[{{ decode_address_width + 1 }}:2];
 end
 
 /***
@@ -97,6 +97,9 @@ end
 /***
  *** Read data decoder
  ***/
+{% if read_data_mux != None -%}
+{{ read_data_mux }}
+{%- else -%}
 always_comb
 begin
     sw_decode_rdata_w           = 0;
@@ -111,11 +114,22 @@ begin
         endcase
     end // sw_state == SW_STATE_READ_ACCESS
 end
+{%- endif %}
 /* pipeline read data register with corresponding sw_ready */
+{% if read_latency -%}
+/* read data mux adds {{ read_latency }} cycle(s) of latency */
+{{ "logic %-14s" | format("[%d:0]" % (read_latency - 1)) }}sw_decode_ready_pipe;
+
+{% endif -%}
 always_ff @(posedge clk)
 begin
     sw_decode_rdata <= sw_decode_rdata_w;
+{%- if read_latency == 0 %}
     sw_decode_ready <= sw_enable;
+{%- else %}
+    sw_decode_ready_pipe <= {% if read_latency == 1 %}sw_enable{% else %}{ sw_decode_ready_pipe[{{ read_latency - 2 }}:0], sw_enable }{% endif %};
+    sw_decode_ready <= sw_decode_ready_pipe[{{ read_latency - 1 }}];
+{%- endif %}
     /* TODO: sw_decode_error = ~sw_decode_rdata_valid | sw_decode_select_valid; */
 end
 
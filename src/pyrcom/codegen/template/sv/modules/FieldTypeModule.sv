@@ -0,0 +1,44 @@
+/*****************************************************************************/
+/* Module: {{ module_name }}
+ *
+ * Field of {{ node.width }} bit(s), reset mask {{ "%d'h%x" | format(node.width, node.reset_mask) }}, reset value {{ "%d'h%x" | format(node.width, node.reset_value) }}.
+ * Instantiated {{ node.instances }} time(s).
+ */
+module {{ module_name }} (
+    input                       clk,
+    input                       resetn,
+    input                       write,
+    input  {{ "%-21s" | format("[%d:0]" % (node.width - 1)) }}din,
+    output {{ "%-21s" | format("[%d:0]" % (node.width - 1)) }}dq
+);
+
+/* Signals ----------------------------------------------------------------- */
+
+logic   {{ "%-24s" | format("[%d:0]" % (node.width - 1)) }}field_data;
+
+/* State machine ----------------------------------------------------------- */
+{% for range, is_reset, value in node.reset_runs %}
+{%- set select = "" if range.high - range.low + 1 == node.width else range %}
+{%- if is_reset %}
+always_ff @(posedge clk or negedge resetn)
+begin
+    if (!resetn)
+        field_data{{ select }} <= {{ "%d'h%x" | format(range.high - range.low + 1, value) }};
+    else if (write)
+        field_data{{ select }} <= din{{ select }};
+end
+{% else %}
+always_ff @(posedge clk)
+begin
+    if (write)
+        field_data{{ select }} <= din{{ select }};
+end
+{% endif %}
+{%- endfor %}
+/* Interface assignment ---------------------------------------------------- */
+
+assign dq = field_data;
+
+endmodule: {{ module_name }}
+
+
@@ -18,8 +18,6 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
 # THE SOFTWARE.
 
-from jinja2.exceptions import TemplateNotFound
-
 # =============================================================================
 
 
@@ -73,6 +71,7 @@ class CodegenTemplateError(PyrcomError):
     """ Code generation template error - mostly from Jinja2 subsystem. """
 
     def __init__(self, message=None):
+        from jinja2.exceptions import TemplateNotFound
         if not message:
             if hasattr(self, '__cause__'):
                 if (self.__cause__, TemplateNotFound):
@@ -0,0 +1,68 @@
+# Copyright © 2018 Mateusz Maciąg
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the “Software”), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software
+# is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS
+# OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+""" Message printer and errors of the command line tools """
+
+from systemrdl.messages import MessagePrinter, Severity
+from systemrdl.messages import RDLCompileError
+
+# =============================================================================
+
+
+class RDLArgumentError(RDLCompileError):
+    """ Command line argument error """
+    pass
+
+
+class RDLMessagePrinter(MessagePrinter):
+
+    def __init__(self):
+        self.severity_desc = { "error" : True, "warning" : True, "info" : False, "debug" : False }
+
+    def enable(self, severity):
+        self.severity_desc[severity] = True
+
+    def disable(self, severity):
+        self.severity_desc[severity] = False
+
+    # systemrdl reports `Severity` values, pyrcom uses plain severity names
+    severity_names = {
+        Severity.NONE: "debug",
+        Severity.WARNING: "warning",
+        Severity.ERROR: "error",
+        Severity.FATAL: "error"
+    }
+
+    def print_message(self, severity, text, src_ref=None):
+
+        if isinstance(severity, Severity):
+            rdl_severity = severity
+            severity = self.severity_names[severity]
+        else:
+            rdl_severity = Severity.ERROR if severity == "error" else Severity.WARNING
+
+        if severity in self.severity_desc and self.severity_desc[severity]:
+            if (severity == "warning" or severity == "error"):
+                # use built in support for these severities
+                lines = self.format_message(rdl_severity, text, src_ref)
+                self.emit_message(lines)
+            else:
+                # just emit simple message
+                self.emit_message([str.format("{0}: {1}", severity, text)])
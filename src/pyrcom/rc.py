@@ -24,6 +24,7 @@ from systemrdl.messages import MessagePrinter, Severity
 import systemrdl.warnings as warnings
 
 from pyrcom.regtree import RegisterTree
+from pyrcom.stats import NULL_STATS
 
 import sys
 
@@ -59,6 +60,23 @@ class RegisterTreeExtractionListener(RDLListener):
     #     print("Exiting component", node.get_path())
 
 
+class _RecordingPrinter(MessagePrinter):
+    """ Forwards messages to `printer`, recording all but debug ones so
+    they can be stored with the cached tree """
+
+    def __init__(self, printer):
+        self.printer = printer
+        self.messages = []
+
+    def print_message(self, severity, text, src_ref=None):
+        if severity != Severity.NONE:
+            self.messages.append((severity, text, src_ref))
+        self.printer.print_message(severity, text, src_ref)
+
+    def emit_message(self, lines):
+        self.printer.emit_message(lines)
+
+
 class RegisterCompiler:
 
     def __init__(self, printer=MessagePrinter(), **kwargs):
@@ -70,6 +88,8 @@ class RegisterCompiler:
         self.skip_not_present = kwargs.pop('skip_not_present', False)
         self.warning_flags = kwargs.pop('warning_flags', [])
         self.src_files = kwargs.pop('src_files', [])
+        self.cache = kwargs.pop('cache', None)  # pyrcom.cache.CompilationCache
+        self.stats = kwargs.pop('stats', None) or NULL_STATS
 
     def print_message(self, severity, text, src_ref=None):
         """ Wrapper to printer.print_message allowing default `src_ref` """
@@ -102,15 +122,39 @@ class RegisterCompiler:
         self.print_message(Severity.NONE, str.format(
             "warning_mask: {0}", warning_mask), None)
 
-        rdlc = RDLCompiler(message_printer=self.printer,
+        cache_key = None
+        if self.cache:
+            with self.stats.stage('cache_lookup'):
+                cache_key = self.cache.make_key(self.src_files, self.incl_search_paths,
+                                                self.top_def_name, warning_mask)
+                entry = self.cache.load(cache_key, self.printer)
+            if entry is not None:
+                root, messages = entry
+                self.print_message(Severity.NONE, str.format(
+                    "Using cached elaboration {0}", cache_key))
+                # Cached compilation reports the same warnings
+                for severity, text, src_ref in messages:
+                    self.print_message(severity, text, src_ref)
+                return root
+
+        printer = _RecordingPrinter(self.printer) if self.cache else self.printer
+        rdlc = RDLCompiler(message_printer=printer,
                            warning_flags=warning_mask)
 
         for input_file in self.src_files:
             self.print_message(
                 Severity.NONE, str.format("Compiling {0} ...", input_file))
-            rdlc.compile_file(input_file, self.incl_search_paths)
+            with self.stats.stage('compile_file:' + input_file):
+                rdlc.compile_file(input_file, self.incl_search_paths)
 
         self.print_message(Severity.NONE, "Elaborating ...")
-        root = rdlc.elaborate(top_def_name=self.top_def_name)
+        with self.stats.stage('elaborate'):
+            root = rdlc.elaborate(top_def_name=self.top_def_name)
+
+        if cache_key:
+            with self.stats.stage('cache_store'):
+                stored = self.cache.store(cache_key, root, printer.messages)
+            if not stored:
+                self.print_message(Severity.NONE, "Elaborated tree could not be cached")
 
         return root
@@ -0,0 +1,397 @@
+# Copyright © 2018 Mateusz Maciąg
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the “Software”), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software
+# is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS
+# OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+""" Long-running compile server.
+
+Server keeps elaborated RDL trees and generated code of served requests in
+memory, together with modification stamps of all source and include files
+they were compiled from. Request whose files did not change is answered
+from memory, without touching the RDL compiler or the templates.
+
+Requests are JSON-RPC 2.0 objects, one per line, read from stdin (replies
+are written to stdout) or from connections to a Unix domain socket:
+
+    {"jsonrpc": "2.0", "id": 1, "method": "compile",
+     "params": {"src_files": ["i2c.rdl"], "incl_search_paths": ["doc"],
+                "design_name": "i2c", "output": "out/i2c.sv"}}
+
+Methods:
+
+  compile     compile and generate code; parameters are the keys of batch
+              manifest jobs (see `pyrcom.batch`), 'output' is optional -
+              without it generated code is returned in the reply
+  invalidate  drop all cached entries
+  status      return cache statistics
+  shutdown    stop serving
+
+Server keeps at most `MAX_ENTRIES` source sets, least recently used ones are
+dropped first. Request failing with an unexpected exception is answered with
+an internal error, the server keeps serving.
+
+Reply of 'compile' has 'success' flag, 'cached' flag and 'diagnostics' list
+of {'severity', 'text'} messages ('file', 'line' and 'column' are added when
+source location is known); 'error' when compilation failed. Diagnostics of
+compilation are repeated in replies served from memory.
+"""
+
+from systemrdl import RDLCompileError
+from systemrdl.messages import MessagePrinter, Severity
+
+from pyrcom.rc import RegisterCompiler
+from pyrcom.cache import resolve_include_files
+from pyrcom.exceptions import PyrcomError
+from pyrcom.codegen.registry import get_backend, DEFAULT_BACKEND
+from pyrcom.codegen.synthesis import build_synthesis_context
+from pyrcom.batch import CompileJob, language_config_error, _JOB_KEYS, _JOB_KEY_TYPES
+
+from collections import OrderedDict
+
+import inspect
+import json
+import os
+import socketserver
+import time
+
+# =============================================================================
+
+# JSON-RPC error codes
+PARSE_ERROR = -32700
+INVALID_REQUEST = -32600
+METHOD_NOT_FOUND = -32601
+INVALID_PARAMS = -32602
+INTERNAL_ERROR = -32603
+
+# Default number of source sets kept in memory
+MAX_ENTRIES = 32
+
+
+class RequestError(PyrcomError):
+    """ Malformed request, reported as JSON-RPC error """
+
+    def __init__(self, code, message):
+        super(RequestError, self).__init__(message)
+        self._code = code
+
+    @property
+    def code(self):
+        return self._code
+
+# =============================================================================
+
+
+class RecordingPrinter (MessagePrinter):
+    """ Printer collecting messages of the current request. One printer is
+    used for the whole life of the server, as cached trees keep reference
+    to the printer they were compiled with. """
+
+    _severity_names = {
+        Severity.NONE: "debug",
+        Severity.WARNING: "warning",
+        Severity.ERROR: "error",
+        Severity.FATAL: "error"
+    }
+
+    def __init__(self):
+        self.messages = []
+
+    def print_message(self, severity, text, src_ref=None):
+        if isinstance(severity, Severity):
+            severity = self._severity_names[severity]
+        if severity not in ("info", "warning", "error"):
+            return
+        message = {'severity': severity, 'text': text}
+        if src_ref is not None:
+            src_ref.derive_coordinates()
+            message['file'] = src_ref.filename
+            message['line'] = src_ref.start_line
+            message['column'] = src_ref.start_col
+        self.messages.append(message)
+
+# =============================================================================
+
+
+class _Entry:
+    """ Elaborated tree of one source set, with stamps of the files it
+    was compiled from, its synthesis context and code generated from it """
+
+    __slots__ = ('rdl_root', 'stamps', 'diagnostics', 'synthesis_context', 'code')
+
+    def __init__(self, rdl_root, stamps, diagnostics):
+        self.rdl_root = rdl_root
+        self.stamps = stamps
+        self.diagnostics = diagnostics
+        self.synthesis_context = None
+        # (language, design name, language options) -> generated code
+        self.code = {}
+
+
+def _stamp(path):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+
+class CompileServer:
+    """ Request handler keeping compilation results warm.
+
+    `warning_flags` is a callable converting 'warning_spec' list of request
+    into warning flags of `RegisterCompiler`; requests with warning spec
+    are rejected without it. `cache` is optional on-disk `CompilationCache`
+    used on misses of the in-memory cache, which keeps at most
+    `max_entries` source sets. """
+
+    # Manifest job keys accepted by 'compile'
+    _COMPILE_KEYS = set(_JOB_KEYS) - {'name', 'incremental', 'address_map', 'emit',
+                                       'save_act', 'load_act'}
+
+    def __init__(self, warning_flags=None, cache=None, max_entries=MAX_ENTRIES):
+        self._warning_flags = warning_flags
+        self._cache = cache
+        self._max_entries = max_entries
+        self._printer = RecordingPrinter()
+        self._entries = OrderedDict()
+        self._hits = 0
+        self._misses = 0
+        self._running = True
+
+    @property
+    def running(self):
+        return self._running
+
+    # -------------------------------------------------------------------------
+    # Methods
+
+    def compile(self, **params):
+        unknown = set(params) - self._COMPILE_KEYS
+        if unknown:
+            raise RequestError(INVALID_PARAMS, str.format("Unknown parameters {0}", sorted(unknown)))
+        if 'src_files' not in params:
+            raise RequestError(INVALID_PARAMS, "Missing required parameter 'src_files'")
+        for key, value in params.items():
+            description, check = _JOB_KEY_TYPES[key]
+            if value is None and key != 'src_files':
+                continue
+            if not check(value):
+                raise RequestError(INVALID_PARAMS, str.format(
+                    "Parameter '{0}' must be {1}, got {2!r}", key, description, value))
+        error = language_config_error(params.get('language_config') or {})
+        if error:
+            raise RequestError(INVALID_PARAMS, error)
+        params = {k: v for k, v in params.items() if v is not None}
+        kwargs = {_JOB_KEYS[k]: v for k, v in params.items()}
+        kwargs.setdefault('output_path', None)
+        job = CompileJob(**kwargs)
+        if job.warning_spec and self._warning_flags is None:
+            raise RequestError(INVALID_PARAMS, "Warning flags are not supported")
+
+        printer = self._printer
+        printer.messages = []
+        reply = {'success': True, 'cached': False}
+        start = time.perf_counter()
+        try:
+            warning_flags = self._warning_flags(job.warning_spec) if self._warning_flags else {}
+            key = (tuple(os.path.abspath(f) for f in job.src_files),
+                   tuple(job.incl_search_paths), job.top_def_name,
+                   tuple(sorted(warning_flags.items())), job.skip_not_present)
+
+            code_key = (job.language or DEFAULT_BACKEND, job.design_name,
+                        json.dumps(job.language_config, sort_keys=True))
+
+            entry = self._entries.get(key)
+            if entry is None or any(_stamp(path) != stamp for path, stamp in entry.stamps):
+                self._misses += 1
+                self._entries.pop(key, None)
+                entry = self._compile(job, warning_flags)
+                self._entries[key] = entry
+                while len(self._entries) > self._max_entries:
+                    self._entries.popitem(last=False)
+            else:
+                self._hits += 1
+                self._entries.move_to_end(key)
+                reply['cached'] = code_key in entry.code
+                printer.messages = list(entry.diagnostics)
+
+            code = entry.code.get(code_key)
+            if code is None:
+                backend = get_backend(code_key[0])
+                language_config = dict(job.language_config, design_name=job.design_name)
+                if entry.synthesis_context is None:
+                    entry.synthesis_context = build_synthesis_context(entry.rdl_root)
+                code = entry.code[code_key] = backend.create_emitter(
+                    language_config, printer=printer).generate_code(
+                    backend.create_builder(language_config, printer=printer),
+                    entry.rdl_root, entry.synthesis_context)
+
+            if job.output_path:
+                tmp_path = job.output_path + '.tmp'
+                with open(tmp_path, 'w') as fd:
+                    fd.write(code)
+                os.replace(tmp_path, job.output_path)
+                reply['output'] = job.output_path
+            else:
+                reply['code'] = code
+
+        except (RDLCompileError, PyrcomError, OSError) as e:
+            message = str(e)
+            if hasattr(e, '__cause__') and e.__cause__:
+                message = "%s Details: %s" % (message, e.__cause__)
+            reply['success'] = False
+            reply['error'] = message
+
+        reply['time'] = time.perf_counter() - start
+        reply['diagnostics'] = printer.messages
+        return reply
+
+    def _compile(self, job, warning_flags):
+        # Files are stamped before compilation, so edits made while it runs
+        # are caught by the next request
+        paths = resolve_include_files(job.src_files, job.incl_search_paths)
+        stamps = [(path, _stamp(path)) for path in paths]
+
+        compiler = RegisterCompiler(
+            printer=self._printer,
+            incl_search_paths=job.incl_search_paths,
+            top_def_name=job.top_def_name,
+            skip_not_present=job.skip_not_present,
+            warning_flags=warning_flags,
+            src_files=job.src_files,
+            cache=self._cache
+        )
+        return _Entry(compiler.compile(), stamps, list(self._printer.messages))
+
+    def invalidate(self):
+        count = len(self._entries)
+        self._entries.clear()
+        return {'removed': count}
+
+    def status(self):
+        return {
+            'entries': len(self._entries),
+            'hits': self._hits,
+            'misses': self._misses,
+        }
+
+    def shutdown(self):
+        self._running = False
+        return {}
+
+    _methods = {
+        'compile': compile,
+        'invalidate': invalidate,
+        'status': status,
+        'shutdown': shutdown,
+    }
+
+    # -------------------------------------------------------------------------
+    # Protocol
+
+    def handle(self, request):
+        """ Handle decoded JSON-RPC request, return reply object (None for
+        notifications) """
+        request_id = None
+        try:
+            if not isinstance(request, dict) or request.get('jsonrpc') != '2.0' \
+                    or not isinstance(request.get('method'), str):
+                raise RequestError(INVALID_REQUEST, "Invalid request")
+            request_id = request.get('id')
+
+            method = self._methods.get(request['method'])
+            if method is None:
+                raise RequestError(METHOD_NOT_FOUND, str.format(
+                    "Unknown method '{0}'", request['method']))
+            params = request.get('params', {})
+            if not isinstance(params, dict):
+                raise RequestError(INVALID_PARAMS, "Parameters must be an object")
+            try:
+                inspect.signature(method).bind(self, **params)
+            except TypeError as e:
+                raise RequestError(INVALID_PARAMS, str(e))
+            result = method(self, **params)
+            reply = {'jsonrpc': '2.0', 'id': request_id, 'result': result}
+
+        except RequestError as e:
+            reply = {'jsonrpc': '2.0', 'id': request_id,
+                     'error': {'code': e.code, 'message': e.message}}
+        except Exception as e:
+            # Bug or unexpected input fails the request, not the server
+            reply = {'jsonrpc': '2.0', 'id': request_id,
+                     'error': {'code': INTERNAL_ERROR, 'message': str.format(
+                         "Internal error: {0}: {1}", e.__class__.__name__, e)}}
+
+        if isinstance(request, dict) and 'id' not in request and 'error' not in reply:
+            return None
+        return reply
+
+    def handle_line(self, line):
+        """ Handle one line of the stream, return reply line or None """
+        try:
+            request = json.loads(line)
+        except ValueError:
+            reply = {'jsonrpc': '2.0', 'id': None,
+                     'error': {'code': PARSE_ERROR, 'message': "Parse error"}}
+        else:
+            reply = self.handle(request)
+        return None if reply is None else json.dumps(reply) + '\n'
+
+    def serve_stream(self, infile, outfile):
+        """ Serve requests read from `infile` until shutdown or end of file """
+        for line in infile:
+            if not line.strip():
+                continue
+            reply = self.handle_line(line)
+            if reply is not None:
+                outfile.write(reply)
+                outfile.flush()
+            if not self._running:
+                break
+
+    def serve_unix(self, path):
+        """ Serve requests from connections to Unix socket `path`. Connections
+        are served one at a time. """
+        server = self
+
+        class Handler (socketserver.StreamRequestHandler):
+            def handle(self):
+                infile = (line.decode('utf-8') for line in self.rfile)
+                server.serve_stream(infile, _SocketWriter(self.wfile))
+
+        if os.path.exists(path):
+            os.remove(path)
+        with socketserver.UnixStreamServer(path, Handler) as unix_server:
+            try:
+                while self._running:
+                    unix_server.handle_request()
+            finally:
+                os.remove(path)
+
+
+class _SocketWriter:
+    """ Text file interface of socket file object """
+
+    def __init__(self, wfile):
+        self._wfile = wfile
+
+    def write(self, text):
+        self._wfile.write(text.encode('utf-8'))
+
+    def flush(self):
+        self._wfile.flush()
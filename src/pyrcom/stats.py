@@ -0,0 +1,197 @@
+# Copyright © 2018 Mateusz Maciąg
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the “Software”), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software
+# is furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS
+# OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+""" Per-stage wall time, CPU time and memory statistics of a compilation.
+
+Stages are opened with `Stats.stage` and may nest; nested stage names are
+prefixed with names of the enclosing stages, e.g. 'i2c/compile/elaborate'.
+Entering a stage of already recorded name accumulates into that record.
+
+Peak RSS is the process high-water mark (as reported by getrusage) when the
+stage ended. When tracemalloc is tracing, peak of memory traced during the
+stage is recorded as well.
+"""
+
+import contextlib
+import json
+import sys
+import time
+import tracemalloc
+
+try:
+    import resource
+except ImportError:     # not available on Windows
+    resource = None
+
+# =============================================================================
+
+
+def peak_rss():
+    """ Peak resident set size of this process in bytes, None if unknown """
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return rss if sys.platform == 'darwin' else rss * 1024
+
+
+class StageRecord:
+    """ Accumulated measurements of one stage """
+
+    __slots__ = ('name', 'label', 'depth', 'calls', 'wall', 'cpu', 'peak_rss', 'peak_traced')
+
+    def __init__(self, name, label, depth):
+        self.name = name
+        self.label = label
+        self.depth = depth
+        self.calls = 0
+        self.wall = 0.0
+        self.cpu = 0.0
+        self.peak_rss = None
+        self.peak_traced = None
+
+    def to_dict(self):
+        return {
+            'name': self.name,
+            'calls': self.calls,
+            'wall': self.wall,
+            'cpu': self.cpu,
+            'peak_rss': self.peak_rss,
+            'peak_traced': self.peak_traced,
+        }
+
+
+class Stats:
+    """ Collection of stage records, in order of first entry """
+
+    enabled = True
+
+    def __init__(self):
+        self._records = {}
+        # Names of open stages, with peak traced memory of the part of each
+        # stage which preceded its currently open child stage
+        self._stack = []
+
+    @property
+    def records(self):
+        return list(self._records.values())
+
+    def __getitem__(self, name):
+        return self._records[name]
+
+    def __contains__(self, name):
+        return name in self._records
+
+    def _record(self, label):
+        """ Return record of stage `label` nested in currently open stage """
+        name = self._stack[-1][0].name + '/' + label if self._stack else label
+        record = self._records.get(name)
+        if record is None:
+            record = self._records[name] = StageRecord(name, label, len(self._stack))
+        return record
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        """ Context manager measuring the enclosed block as stage `name` """
+        record = self._record(name)
+        tracing = tracemalloc.is_tracing()
+        if tracing:
+            if self._stack:
+                parent = self._stack[-1]
+                parent[1] = max(parent[1], tracemalloc.get_traced_memory()[1])
+            tracemalloc.reset_peak()
+        self._stack.append([record, 0])
+
+        wall, cpu = time.perf_counter(), time.process_time()
+        try:
+            yield
+        finally:
+            wall, cpu = time.perf_counter() - wall, time.process_time() - cpu
+            _, traced = self._stack.pop()
+
+            record.calls += 1
+            record.wall += wall
+            record.cpu += cpu
+            record.peak_rss = peak_rss()
+            if tracing and tracemalloc.is_tracing():
+                traced = max(traced, tracemalloc.get_traced_memory()[1])
+                record.peak_traced = max(record.peak_traced or 0, traced)
+                if self._stack:
+                    parent = self._stack[-1]
+                    parent[1] = max(parent[1], traced)
+
+    def timed_iter(self, name, iterable):
+        """ Generator yielding items of `iterable`. Time spent producing the
+        items is accumulated into stage `name` (as one call); time spent by
+        the consumer in between is not. """
+        record = self._record(name)
+        record.calls += 1
+        iterator = iter(iterable)
+        while True:
+            wall, cpu = time.perf_counter(), time.process_time()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            finally:
+                record.wall += time.perf_counter() - wall
+                record.cpu += time.process_time() - cpu
+                record.peak_rss = peak_rss()
+            yield item
+
+    def to_dict(self):
+        return {'stages': [r.to_dict() for r in self._records.values()]}
+
+    def format_table(self):
+        """ Return list of lines with human readable table of stages """
+        lines = [str.format("{0:<48} {1:>6} {2:>10} {3:>10} {4:>10}",
+                            "stage", "calls", "wall [ms]", "cpu [ms]", "rss [MiB]")]
+        for r in self._records.values():
+            name = '  ' * r.depth + r.label
+            rss = '-' if r.peak_rss is None else str.format("{0:.1f}", r.peak_rss / 2**20)
+            lines.append(str.format("{0:<48} {1:>6} {2:>10.2f} {3:>10.2f} {4:>10}",
+                                    name, r.calls, r.wall * 1e3, r.cpu * 1e3, rss))
+        return lines
+
+
+class NullStats (Stats):
+    """ Stats which measure nothing, used when profiling is off """
+
+    enabled = False
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        yield
+
+    def timed_iter(self, name, iterable):
+        return iterable
+
+
+NULL_STATS = NullStats()
+
+# =============================================================================
+
+
+def write_stats_json(path, job_stats, extra=None):
+    """ Write stats of jobs, list of (job name, `Stats`), to JSON file """
+    doc = dict(extra or {})
+    doc['jobs'] = [dict(name=name, **stats.to_dict()) for name, stats in job_stats]
+    with open(path, 'w') as fd:
+        json.dump(doc, fd, indent=2)
@@ -0,0 +1,28 @@
+import pytest
+
+from systemrdl.messages import MessagePrinter
+from pyrcom.rc import RegisterCompiler
+
+
+class QuietPrinter(MessagePrinter):
+    """ Printer dropping all messages (default printer cannot print debug
+    messages) """
+
+    def print_message(self, severity, text, src_ref=None):
+        pass
+
+
+@pytest.fixture
+def quiet_printer():
+    return QuietPrinter()
+
+
+@pytest.fixture(scope='session')
+def i2c_root():
+    """ Elaborated tree of the I2C example, shared by all tests which only
+    read it """
+    return RegisterCompiler(
+        printer=QuietPrinter(),
+        incl_search_paths=['examples/example_01/doc'],
+        src_files=['examples/example_01/i2c.rdl'],
+        warning_flags={}).compile()
@@ -0,0 +1,103 @@
+import pytest
+
+from array import array
+from systemrdl import RDLWalker, rdltypes
+
+from pyrcom.rc import RegisterCompiler
+from pyrcom.batch import CompileJob, run_job
+from pyrcom.codegen.synthesis import SynthesisRDLContext, build_synthesis_context
+from pyrcom.codegen.addrmap import AddressMapIndex, AddressMapFormatError
+
+
+@pytest.fixture
+def i2c_index(i2c_root):
+    context = SynthesisRDLContext()
+    RDLWalker(unroll=True).walk(i2c_root, context)
+    return AddressMapIndex.from_context(context)
+
+
+def make_index(regions):
+    """ Index of (address, size) registers with one 8-bit field each """
+    n = len(regions)
+    return AddressMapIndex(
+        ['r%d' % i for i in range(n)],
+        array('Q', [a for a, _ in regions]), array('I', [s for _, s in regions]),
+        array('I', range(n + 1)), ['f'] * n,
+        array('I', [7] * n), array('I', [0] * n), bytearray([2 | 3 << 3] * n))
+
+
+def test_addressMapLookup(i2c_index):
+    index = i2c_index
+    assert [index.register(r).address for r in range(len(index))] == [0, 4, 8, 12, 16, 20]
+    assert index.lookup(0x15).path.endswith('.TIMING')
+    assert index.lookup(0x18) is None
+
+    field = index.lookup_field(0x0, 1)
+    assert field.name == 'STA' and (field.high, field.low) == (1, 1)
+    assert index.lookup_field(0x14, 10).name == 'SCLT'
+    assert [f.name for f in index.fields(index.find(0))] == ['EN', 'STA', 'STO', 'MODE']
+    assert index.overlaps() == [] and index.gaps() == []
+
+
+def test_addressMapSerialization(i2c_index):
+    index = i2c_index
+    data = index.to_bytes()
+    copy = AddressMapIndex.from_bytes(data)
+    assert copy.to_bytes() == data
+    for row in range(len(index)):
+        assert copy.register(row) == index.register(row)
+        assert copy.fields(row) == index.fields(row)
+    assert copy.lookup_field(0x0, 0).hw == index.lookup_field(0x0, 0).hw
+
+    with pytest.raises(AddressMapFormatError):
+        AddressMapIndex.from_bytes(data[:-1])
+    with pytest.raises(AddressMapFormatError):
+        AddressMapIndex.from_bytes(b'NOTAMAP!' + data[8:])
+
+
+def test_addressMapOverlapsAndGaps():
+    index = make_index([(0, 4), (4, 8), (8, 4), (32, 4), (32, 4)])
+    assert index.overlaps() == [(1, 2), (3, 4)]
+    assert index.gaps() == [(12, 32)]
+    assert index.lookup(9).path == 'r2'
+    assert index.lookup_field(32, 3).sw == rdltypes.AccessType.rw
+    assert index.lookup_field(32, 3).is_interrupt_flag is False
+    assert index.lookup_field(33, 0) is None
+
+
+def test_runJobWritesAddressMap(tmpdir, quiet_printer):
+    job = CompileJob(['examples/example_01/i2c.rdl'], str(tmpdir.join('i2c.sv')),
+                     incl_search_paths=['examples/example_01/doc'],
+                     address_map_path=str(tmpdir.join('i2c.amap')))
+    assert run_job(job, quiet_printer, {}).success
+    assert len(AddressMapIndex.read(job.address_map_path)) == 6
+
+
+def test_addressMapOfRolledArrays(tmpdir, quiet_printer):
+    src = tmpdir.join('arrays.rdl')
+    src.write("""
+reg r_t { field { sw=rw; hw=r; } f[7:0] = 0; };
+regfile rf_t { r_t a[2]; };
+addrmap top {
+    r_t single;
+    r_t grid[2][3];
+    rf_t rfs[2];
+};
+""")
+    rdl_root = RegisterCompiler(printer=quiet_printer, src_files=[str(src)],
+                                warning_flags={}).compile()
+
+    def index(roll_arrays):
+        context = build_synthesis_context(rdl_root, roll_arrays)
+        index = AddressMapIndex.from_context(context)
+        return [tuple(index.register(r)) for r in range(len(index))], index
+
+    unrolled, _ = index(False)
+    rolled, rolled_index = index(True)
+    assert rolled == unrolled
+    assert len(rolled) == 1 + 6 + 4
+    assert rolled_index.lookup(0x10).path == 'top.grid[1][0]'
+    assert rolled_index.lookup(0x18).path == 'top.grid[1][2]'
+    assert rolled_index.lookup(0x24).path == 'top.rfs[0].a[1]'
+    assert rolled_index.lookup(0x1c) is None
+    assert rolled_index.overlaps() == [] and rolled_index.gaps() == [(0x1c, 0x20)]
@@ -0,0 +1,173 @@
+import json
+import os
+import pytest
+
+from systemrdl.messages import MessagePrinter
+from pyrcom.batch import CompileJob, ManifestError, load_manifest, parse_language_option, \
+    run_job, run_jobs
+
+
+class RecordingPrinter(MessagePrinter):
+    def __init__(self):
+        self.lines = []
+
+    def print_message(self, severity, text, src_ref=None):
+        if severity == "info":
+            self.emit_message([text])
+
+    def emit_message(self, lines):
+        self.lines.extend(lines)
+
+
+def test_loadManifest(tmpdir):
+    manifest = tmpdir.join('blocks.json')
+    manifest.write(json.dumps({
+        'defaults': {'incl_search_paths': ['doc'], 'warning_spec': ['all']},
+        'jobs': [
+            {'src_files': ['i2c.rdl'], 'design_name': 'i2c', 'output': 'out/i2c.sv'},
+            {'src_files': ['spi.rdl'], 'top': 'SPI', 'output': 'spi.sv',
+             'warning_spec': []},
+        ]
+    }))
+
+    jobs = load_manifest(str(manifest))
+    assert [job.name for job in jobs] == ['i2c', CompileJob.DEFAULT_DESIGN_NAME]
+    assert jobs[0].src_files == [str(tmpdir.join('i2c.rdl'))]
+    assert jobs[0].output_path == str(tmpdir.join('out', 'i2c.sv'))
+    assert jobs[0].incl_search_paths == [str(tmpdir.join('doc'))]
+    assert jobs[0].warning_spec == ['all']
+    assert jobs[1].top_def_name == 'SPI'
+    assert jobs[1].warning_spec == []
+
+
+def test_loadManifestErrors(tmpdir):
+    manifest = tmpdir.join('blocks.json')
+
+    manifest.write(json.dumps([{'src_files': ['a.rdl']}]))
+    with pytest.raises(ManifestError, match="missing required key 'output'"):
+        load_manifest(str(manifest))
+
+    manifest.write(json.dumps([{'src_files': ['a.rdl'], 'output': 'a.sv', 'colour': 1}]))
+    with pytest.raises(ManifestError, match="unknown keys"):
+        load_manifest(str(manifest))
+
+    manifest.write(json.dumps([{'src_files': ['a.rdl'], 'output': 'a.sv', 'design_name': 5}]))
+    with pytest.raises(ManifestError, match="Job #0: 'design_name' must be a string"):
+        load_manifest(str(manifest))
+
+    manifest.write(json.dumps([{'src_files': 'a.rdl', 'output': 'a.sv'}]))
+    with pytest.raises(ManifestError, match="'src_files' must be a list"):
+        load_manifest(str(manifest))
+
+    manifest.write("{ not json")
+    with pytest.raises(ManifestError, match="Could not parse manifest"):
+        load_manifest(str(manifest))
+
+
+def test_languageConfig(tmpdir, quiet_printer):
+    manifest = tmpdir.join('blocks.json')
+    manifest.write(json.dumps({
+        'defaults': {'language_config': {'decoder': 'tree', 'roll_arrays': True}},
+        'jobs': [
+            {'src_files': ['i2c.rdl'], 'output': 'i2c.sv',
+             'language_config': {'roll_arrays': False, 'read_mux_pipeline': [1]}},
+        ]
+    }))
+    assert load_manifest(str(manifest))[0].language_config == \
+        {'decoder': 'tree', 'roll_arrays': False, 'read_mux_pipeline': [1]}
+
+    manifest.write(json.dumps([{'src_files': ['a.rdl'], 'output': 'a.sv',
+                                'language_config': {'decoder': 'star'}}]))
+    with pytest.raises(ManifestError, match="Job #0: Language option 'decoder' must be"):
+        load_manifest(str(manifest))
+    manifest.write(json.dumps([{'src_files': ['a.rdl'], 'output': 'a.sv',
+                                'language_config': {'design_name': 'x'}}]))
+    with pytest.raises(ManifestError, match="Unknown language option 'design_name'"):
+        load_manifest(str(manifest))
+
+    assert parse_language_option('decoder_registered=yes') == ('decoder_registered', True)
+    assert parse_language_option('read_mux_pipeline=1,3') == ('read_mux_pipeline', [1, 3])
+    assert parse_language_option('render_workers=0') == ('render_workers', 0)
+    for spec in ('roll_arrays', 'roll_arrays=maybe', 'render_shard_size=0', 'nope=1'):
+        with pytest.raises(ValueError):
+            parse_language_option(spec)
+
+    # Options reach the backend
+    def generate(name, language_config=None):
+        job = CompileJob(['examples/example_01/i2c.rdl'], str(tmpdir.join(name)),
+                         incl_search_paths=['examples/example_01/doc'],
+                         language_config=language_config)
+        assert run_job(job, quiet_printer, {}).success
+        return tmpdir.join(name).read()
+
+    assert 'Decoder tree' not in generate('flat.sv')
+    assert 'Decoder tree' in generate('tree.sv', {'decoder': 'tree'})
+
+
+def test_runJobReportsFailure(tmpdir, quiet_printer):
+    printer = quiet_printer
+
+    good = CompileJob(['examples/example_01/i2c.rdl'], str(tmpdir.join('i2c.sv')),
+                      incl_search_paths=['examples/example_01/doc'])
+    result = run_job(good, printer, {})
+    assert result.success
+    assert set(result.timings) == {'compile', 'generate'}
+    assert os.path.getsize(good.output_path) > 0
+
+    multi = CompileJob(['examples/example_01/i2c.rdl'], str(tmpdir.join('multi.sv')),
+                       incl_search_paths=['examples/example_01/doc'],
+                       extra_outputs={'c': str(tmpdir.join('multi.h')),
+                                      'md': str(tmpdir.join('multi.md'))})
+    result = run_job(multi, printer, {})
+    assert result.success
+    assert tmpdir.join('multi.sv').read() == tmpdir.join('i2c.sv').read()
+    assert '#define MYDEV_I2C_CTRL_ADDR' in tmpdir.join('multi.h').read()
+    assert tmpdir.join('multi.md').check()
+
+    # Unexpected errors fail the job only
+    broken = CompileJob(['examples/example_01/i2c.rdl'], str(tmpdir.join('broken.sv')),
+                        incl_search_paths=['examples/example_01/doc'], design_name=5)
+    result = run_job(broken, printer, {})
+    assert not result.success
+    assert 'TypeError' in result.error
+
+    bad = CompileJob([str(tmpdir.join('missing.rdl'))], str(tmpdir.join('bad.sv')))
+    result = run_job(bad, printer, {})
+    assert not result.success
+    assert 'missing.rdl' in result.error
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_runJobsKeepsJobOrder(tmpdir, workers):
+    jobs = [CompileJob(['examples/example_01/i2c.rdl'], str(tmpdir.join('%d.sv' % i)),
+                       incl_search_paths=['examples/example_01/doc'], name=str(i))
+            for i in range(3)]
+    jobs.insert(1, CompileJob([str(tmpdir.join('missing.rdl'))], str(tmpdir.join('bad.sv')),
+                              name='bad'))
+
+    printer = RecordingPrinter()
+    results = list(run_jobs(jobs, printer, [{}] * len(jobs), workers=workers))
+
+    assert [r.job.name for r in results] == ['0', 'bad', '1', '2']
+    assert [r.success for r in results] == [True, False, True, True]
+    assert printer.lines == ["Start code compilation ...", "Generating ...", "Writing output ...",
+                             "Start code compilation ..."] + \
+                            ["Start code compilation ...", "Generating ...", "Writing output ..."] * 2
+
+
+def test_runJobsFailsOnlyBrokenJob(tmpdir, quiet_printer):
+    class LocalJob(CompileJob):
+        # Local classes cannot be sent to worker processes
+        pass
+
+    jobs = [CompileJob(['examples/example_01/i2c.rdl'], str(tmpdir.join('%d.sv' % i)),
+                       incl_search_paths=['examples/example_01/doc'], name=str(i))
+            for i in range(2)]
+    jobs.insert(1, CompileJob(['examples/example_01/i2c.rdl'], str(tmpdir.join('bad.sv')),
+                              incl_search_paths=['examples/example_01/doc'], design_name=5))
+    jobs.insert(1, LocalJob(['examples/example_01/i2c.rdl'], str(tmpdir.join('local.sv'))))
+
+    results = list(run_jobs(jobs, quiet_printer, [{}] * len(jobs), workers=2))
+    assert [r.success for r in results] == [True, False, False, True]
+    assert 'Worker failed' in results[1].error
+    assert 'TypeError' in results[2].error
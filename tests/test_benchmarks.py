@@ -0,0 +1,22 @@
+import json
+
+from benchmarks import suite
+
+
+def test_suiteWritesHistory(tmpdir, monkeypatch, capsys):
+    monkeypatch.setitem(suite.CASES, 'tiny', dict(n_regs=4, fields_per_reg=2, intr_every=2,
+                                                  array_size=2, depth=1))
+    history = str(tmpdir.join('history.json'))
+
+    assert suite.main(['--case', 'tiny', '--repeat', '1', '--history', history]) == 0
+    entries = json.load(open(history))
+    assert len(entries) == 1
+    assert entries[0]['case'] == 'tiny'
+    assert set(entries[0]['stages']) == set(suite.STAGES)
+    assert all(s['time'] > 0 and s['peak_memory'] > 0 for s in entries[0]['stages'].values())
+
+    # Every stage compared with previous entry is reported as regression
+    assert suite.main(['--case', 'tiny', '--repeat', '1', '--history', history,
+                       '--threshold', '0', '--check']) == 1
+    assert len(json.load(open(history))) == 2
+    assert 'REGRESSION' in capsys.readouterr().out
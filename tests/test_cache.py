@@ -0,0 +1,100 @@
+import pytest
+
+from jinja2 import DictLoader, Environment
+from systemrdl import RDLCompiler
+from systemrdl.messages import MessagePrinter
+from pyrcom.rc import RegisterCompiler
+from pyrcom.cache import CompilationCache, resolve_include_files
+from pyrcom.codegen.base import TemplateBytecodeCache
+
+
+def make_compiler(cache, src_files=['examples/example_01/i2c.rdl']):
+    return RegisterCompiler(
+        incl_search_paths=['examples/example_01/doc'],
+        warning_flags={'missing-reset': True},
+        src_files=src_files,
+        cache=cache)
+
+
+def test_cacheHitSkipsCompilation(tmpdir, monkeypatch):
+    cache = CompilationCache(str(tmpdir))
+    root = make_compiler(cache).compile()
+    assert len(cache.entries()) == 1
+
+    def fail(*args, **kwargs):
+        raise AssertionError("RDL compiler used on cache hit")
+    monkeypatch.setattr(RDLCompiler, 'compile_file', fail)
+    monkeypatch.setattr(RDLCompiler, 'elaborate', fail)
+
+    cached_root = make_compiler(cache).compile()
+    assert [n.get_path() for n in cached_root.descendants()] == \
+           [n.get_path() for n in root.descendants()]
+
+
+def test_cacheKeyFollowsIncludes(tmpdir):
+    incl = tmpdir.join('incl.rdl')
+    incl.write("reg r_t { field {} f; };\n")
+    src = tmpdir.join('top.rdl')
+    src.write('`include "incl.rdl"\naddrmap top { r_t r; };\n')
+
+    assert resolve_include_files([str(src)]) == [str(src), str(incl)]
+
+    cache = CompilationCache(str(tmpdir.join('cache')))
+    key = cache.make_key([str(src)], None, None, 0)
+    assert key == cache.make_key([str(src)], None, None, 0)
+    assert key != cache.make_key([str(src)], None, 'top', 0)
+
+    incl.write("reg r_t { field {} g; };\n")
+    assert key != cache.make_key([str(src)], None, None, 0)
+
+
+def test_cacheEviction(tmpdir):
+    cache = CompilationCache(str(tmpdir))
+    make_compiler(cache).compile()
+    size = cache.entries()[0][1]
+
+    cache = CompilationCache(str(tmpdir), max_size=size)
+    cache.store('other', make_compiler(None).compile())
+    entries = cache.entries()
+    assert len(entries) == 1
+    assert entries[0][2].endswith('other' + CompilationCache.ENTRY_SUFFIX)
+
+
+def test_cacheHitReportsWarnings(tmpdir):
+    class RecordingPrinter(MessagePrinter):
+        def __init__(self):
+            self.messages = []
+
+        def print_message(self, severity, text, src_ref=None):
+            self.messages.append((severity.name, text))
+
+    src = tmpdir.join('noreset.rdl')
+    src.write("addrmap nr { reg { field { sw=rw; hw=r; } f[3:0]; } r0 @0x0; };\n")
+    cache = CompilationCache(str(tmpdir.join('cache')))
+
+    def warnings():
+        printer = RecordingPrinter()
+        RegisterCompiler(printer=printer, warning_flags={'missing-reset': False},
+                         src_files=[str(src)], cache=cache).compile()
+        return [m for m in printer.messages if m[0] == 'WARNING']
+
+    compiled = warnings()
+    assert len(compiled) == 1 and 'missing a reset' in compiled[0][1]
+    assert len(cache.entries()) == 1
+    assert warnings() == compiled
+
+
+def test_unwritableCacheDir(tmpdir):
+    # Cache directory below a regular file can be neither created nor written
+    blocker = tmpdir.join('blocker')
+    blocker.write('')
+    cache = CompilationCache(str(blocker.join('cache')))
+
+    root = make_compiler(cache).compile()
+    assert root is not None
+    assert cache.store('other', root) is False
+    assert cache.entries() == []
+
+    env = Environment(loader=DictLoader({'t': '{{ x }}'}),
+                      bytecode_cache=TemplateBytecodeCache(str(blocker.join('templates'))))
+    assert env.get_template('t').render(x=1) == '1'
@@ -1,7 +1,13 @@
 
 
+import io
 import pytest
+
+from pyrcom.rc import RegisterCompiler
+from pyrcom.exceptions import CodegenError
+from pyrcom.act.common import ACTVisitor
 from pyrcom.codegen import systemverilog as sv
+from pyrcom.codegen.precompile import precompile
 from pyrcom.act import systemverilog as act
 
 
@@ -33,3 +39,343 @@ def test_rangeSpecifier():
 
 #     with pytest.raises(sv.SVGeneratorError, match="Unknown declaration type '(.*)'. Expected values: '(.*)'"):
 #         sv.SignalDeclaration("test", "no_such_kind", None)
+
+
+@pytest.fixture
+def generate_i2c(i2c_root, quiet_printer):
+    def generate(language_config=None, stream=False):
+        language_config = language_config or {'design_name': 'i2c'}
+        emitter = sv.SystemVerilogEmitter("sv", language_config, printer=quiet_printer,
+                                          template_suffix=".sv")
+        builder = sv.SystemVerilogBuilder(language_config, printer=quiet_printer)
+        if stream:
+            fd = io.StringIO()
+            emitter.write_code(builder, i2c_root, fd)
+            return fd.getvalue()
+        return emitter.generate_code(builder, i2c_root)
+    return generate
+
+
+def test_streamedCodeMatchesGeneratedCode(generate_i2c):
+    code = generate_i2c()
+    assert "module i2c_backend" in code
+    assert generate_i2c(stream=True) == code
+
+
+def test_visitDoesNotPrint(generate_i2c, capsys):
+    generate_i2c()
+    assert capsys.readouterr().out == ""
+
+
+def test_visitorDispatchTablePerClass():
+    class UpperVisitor(ACTVisitor):
+        def visit_Range(self, node):
+            return repr(node).upper()
+
+    class TracingVisitor(ACTVisitor):
+        def visit_Range(self, node):
+            return str(node)
+
+    traced = []
+    root = [act.Range(3, 0), act.Range(1, 1)]
+    assert UpperVisitor().visit(root) == "3:0\n1"
+    assert TracingVisitor(trace=traced.append).visit(root) == "[3:0]\n[1]"
+    assert [n.__class__ for n in traced] == [list, act.Range, act.Range]
+
+
+def test_precompileTemplates(tmpdir):
+    assert precompile(str(tmpdir)) == len(tmpdir.listdir())
+    assert len(tmpdir.listdir()) > 0
+
+
+def test_templatesResolvedOnce():
+    emitter = sv.SystemVerilogEmitter("sv", {'design_name': 'x'}, template_suffix=".sv")
+    assert emitter.get_template('Port') is emitter.get_template('Port')
+
+
+def test_batchedRenderMatchesPerNodeRender(generate_i2c):
+    code = generate_i2c({'design_name': 'i2c', 'batch_render': False})
+    assert generate_i2c({'design_name': 'i2c', 'batch_render': True}) == code
+    assert generate_i2c({'design_name': 'i2c', 'batch_render': True}, stream=True) == code
+
+
+def test_synthesisContextTables(i2c_root):
+    from systemrdl import RDLWalker, RDLListener
+    from pyrcom.codegen.synthesis import SynthesisRDLContext
+
+    class Nodes(RDLListener):
+        def __init__(self):
+            self.regs = []
+            self.fields = []
+
+        def enter_Reg(self, node):
+            self.regs.append(node)
+
+        def enter_Field(self, node):
+            self.fields.append(node)
+
+    context = SynthesisRDLContext()
+    nodes = Nodes()
+    RDLWalker(unroll=True).walk(i2c_root, context, nodes)
+    registers = context.registers
+    fields = context.fields
+
+    assert list(registers.name) == [r.inst.inst_name for r in nodes.regs]
+    assert list(registers.path) == [r.get_path() for r in nodes.regs]
+    assert list(registers.size) == [r.size for r in nodes.regs]
+    assert list(registers.offset) == [r.address_offset for r in nodes.regs]
+    assert len(fields) == len(nodes.fields)
+    for row, node in enumerate(nodes.fields):
+        assert fields.name[row] == node.inst.inst_name
+        assert registers.name[fields.reg[row]] == node.parent.inst.inst_name
+        assert (fields.high[row], fields.low[row]) == (node.inst.high, node.inst.low)
+        assert bool(fields.is_hw_writeable[row]) == node.is_hw_writeable
+        assert bool(fields.is_interrupt_flag[row]) == bool(node.is_interrupt_flag)
+    assert [fields.name[f] for f in context.interrupt_fields] == \
+           [n.inst.inst_name for n in nodes.fields if n.is_interrupt_flag]
+    for reg in range(len(registers)):
+        assert all(fields.reg[f] == reg for f in registers.field_rows(reg))
+
+
+def test_fusedSynthesisSinglePass(i2c_root):
+    from systemrdl import RDLWalker
+    from pyrcom.codegen.synthesis import SynthesisRDLContext
+
+    context = SynthesisRDLContext()
+    RDLWalker(unroll=True).walk(i2c_root, context)
+
+    visited = []
+
+    class CountingSynthesis(sv.Synthesis):
+        def enter_register(self, reg):
+            visited.append(('reg', reg))
+
+        def enter_field(self, field):
+            visited.append(('field', field))
+
+    class Factory(sv.SynthesisFactory):
+        _tools = dict(sv.SynthesisFactory._tools, counting=CountingSynthesis)
+
+    factory = Factory(context)
+    tasks = ["counting", "hw_ports", "hw_reg_instances", "write_sel_decoder"]
+    results = factory.synthesise_all(tasks)
+    assert len(visited) == len(context.registers) + len(context.fields)
+
+    ports, = factory.synthesise_all(["hw_ports"])
+    assert [p.name for p in ports] == [p.name for p in results[1]] == \
+           [p.name for p in factory.synthesise("hw_ports")]
+    assert results[3].address_map == factory.synthesise("write_sel_decoder").address_map
+
+    with pytest.raises(CodegenError):
+        factory.synthesise_all(["hw_ports", "no_such_task"])
+
+
+def test_actNodesHaveNoInstanceDict():
+    nodes = [
+        act.Range(3, 0), act.Port('p', 'output'), act.SignalDeclaration('s'),
+        act.Net('n'), act.Assignment('a', 'b'), act.FieldInstance('r', 'f'),
+        act.FieldBypass('r', 'f'), act.InterruptInstance('i'),
+        act.LogicalGroup(1, 'group'), act.TopModule('top', 'APB'),
+        act.BackendModule('backend'), act.InterfaceModule('if', 'APB'),
+        act.FieldModule('field'), act.InterruptModule('intr'),
+        sv.CaseAssignment(0, 'a', 'b'), sv.WriteSelectDecoder([]),
+        act.ArrayRange(4), act.GenerateLoop("i", 4, "gen"), act.RegisterArrayDecode("r", 0, 4, 1),
+    ]
+    for node in nodes:
+        assert not hasattr(node, '__dict__'), type(node).__name__
+
+    field_name = ''.join(['FIE', 'LD'])
+    assert act.FieldInstance('r', field_name).field_name is \
+           act.FieldBypass('r', 'FIELD').field_name
+
+
+@pytest.mark.parametrize("registered", [False, True])
+def test_hierarchicalWriteDecoder(generate_i2c, registered):
+    code = generate_i2c({'design_name': 'i2c', 'decoder': 'tree', 'decoder_radix_bits': 1,
+                         'decoder_registered': registered})
+    assert "logic [2:0]         sw_decode_address;" in code
+    assert "sw_decode_address <= sw_address[4:2];" in code
+    assert ("case (sw_decode_address[2:2])" in code) != registered
+    assert ("sw_decode_l1_1              <= (sw_address[4:4] == 1'h1);" in code) == registered
+    for reg in ['CTRL', 'STATUS', 'ISTAT', 'ISER', 'DATA', 'TIMING']:
+        assert "| reg_%s__select" % reg in code
+
+    with pytest.raises(CodegenError):
+        generate_i2c({'design_name': 'i2c', 'decoder': 'nested-case'})
+
+
+def test_pipelinedReadMux(generate_i2c):
+    code = generate_i2c({'design_name': 'i2c'})
+    assert "32'h5: reg_TIMING__read_select     = 1'b1;" in code
+    assert "sw_decode_rdata_w           = sw_rmux_l2_0;" in code
+    assert "sw_decode_ready <= sw_enable;" in code
+
+    code = generate_i2c({'design_name': 'i2c', 'read_mux_fan_in': 2, 'read_mux_pipeline': [1, 3]})
+    assert "sw_decode_rdata_w           = sw_rmux_l3_0;" in code
+    assert "sw_decode_ready_pipe <= { sw_decode_ready_pipe[0:0], sw_enable };" in code
+    assert "sw_decode_ready <= sw_decode_ready_pipe[1];" in code
+
+
+ARRAY_RDL = """
+addrmap arr {
+    reg { field { sw=rw; hw=r; reset=0; } en[0:0]; } ctrl @0x0;
+    reg { field { sw=rw; hw=r; reset=3; } val[15:0]; } lut[8] @0x10 += 4;
+    reg { field { sw=rw; hw=w; intr; woclr; } done[0:0]; } irq[4] @0x40 += 12;
+    reg { field { sw=rw; hw=r; reset=0; } x[31:0]; } data[2][2] @0x100 += 8;
+};
+"""
+
+
+def compile_arrays(tmpdir, printer):
+    src = tmpdir.join('arr.rdl')
+    src.write(ARRAY_RDL)
+    return RegisterCompiler(printer=printer, src_files=[str(src)], warning_flags={}).compile()
+
+
+def test_rolledArrayContext(tmpdir, quiet_printer):
+    from pyrcom.codegen.synthesis import build_synthesis_context
+
+    rdl_root = compile_arrays(tmpdir, quiet_printer)
+    unrolled = build_synthesis_context(rdl_root).registers
+    rolled = build_synthesis_context(rdl_root, roll_arrays=True).registers
+
+    assert list(rolled.name) == ['ctrl', 'lut', 'irq', 'data']
+    assert list(rolled.array_size) == [0, 8, 4, 4]
+    assert len(unrolled) == 1 + 8 + 4 + 4
+
+    # Elements of rolled array are at address + i * stride, in unrolled order
+    for reg in range(len(rolled)):
+        elements = [rolled.address[reg] + i * rolled.array_stride[reg]
+                    for i in range(max(1, rolled.array_size[reg]))]
+        assert elements == [unrolled.address[r] for r in range(len(unrolled))
+                            if unrolled.name[r] == rolled.name[reg]]
+
+
+def test_rolledArraysGenerateLoops(tmpdir, quiet_printer):
+    rdl_root = compile_arrays(tmpdir, quiet_printer)
+
+    def generate(**options):
+        language_config = dict(options, design_name='arr', roll_arrays=True)
+        emitter = sv.SystemVerilogEmitter("sv", language_config, printer=quiet_printer, template_suffix=".sv")
+        builder = sv.SystemVerilogBuilder(language_config, printer=quiet_printer)
+        fd = io.StringIO()
+        emitter.write_code(builder, rdl_root, fd)
+        code = emitter.generate_code(builder, rdl_root)
+        assert fd.getvalue() == code
+        return code, builder.synthesis_context
+
+    code, context = generate()
+    assert "for (genvar i = 0; i < 8; i++) begin: gen_lut" in code
+    assert ".write (reg_lut__select[i])," in code
+    assert "wire   [7:0][31:0]  reg_lut__data_out;" in code
+    assert "output [7:0][15:0]  hw_lut__val" in code
+    assert "assign reg_irq__data_out[i][0] = reg_irq__data_in[i][0];" in code
+    assert ".intr_status    (intr_done_status[i])," in code
+    assert "reg_irq__decode_index       = 2'((sw_decode_address - 32'h10) / 3);" in code
+    assert "reg_data__data_out[reg_data__decode_index]" in code
+    # Only the single register is decoded by case arms
+    assert code.count("32'h0: reg_ctrl__") == 2
+    assert "32'h4: " not in code
+
+    # Index arithmetic decodes exactly the element addresses
+    registers = context.registers
+    decoders = sv.WriteSelectDecoderSynthesis(context, {}).do_synthesis().array_decoders
+    for decode, select in decoders:
+        reg = list(registers.name).index(decode.reg_name)
+        hits = {}
+        for address in range(decode.last_address + decode.stride + 1):
+            offset = address - decode.address
+            if decode.address <= address <= decode.last_address and offset % decode.stride == 0:
+                hits[address * 4] = offset // decode.stride
+        assert hits == {registers.offset[reg] + i * registers.array_stride[reg]: i
+                        for i in range(registers.array_size[reg])}
+
+    code, _ = generate(decoder='tree')
+    assert "| (sw_state == SW_STATE_WRITE_ACCESS && reg_lut__decode_hit)" in code
+    assert "reg_lut__select[reg_lut__decode_index] = 1'b1;" in code
+
+
+def test_fieldTypeModules(generate_i2c, i2c_root, quiet_printer):
+    module = act.FieldTypeModule('m', 8, reset_mask=0b00111100, reset_value=0b00100100)
+    assert [(str(r), is_reset, value) for r, is_reset, value in module.reset_runs] == \
+           [('[1:0]', False, 0), ('[5:2]', True, 0b1001), ('[7:6]', False, 0)]
+
+    code = generate_i2c({'design_name': 'i2c', 'field_types': True})
+    assert "module i2c_field " not in code
+    modules = [line.split()[1] for line in code.splitlines() if line.startswith('module i2c_field_')]
+    assert len(modules) == len(set(modules)) > 1
+    # Every non-interrupt field instantiates module of its type
+    instances = [line for line in code.splitlines() if line.startswith('i2c_field')]
+    assert len(instances) == code.count('.dq    (')
+    assert set(instances) == set(modules)
+    assert "field_data <= 1'h0;" in code
+
+    # Each module goes into its own file
+    language_config = {'design_name': 'i2c', 'field_types': True}
+    act_root = sv.SystemVerilogBuilder(language_config, printer=quiet_printer).build_act(i2c_root)
+    emitter = sv.SystemVerilogEmitter("sv", language_config, printer=quiet_printer, template_suffix=".sv")
+    file_names = [name for name, _ in emitter.split_files(act_root)]
+    assert set(m + '.sv' for m in modules) <= set(file_names)
+
+
+def test_shardedRenderMatchesSerialRender(generate_i2c, i2c_root, quiet_printer):
+    from pyrcom.codegen.shard import ShardRenderer
+
+    nodes = list(range(10))
+    renderer = ShardRenderer(None, workers=2, shard_size=3)
+    assert renderer.accepts(nodes) and not renderer.accepts(nodes[:5])
+    shards = renderer.shards(nodes)
+    assert [len(s) for s in shards] == [4, 3, 3]
+    assert sum(shards, []) == nodes
+
+    code = generate_i2c()
+    sharded = {'design_name': 'i2c', 'render_workers': 2, 'render_shard_size': 1}
+    assert generate_i2c(sharded) == code
+    assert generate_i2c(sharded, stream=True) == code
+
+    # Emitter with its own environment renders in process, with its templates
+    from jinja2 import ChoiceLoader, DictLoader, Environment, FileSystemLoader
+    from pyrcom.codegen.base import DEFAULT_TEMPLATE_DIR
+    env = Environment(loader=ChoiceLoader([
+        DictLoader({'sv/SignalDeclaration.sv': '// custom {{ node.name }}'}),
+        FileSystemLoader(DEFAULT_TEMPLATE_DIR)]))
+    def generate_with_env(language_config):
+        emitter = sv.SystemVerilogEmitter("sv", language_config, env=env, printer=quiet_printer,
+                                          template_suffix=".sv")
+        builder = sv.SystemVerilogBuilder(language_config, printer=quiet_printer)
+        return emitter.generate_code(builder, i2c_root)
+
+    custom = generate_with_env({'design_name': 'i2c'})
+    assert '// custom ' in custom
+    assert generate_with_env(sharded) == custom
+
+
+def test_sharedValueNodes(generate_i2c, i2c_root, quiet_printer):
+    from pyrcom.act.common import NodeInterner
+
+    assert act.Range(3, 0) == act.Range(3, 0) and act.Range(3, 0) != act.Range(3, 1)
+    assert hash(act.Range(3, 0)) == hash(act.Range(3, 0))
+    assert act.Range(3, 0) != act.ArrayRange(3) and act.Range(3, 0) != None
+    nodes = NodeInterner()
+    assert nodes(act.Range, 3, 0) is nodes(act.Range, 3, 0)
+    assert nodes(act.ArrayRange, 4, act.Range(3, 0)) is nodes(act.ArrayRange, 4, act.Range(3, 0))
+    assert len(nodes) == 2
+    assert NodeInterner(share=False)(act.Range, 3, 0) is not NodeInterner(share=False)(act.Range, 3, 0)
+
+    # Equal field ranges of the built ACT are one object
+    act_root = sv.SystemVerilogBuilder({'design_name': 'i2c'}, printer=quiet_printer).build_act(i2c_root)
+
+    def field_ranges(node):
+        if isinstance(node, (list, tuple)):
+            return [r for item in node for r in field_ranges(item)]
+        if isinstance(node, (act.FieldInstance, act.FieldBypass)):
+            return [node.field_range]
+        if isinstance(node, act.BackendModule):
+            return field_ranges(node.backend_instantiation)
+        return field_ranges(node.children)
+
+    ranges = field_ranges(act_root)
+    assert len(set(ranges)) < len(ranges)
+    assert len(set(map(id, ranges))) == len(set(ranges))
+
+    assert generate_i2c({'design_name': 'i2c', 'share_nodes': False}) == generate_i2c()
@@ -0,0 +1,67 @@
+import random
+import pytest
+
+from pyrcom.codegen.decoder import DecodeTree, MuxTree, address_width
+from pyrcom.exceptions import CodegenError
+
+
+def make_map(n_regs, space, seed=0):
+    rng = random.Random(seed)
+    return [(address, 'reg_%d__select' % address)
+            for address in sorted(rng.sample(range(space), n_regs))]
+
+
+@pytest.mark.parametrize("radix_bits", [1, 2, 3, 4, 8])
+def test_decodeTreeMatchesFlatDecoder(radix_bits):
+    address_map = make_map(700, 5000)
+    tree = DecodeTree(address_map, radix_bits=radix_bits)
+    assert tree.width == address_width(address_map) == 13
+    assert tree.depth == -(-13 // radix_bits)
+    assert tree.verify() == []
+    assert tree.decode(1 << 13) is None
+
+    leaves = [n for n in tree.nodes() if n.is_leaf]
+    assert sorted(s for n in leaves for _, s in n.selects) == sorted(s for _, s in address_map)
+    assert all(n.level == tree.depth - 1 for n in leaves)
+
+
+def test_decodeTreeSlices():
+    tree = DecodeTree([(0, 'a'), (5, 'b'), (0x1ff, 'c')], radix_bits=4)
+    assert tree.width == 9
+    assert [(n.level, n.bit_high, n.bit_low) for n in tree.nodes()] == \
+           [(0, 8, 8), (1, 7, 4), (1, 7, 4), (2, 3, 0), (2, 3, 0)]
+    assert [n.signal for n in tree.nodes()] == \
+           [None, 'sw_decode_l1_0', 'sw_decode_l1_1', 'sw_decode_l2_0', 'sw_decode_l2_1f']
+    assert tree.decode(5) == 'b' and tree.decode(6) is None
+
+
+def test_decodeTreeErrors():
+    with pytest.raises(CodegenError):
+        DecodeTree([(0, 'a')], radix_bits=0)
+    with pytest.raises(CodegenError):
+        DecodeTree([(16, 'a')], width=4)
+
+
+@pytest.mark.parametrize("fan_in", [2, 4, 16])
+def test_muxTreeSelectsOneInput(fan_in):
+    inputs = [(address, 'reg_%d__read_select' % address, 'reg_%d__data_out' % address)
+              for address, _ in make_map(100, 400)]
+    data = {d: address * 7 + 1 for address, _, d in inputs}
+    mux = MuxTree(inputs, fan_in=fan_in, pipeline_levels=[1])
+
+    assert len(mux.levels[-1]) == 1
+    assert all(len(node.operands) <= fan_in for level in mux.levels for node in level)
+    assert mux.latency == 1 and all(node.registered for node in mux.levels[0])
+    for address, _, data_signal in inputs:
+        assert mux.evaluate(address, data) == data[data_signal]
+    assert mux.evaluate(401, data) == 0
+
+
+def test_muxTreeErrors():
+    inputs = [(0, 'sel', 'data')]
+    assert MuxTree(inputs).depth == 1
+    assert MuxTree([]).output is None
+    with pytest.raises(CodegenError):
+        MuxTree(inputs, fan_in=1)
+    with pytest.raises(CodegenError):
+        MuxTree(inputs, pipeline_levels=[2])
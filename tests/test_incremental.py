@@ -0,0 +1,124 @@
+import json
+import os
+
+from systemrdl.messages import MessagePrinter
+from pyrcom.batch import CompileJob, run_job
+from pyrcom.codegen.incremental import MANIFEST_NAME, act_fingerprint
+from pyrcom.codegen.systemverilog import SystemVerilogEmitter
+from pyrcom.act import systemverilog as act
+
+
+class RecordingPrinter(MessagePrinter):
+    def __init__(self):
+        self.lines = []
+
+    def print_message(self, severity, text, src_ref=None):
+        if severity == "info":
+            self.lines.append(text)
+
+
+RDL = """
+addrmap top {
+    reg {
+        field { sw=rw; hw=r; } EN[0:0] = %d;
+        field { sw=rw; hw=r; } MODE[2:1] = 0;
+    } CTRL;
+};
+"""
+
+
+def run(tmpdir, reset=0, design_name='mydev'):
+    src = tmpdir.join('top.rdl')
+    if not src.exists() or reset is not None:
+        src.write(RDL % reset)
+    job = CompileJob([str(src)], str(tmpdir.join('out')), design_name=design_name,
+                     incremental=True)
+    printer = RecordingPrinter()
+    result = run_job(job, printer, {})
+    assert result.success, result.error
+    return printer.lines[-1]
+
+
+def mtimes(tmpdir):
+    out = tmpdir.join('out')
+    return {p.basename: os.stat(str(p)).st_mtime_ns for p in out.listdir()
+            if p.basename != MANIFEST_NAME}
+
+
+def test_incrementalWritesOnlyChangedModules(tmpdir):
+    assert run(tmpdir) == "5 file(s) written, 0 unchanged, 0 skipped, 0 removed"
+    first = mtimes(tmpdir)
+    assert sorted(first) == ['mydev.sv', 'mydev_backend.sv', 'mydev_field.sv',
+                             'mydev_interface.sv', 'mydev_intr.sv']
+
+    assert run(tmpdir) == "0 file(s) written, 0 unchanged, 5 skipped, 0 removed"
+    assert mtimes(tmpdir) == first
+
+    # Reset value is part of backend module only
+    assert run(tmpdir, reset=1) == "1 file(s) written, 0 unchanged, 4 skipped, 0 removed"
+    second = mtimes(tmpdir)
+    assert [f for f in first if first[f] != second[f]] == ['mydev_backend.sv']
+
+    # Hand edited file is regenerated
+    tmpdir.join('out', 'mydev_field.sv').write('// edited\n')
+    assert run(tmpdir, reset=1) == "1 file(s) written, 0 unchanged, 4 skipped, 0 removed"
+
+    # Missing manifest: modules are rendered, but identical files are not touched
+    tmpdir.join('out', MANIFEST_NAME).remove()
+    before = mtimes(tmpdir)
+    assert run(tmpdir, reset=1) == "0 file(s) written, 5 unchanged, 0 skipped, 0 removed"
+    assert mtimes(tmpdir) == before
+
+
+def test_incrementalRemovesStaleModules(tmpdir):
+    run(tmpdir)
+    assert run(tmpdir, design_name='other') == \
+        "5 file(s) written, 0 unchanged, 0 skipped, 5 removed"
+    assert sorted(mtimes(tmpdir)) == ['other.sv', 'other_backend.sv', 'other_field.sv',
+                                      'other_interface.sv', 'other_intr.sv']
+
+
+def test_incrementalKeepsFilesOutsideOutputDir(tmpdir):
+    run(tmpdir)
+    victim = tmpdir.join('victim.sv')
+    victim.write('// not generated\n')
+
+    manifest = tmpdir.join('out', MANIFEST_NAME)
+    doc = json.loads(manifest.read())
+    entry = doc['files']['mydev.sv']
+    doc['files']['../victim.sv'] = entry
+    doc['files'][str(victim)] = entry
+    doc['files']['.'] = entry
+    manifest.write(json.dumps(doc))
+
+    assert run(tmpdir) == "0 file(s) written, 0 unchanged, 5 skipped, 0 removed"
+    assert victim.exists()
+
+
+def test_incrementalClosesEmitter(tmpdir, monkeypatch):
+    closed = []
+    monkeypatch.setattr(SystemVerilogEmitter, 'close', lambda self: closed.append(self))
+    run(tmpdir)
+    assert len(closed) == 1
+
+
+def test_actFingerprint():
+    def group(reset):
+        return act.LogicalGroup(2, "Field: EN",
+                                act.FieldInstance('CTRL', 'EN', act.Range(0, 0), 0, reset))
+
+    assert act_fingerprint(group(0)) == act_fingerprint(group(0))
+    assert act_fingerprint(group(0)) != act_fingerprint(group(1))
+
+
+def test_actFingerprintOfDecoderModels():
+    from pyrcom.codegen.decoder import DecodeTree, MuxTree
+    from pyrcom.codegen import systemverilog as sv
+
+    def backend():
+        mux = MuxTree([(0, 'sel', 'data')], pipeline_levels=[1])
+        decoder = sv.HierarchicalWriteSelectDecoder(DecodeTree([(0, 'sel'), (5, 'sel5')], 1))
+        return act.BackendModule('backend', write_select_decoder=decoder,
+                                 read_data_mux=sv.ReadDataMux(mux))
+
+    assert act_fingerprint(backend()) == act_fingerprint(backend())
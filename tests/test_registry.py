@@ -0,0 +1,49 @@
+import pytest
+
+from pyrcom.exceptions import CodegenError
+from pyrcom.codegen import registry, pipeline
+from pyrcom.codegen.base import LanguageBackend, LanguageBuilderBase
+from pyrcom.codegen.systemverilog import SYSTEMVERILOG_BACKEND, SystemVerilogBuilder, \
+    SystemVerilogEmitter
+
+
+def test_builtinBackend():
+    assert registry.get_backend('sv') is SYSTEMVERILOG_BACKEND
+    assert 'sv' in registry.available_backends()
+    with pytest.raises(CodegenError, match="Unknown language backend 'nope'"):
+        registry.get_backend('nope')
+
+
+def test_builderMustImplementBuildAct():
+    class NoBuilder (LanguageBuilderBase):
+        pass
+
+    with pytest.raises(TypeError, match='build_act'):
+        NoBuilder({'design_name': 'x'})
+
+
+def test_writeOutputsSharesSynthesisContext(monkeypatch, tmpdir, i2c_root, quiet_printer):
+    printer = quiet_printer
+    rdl_root = i2c_root
+
+    # Second backend of the same language, registered at run time
+    monkeypatch.setitem(registry._backends, 'sv2', LanguageBackend(
+        'sv', SystemVerilogBuilder, SystemVerilogEmitter, template_suffix='.sv'))
+
+    walks = []
+    build_synthesis_context = pipeline.build_synthesis_context
+    monkeypatch.setattr(pipeline, 'build_synthesis_context',
+                        lambda root: walks.append(root) or build_synthesis_context(root))
+
+    targets = [pipeline.OutputTarget('sv', str(tmpdir.join('a.sv')), {'design_name': 'a'}),
+               pipeline.OutputTarget('sv2', str(tmpdir.join('b.sv')), {'design_name': 'b'})]
+    context = pipeline.write_outputs(rdl_root, targets, printer)
+    assert len(walks) == 1
+    assert len(context.registers) == 6
+
+    for target in targets:
+        language_config = target.language_config
+        emitter = SYSTEMVERILOG_BACKEND.create_emitter(language_config, printer=printer)
+        builder = SYSTEMVERILOG_BACKEND.create_builder(language_config, printer=printer)
+        with open(target.output_path) as fd:
+            assert fd.read() == emitter.generate_code(builder, rdl_root)
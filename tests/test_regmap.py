@@ -0,0 +1,106 @@
+import pytest
+
+from pyrcom.rc import RegisterCompiler
+from pyrcom.codegen.registry import get_backend
+from pyrcom.codegen.pipeline import OutputTarget, write_outputs
+from pyrcom.codegen.synthesis import build_synthesis_context
+from pyrcom.exceptions import CodegenError
+
+
+def generate(language, rdl_root, printer):
+    backend = get_backend(language)
+    language_config = {'design_name': 'i2c'}
+    return backend.create_emitter(language_config, printer=printer).generate_code(
+        backend.create_builder(language_config, printer=printer), rdl_root)
+
+
+def test_cHeader(i2c_root, quiet_printer):
+    code = generate('c', i2c_root, quiet_printer)
+    assert '#ifndef I2C_REGS_H' in code
+    # Names follow the path below top addrmap, registers are in 'I2C' regfile
+    assert '#define I2C_I2C_STATUS_ADDR                      0x00000004u' in code
+    assert '#define I2C_I2C_CTRL_MODE_MASK                   0x00000300u' in code
+    assert '#define I2C_I2C_CTRL_MODE_RESET                  0x2u' in code
+    assert 'I2C_I2C_CTRL_EN_RESET' not in code
+
+
+def test_markdown(i2c_root, quiet_printer):
+    code = generate('md', i2c_root, quiet_printer)
+    assert code.startswith('# i2c register map')
+    assert '| [I2C.STATUS](#i2cstatus) | `0x00000004` | `0x4` |' in code
+    assert '## I2C.STATUS' in code
+    assert '| MODE | [9:8] | w | r | `0x2` |  |' in code
+    assert '| TX_IF | [0] | r | w | - | yes |' in code
+
+
+NESTED_RDL = """
+reg r_t { field { sw=rw; hw=r; } f[1:0] = 0; };
+regfile rf_t { r_t a; };
+addrmap top {
+    rf_t x;
+    rf_t y;
+    r_t a;
+    r_t arr[3];
+    rf_t rfs[2];
+};
+"""
+
+
+def generate_nested(tmpdir, language, printer, roll_arrays=False):
+    src = tmpdir.join('top.rdl')
+    src.write(NESTED_RDL)
+    rdl_root = RegisterCompiler(printer=printer, src_files=[str(src)],
+                                warning_flags={}).compile()
+    backend = get_backend(language)
+    language_config = {'design_name': 'top'}
+    context = build_synthesis_context(rdl_root, roll_arrays=roll_arrays)
+    return backend.create_emitter(language_config, printer=printer).generate_code(
+        backend.create_builder(language_config, printer=printer), rdl_root, context)
+
+
+def defines(code):
+    return [line.split()[1] for line in code.splitlines() if line.startswith('#define')]
+
+
+def test_cHeaderNamesAreUnique(tmpdir, quiet_printer):
+    code = generate_nested(tmpdir, 'c', quiet_printer)
+    names = defines(code)
+    assert len(names) == len(set(names))
+    assert '#define TOP_X_A_ADDR                             0x00000000u' in code
+    assert '#define TOP_Y_A_ADDR                             0x00000004u' in code
+    assert '#define TOP_ARR_2_ADDR                           0x00000014u' in code
+    assert '#define TOP_RFS_1_A_F_MASK                       0x00000003u' in code
+
+    # Rolled register array is described once, regfile arrays stay unrolled
+    code = generate_nested(tmpdir, 'c', quiet_printer, roll_arrays=True)
+    names = defines(code)
+    assert len(names) == len(set(names))
+    assert '#define TOP_ARR_ADDR(i)                          (0x0000000Cu + (i) * TOP_ARR_STRIDE)' \
+        in code
+    assert '#define TOP_ARR_STRIDE                           0x00000004u' in code
+    assert '#define TOP_ARR_COUNT                            3u' in code
+    assert 'TOP_RFS_1_A_ADDR' in code
+
+
+def test_markdownArrays(tmpdir, quiet_printer):
+    code = generate_nested(tmpdir, 'md', quiet_printer, roll_arrays=True)
+    assert '| [x.a](#xa) | `0x00000000` | `0x0` |' in code
+    assert '## arr\n\nAddress `0x0000000C`, 3 elements, stride `0x4`\n' in code
+
+
+def test_writeOutputs(i2c_root, quiet_printer, tmpdir):
+    language_config = {'design_name': 'i2c'}
+    targets = [OutputTarget(language, str(tmpdir.join('i2c.' + language)), language_config)
+               for language in ('sv', 'c', 'md')]
+
+    context = write_outputs(i2c_root, targets, quiet_printer, workers=3)
+    assert len(context.registers) == 6
+    for target in targets:
+        assert open(target.output_path).read() == generate(target.language, i2c_root, quiet_printer)
+
+    # Unknown backend is reported before any output is written
+    with pytest.raises(CodegenError):
+        write_outputs(i2c_root, [OutputTarget('sv', str(tmpdir.join('x.sv')), language_config),
+                                 OutputTarget('nope', str(tmpdir.join('x.nope')), language_config)],
+                      quiet_printer)
+    assert not tmpdir.join('x.sv').exists()
@@ -0,0 +1,98 @@
+import pickle
+import pytest
+
+from pyrcom.batch import CompileJob, run_job
+from pyrcom.codegen.registry import get_backend
+from pyrcom.act import serialize
+from pyrcom.act.serialize import SavedACT, ACTFormatError, MAGIC, node_classes
+
+
+@pytest.fixture
+def build_i2c(i2c_root, quiet_printer):
+    def build(language_config):
+        backend = get_backend('sv')
+        act_root = backend.create_builder(language_config, printer=quiet_printer).build_act(i2c_root)
+        return backend, act_root
+    return build
+
+
+@pytest.mark.parametrize("language_config", [
+    {'design_name': 'i2c'},
+    {'design_name': 'i2c', 'field_types': True, 'decoder': 'tree'},
+])
+def test_savedACTRoundTrip(build_i2c, quiet_printer, tmpdir, language_config):
+    backend, act_root = build_i2c(language_config)
+    expected = backend.create_emitter(language_config, printer=quiet_printer) \
+        .generate_act_code(act_root)
+
+    path = str(tmpdir.join('i2c.act'))
+    SavedACT(act_root, 'sv', language_config).write(path)
+    saved = SavedACT.read(path)
+    assert saved.language == 'sv'
+    assert saved.language_config == language_config
+
+    emitter = backend.create_emitter(saved.language_config, printer=quiet_printer)
+    assert emitter.generate_act_code(saved.root) == expected
+
+
+def test_savedACTRejectsBadData(build_i2c):
+    _, act_root = build_i2c({'design_name': 'i2c'})
+    data = SavedACT(act_root, 'sv', {'design_name': 'i2c'}).to_bytes()
+
+    with pytest.raises(ACTFormatError, match="truncated"):
+        SavedACT.from_bytes(data[:4])
+    with pytest.raises(ACTFormatError, match="not a saved ACT"):
+        SavedACT.from_bytes(b'X' + data[1:])
+    with pytest.raises(ACTFormatError, match="format version"):
+        SavedACT.from_bytes(data[:len(MAGIC)] + b'\xff\xff' + data[len(MAGIC) + 2:])
+    with pytest.raises(ACTFormatError, match="damaged"):
+        SavedACT.from_bytes(data[:-10])
+
+    # Only ACT classes are constructed when loading
+    foreign = SavedACT(act_root, 'sv', {'design_name': 'i2c'})
+    foreign._root = [act_root, pickle.Pickler]
+    with pytest.raises(ACTFormatError, match="damaged") as info:
+        SavedACT.from_bytes(foreign.to_bytes())
+    assert "not allowed" in str(info.value.__cause__)
+
+    # Classes imported by node modules are not node classes
+    metadata_end = serialize._HEADER.size + serialize._HEADER.unpack_from(data)[3]
+    for module, name in [('pyrcom.codegen.shard', 'ProcessPoolExecutor'),
+                         ('pyrcom.codegen.systemverilog', 'Environment'),
+                         ('pyrcom.codegen.systemverilog', 'RDLWalker')]:
+        payload = str.format("c{0}\n{1}\n.", module, name).encode('ascii')
+        with pytest.raises(ACTFormatError, match="damaged") as info:
+            SavedACT.from_bytes(data[:metadata_end] + payload)
+        assert "not allowed" in str(info.value.__cause__)
+
+
+def test_savedACTNodeLayout(build_i2c, monkeypatch):
+    # Layout digest covers whole node state only if all of it is in slots
+    for cls in node_classes().values():
+        assert all('__slots__' in klass.__dict__ for klass in cls.__mro__[:-1]), cls
+
+    _, act_root = build_i2c({'design_name': 'i2c'})
+    data = SavedACT(act_root, 'sv', {'design_name': 'i2c'}).to_bytes()
+    monkeypatch.setattr(serialize, '_layout_digest', 'other')
+    with pytest.raises(ACTFormatError, match="different node classes"):
+        SavedACT.from_bytes(data)
+
+
+def test_runJobFromSavedACT(tmpdir, quiet_printer):
+    printer = quiet_printer
+    act_path = str(tmpdir.join('i2c.act'))
+
+    job = CompileJob(['examples/example_01/i2c.rdl'], str(tmpdir.join('i2c.sv')),
+                     incl_search_paths=['examples/example_01/doc'], save_act_path=act_path)
+    assert run_job(job, printer, {}).success
+
+    job = CompileJob([], str(tmpdir.join('loaded.sv')), load_act_path=act_path)
+    result = run_job(job, printer, {})
+    assert result.success
+    assert set(result.timings) == {'load_act', 'generate'}
+    assert tmpdir.join('loaded.sv').read() == tmpdir.join('i2c.sv').read()
+
+    job = CompileJob([], str(tmpdir.join('c.h')), load_act_path=act_path, language='c')
+    result = run_job(job, printer, {})
+    assert not result.success
+    assert "built for language 'sv'" in result.error
@@ -0,0 +1,126 @@
+import io
+import json
+import os
+
+from pyrcom.server import CompileServer, METHOD_NOT_FOUND, INVALID_PARAMS, INTERNAL_ERROR, \
+    PARSE_ERROR
+
+
+def request(server, method, request_id=1, **params):
+    return server.handle({'jsonrpc': '2.0', 'id': request_id, 'method': method, 'params': params})
+
+
+def test_serverCachesUntilSourceChanges(tmpdir):
+    incl = tmpdir.join('incl.rdl')
+    incl.write("reg ctrl_t { field { sw = rw; hw = r; } en; };\n")
+    src = tmpdir.join('top.rdl')
+    src.write('`include "incl.rdl"\naddrmap top { ctrl_t ctrl; };\n')
+
+    server = CompileServer()
+    params = dict(src_files=[str(src)], design_name='top')
+
+    first = request(server, 'compile', **params)['result']
+    assert first['success'] and not first['cached']
+    assert 'module top_backend' in first['code']
+
+    second = request(server, 'compile', **params)['result']
+    assert second['cached']
+    assert second['code'] == first['code']
+
+    # Other design name reuses elaborated tree, but generates new code
+    other = request(server, 'compile', **dict(params, design_name='other'))['result']
+    assert not other['cached'] and 'module other_backend' in other['code']
+    assert request(server, 'status')['result'] == {'entries': 1, 'hits': 2, 'misses': 1}
+
+    # Language options are part of the generated code key
+    tree = request(server, 'compile', **dict(params, language_config={'decoder': 'tree'}))
+    assert not tree['result']['cached'] and 'Decoder tree' in tree['result']['code']
+    error = request(server, 'compile', **dict(params, language_config={'decoder': 'star'}))['error']
+    assert error['code'] == INVALID_PARAMS and "'decoder'" in error['message']
+
+    incl.write("reg ctrl_t { field { sw = rw; hw = r; } go; };\n")
+    st = os.stat(str(incl))
+    os.utime(str(incl), ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+    third = request(server, 'compile', **params)['result']
+    assert not third['cached']
+    assert 'ctrl__go' in third['code'] and 'ctrl__en' not in third['code']
+
+
+def test_serverReportsErrors(tmpdir):
+    src = tmpdir.join('bad.rdl')
+    src.write("addrmap top { reg { field {} f; } r; r r2; };\n")
+    server = CompileServer()
+
+    result = request(server, 'compile', src_files=[str(src)])['result']
+    assert not result['success']
+    errors = [d for d in result['diagnostics'] if d['severity'] == 'error']
+    assert errors and errors[0]['file'] == str(src) and errors[0]['line'] == 1
+
+    assert request(server, 'compile', source=[])['error']['code'] == INVALID_PARAMS
+    assert request(server, 'compile', src_files=[str(src)],
+                   warning_spec=['all'])['error']['code'] == INVALID_PARAMS
+    assert request(server, 'nope')['error']['code'] == METHOD_NOT_FOUND
+    assert request(server, 'status', verbose=True)['error']['code'] == INVALID_PARAMS
+
+    error = request(server, 'compile', src_files=str(src))['error']
+    assert error['code'] == INVALID_PARAMS and "'src_files' must be a list" in error['message']
+    error = request(server, 'compile', src_files=[str(src)], skip_not_present='yes')['error']
+    assert error['code'] == INVALID_PARAMS and "'skip_not_present'" in error['message']
+
+
+def test_serverSurvivesUnexpectedErrors(tmpdir):
+    src = tmpdir.join('latin1.rdl')
+    src.write_binary(b"// \xe9t\xe9\naddrmap top { reg { field {} f; } r0; };\n")
+    requests = [
+        {'jsonrpc': '2.0', 'id': 1, 'method': 'compile', 'params': {'src_files': [str(src)]}},
+        {'jsonrpc': '2.0', 'id': 2, 'method': 'status'},
+    ]
+    infile = io.StringIO(''.join(json.dumps(r) + '\n' for r in requests))
+    outfile = io.StringIO()
+
+    server = CompileServer()
+    server.serve_stream(infile, outfile)
+
+    replies = [json.loads(line) for line in outfile.getvalue().splitlines()]
+    assert [r['id'] for r in replies] == [1, 2]
+    assert replies[0]['error']['code'] == INTERNAL_ERROR
+    assert 'UnicodeDecodeError' in replies[0]['error']['message']
+    assert replies[1]['result']['entries'] == 0
+
+
+def test_serverEvictsLeastRecentlyUsed(tmpdir):
+    server = CompileServer(max_entries=2)
+    sources = []
+    for name in ['a', 'b', 'c']:
+        src = tmpdir.join(name + '.rdl')
+        src.write("addrmap %s { reg { field { sw = rw; hw = r; } f; } r0; };\n" % name)
+        sources.append([str(src)])
+
+    request(server, 'compile', src_files=sources[0])
+    request(server, 'compile', src_files=sources[1])
+    assert request(server, 'compile', src_files=sources[0])['result']['cached']
+    request(server, 'compile', src_files=sources[2])
+    assert request(server, 'status')['result']['entries'] == 2
+
+    # 'b' was least recently used
+    assert request(server, 'compile', src_files=sources[0])['result']['cached']
+    assert not request(server, 'compile', src_files=sources[1])['result']['cached']
+
+
+def test_serveStream():
+    requests = [
+        {'jsonrpc': '2.0', 'id': 1, 'method': 'status'},
+        {'jsonrpc': '2.0', 'method': 'invalidate'},
+        {'jsonrpc': '2.0', 'id': 2, 'method': 'shutdown'},
+        {'jsonrpc': '2.0', 'id': 3, 'method': 'status'},
+    ]
+    infile = io.StringIO('not json\n' + ''.join(json.dumps(r) + '\n' for r in requests))
+    outfile = io.StringIO()
+
+    server = CompileServer()
+    server.serve_stream(infile, outfile)
+
+    replies = [json.loads(line) for line in outfile.getvalue().splitlines()]
+    assert [r['id'] for r in replies] == [None, 1, 2]
+    assert replies[0]['error']['code'] == PARSE_ERROR
+    assert not server.running
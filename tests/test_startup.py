@@ -0,0 +1,40 @@
+import os
+import subprocess
+import sys
+
+# Budget of imports done by `pyrcom_runtime.py --help`, in microseconds. It is
+# several times the measured time (about 40 ms), to leave room for slow hosts.
+IMPORT_BUDGET_US = 250000
+
+HEAVY_MODULES = ('systemrdl', 'antlr4', 'jinja2', 'pyrcom.codegen', 'pyrcom.rc')
+
+
+def run_importtime(*args):
+    """ Return process and list of (module, cumulative import time, nested) """
+    env = dict(os.environ, PYTHONPATH='src')
+    proc = subprocess.run([sys.executable, '-X', 'importtime', 'compiler/pyrcom_runtime.py'] +
+                          list(args), env=env, capture_output=True, text=True)
+    imports = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        imports.append((name.strip(), int(cumulative), name.startswith('  ')))
+    return proc, imports
+
+
+def test_helpDoesNotLoadCompiler():
+    proc, imports = run_importtime('--help')
+    assert proc.returncode == 0
+    names = [name for name, _, _ in imports]
+    assert 'pyrcom.batch' in names
+    assert [name for name in names if name.startswith(HEAVY_MODULES)] == []
+
+    # Nested imports are included in time of top-level ones
+    pyrcom_time = sum(t for name, t, nested in imports
+                      if name.startswith('pyrcom') and not nested)
+    assert pyrcom_time < IMPORT_BUDGET_US
+
+    proc, imports = run_importtime('--no-such-option')
+    assert proc.returncode == 2
+    assert not any(name.startswith(HEAVY_MODULES) for name, _, _ in imports)
@@ -0,0 +1,69 @@
+import tracemalloc
+
+from pyrcom.batch import CompileJob, run_job
+from pyrcom.stats import Stats, NULL_STATS
+import pyrcom.codegen.systemverilog as sv
+
+
+def test_nestedStages():
+    stats = Stats()
+    tracemalloc.start()
+    try:
+        with stats.stage('outer'):
+            with stats.stage('inner'):
+                data = [0] * 100000
+            del data
+            for _ in stats.timed_iter('items', range(3)):
+                with stats.stage('inner'):
+                    pass
+    finally:
+        tracemalloc.stop()
+
+    # Stages entered by consumer of timed iterator are not nested in it
+    assert [r.name for r in stats.records] == ['outer', 'outer/inner', 'outer/items']
+    assert stats['outer/inner'].calls == 4
+    assert stats['outer/items'].calls == 1
+    assert stats['outer'].wall >= stats['outer/inner'].wall
+    # Peak of nested stage propagates to enclosing stage
+    assert stats['outer'].peak_traced >= stats['outer/inner'].peak_traced >= 800000
+    assert len(stats.format_table()) == 4
+
+    with NULL_STATS.stage('ignored'):
+        pass
+    assert NULL_STATS.records == []
+
+
+def test_runJobStats(tmpdir, quiet_printer):
+    job = CompileJob(['examples/example_01/i2c.rdl'], str(tmpdir.join('i2c.sv')),
+                     incl_search_paths=['examples/example_01/doc'])
+    result = run_job(job, quiet_printer, {}, stats=Stats())
+    assert result.success
+
+    names = [r.name for r in result.stats.records]
+    assert names[:3] == ['compile', 'compile/compile_file:examples/example_01/i2c.rdl',
+                         'compile/elaborate']
+    assert 'generate/build_act/walk' in names
+    assert 'generate/build_act/synthesis:hw_reg_instances' in names
+    assert 'generate/visit:mydev_backend' in names
+    assert result.stats['generate/write'].calls > 0
+
+
+
+def test_profileFieldTypes(i2c_root, quiet_printer):
+    # Typed field instances are not measured as modules of their own (without
+    # batch rendering each instance is rendered by a visit of its own)
+    language_config = {'design_name': 'i2c', 'field_types': True, 'batch_render': False}
+    printer = quiet_printer
+    stats = Stats()
+    emitter = sv.SystemVerilogEmitter("sv", language_config, printer=printer,
+                                      template_suffix=".sv", stats=stats)
+    builder = sv.SystemVerilogBuilder(language_config, printer=printer)
+    code = emitter.generate_code(builder, i2c_root)
+    assert 'module i2c_backend' in code
+
+    # Each module (field type modules included) is visited once, instances
+    # of field types sharing their name must not add to it
+    visits = [r for r in stats.records if r.name.startswith('visit:')]
+    assert 'visit:i2c_backend' in [r.name for r in visits]
+    assert any(r.name.startswith('visit:i2c_field_') for r in visits)
+    assert all(r.calls == 1 for r in visits), [(r.name, r.calls) for r in visits]